@@ -0,0 +1,207 @@
+"""
+End-to-end benchmark of pip-ascent against the local stand-in index and the fake pip.
+
+Every scenario (backend x number of packages) runs in a fresh interpreter, which goes through the stages of
+the CLI with "-p all" and times each of them:
+
+  detect_files         requirements files detection
+  parse_requirements   requirements parsing
+  lookup_cold          index lookups with an empty cache
+  lookup_warm          index lookups again, answered by the cache
+  select               selection of the upgrades
+  upgrade              wheel prefetch, installation (fake pip, one batch) and requirements rewrite
+
+The report is a JSON document with the wall time, the lookup throughput (packages per second, cold cache),
+the peak RSS and the per-phase breakdown of every scenario, plus the requests served by the index.
+
+Usage:
+  python benchmarks/end_to_end.py [--sizes=10,100,1000,5000] [--backends=pypi_json,simple_json,simple_html]
+                                  [--latency-ms=<ms>] [--releases=<n>] [--payload-kb=<kb>] [--error-rate=<ratio>]
+                                  [--jobs=<n>] [--output=<file>]
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARKS_DIR)
+sys.path.insert(0, BENCHMARKS_DIR)
+
+import fake_pip  # noqa: E402
+from fake_index import FakeIndex  # noqa: E402
+
+BACKENDS = {
+    'pypi_json': '/pypi/',
+    'simple_json': '/simple/',
+    'simple_html': '/html/simple/',
+}
+DEFAULT_SIZES = (10, 100, 1000, 5000)
+
+
+def peak_rss_kb():
+    # on Linux ru_maxrss survives fork/exec and would report the parent (the index server) as well
+    try:
+        with open('/proc/self/status') as fh:
+            for line in fh:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except IOError:
+        pass
+
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak  # bytes on macOS, kilobytes elsewhere
+
+
+def run_scenario(jobs):
+    """ Child side: runs the CLI stages in the current directory and prints the timings as JSON """
+    sys.path.insert(0, REPO_DIR)
+    started = time.perf_counter()
+    phases = {}
+
+    @contextlib.contextmanager
+    def phase(name):
+        phase_started = time.perf_counter()
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            yield
+        phases[name] = time.perf_counter() - phase_started
+
+    from docopt import docopt
+    from pip_ascent import cli
+
+    options = docopt(cli.__doc__, argv=['requirements.txt', '-p', 'all', '--skip-virtualenv-check',
+                                        '--jobs={}'.format(jobs)])
+
+    with phase('detect_files'):
+        filenames = cli.detect_requirements_files(options)
+
+    with phase('parse_requirements'):
+        from pip_ascent.PackageDetector import PackageDetector
+        package_detector = PackageDetector(filenames)
+        packages = package_detector.get_packages()
+
+    from pip_ascent.PackageStatusDetector import PackageStatusDetector
+    with phase('lookup_cold'):
+        status_map = PackageStatusDetector(packages, options, package_detector.get_sources()) \
+            .detect_available_upgrades(options)
+    with phase('lookup_warm'):
+        detector = PackageStatusDetector(packages, options, package_detector.get_sources())
+        detector.detect_available_upgrades(options)
+
+    with phase('select'):
+        from pip_ascent.InteractivePackageSelector import InteractivePackageSelector
+        selected_packages = InteractivePackageSelector(status_map, options).get_packages()
+
+    with phase('plan'):
+        from pip_ascent.UpgradePlanner import UpgradePlanner
+        selected_packages = UpgradePlanner(detector, packages, options).plan(selected_packages)
+
+    with phase('upgrade'):
+        from pip_ascent.PackageUpgrader import PackageUpgrader
+        upgraded_packages = PackageUpgrader(selected_packages, filenames, options,
+                                            cli.create_wheelhouse(options, detector),
+                                            requirements=packages).do_upgrade()
+
+    print(json.dumps({
+        'wall_time': time.perf_counter() - started,
+        'phases': phases,
+        'peak_rss_kb': peak_rss_kb(),
+        'packages': len(packages),
+        'upgrades': len(selected_packages),
+        'upgraded': len(upgraded_packages),
+    }))
+
+
+def benchmark(index, backend, size, arguments, bin_dir):
+    """ Parent side: prepares a project of the given size and runs the scenario in a fresh interpreter """
+    with tempfile.TemporaryDirectory() as project_dir:
+        with open(os.path.join(project_dir, 'requirements.txt'), 'w') as fh:
+            for i in range(size):
+                fh.write('bench-package-{:05d}==1.0.0\n'.format(i))
+
+        environment = dict(os.environ, PYTHONPATH=REPO_DIR,
+                           PATH=bin_dir + os.pathsep + os.environ.get('PATH', ''),
+                           PIP_INDEX_URL=index.url + BACKENDS[backend],
+                           PIP_ASCENT_CACHE_DIR=os.path.join(project_dir, 'cache'))
+        before = index.snapshot_stats()
+        output = subprocess.check_output(
+            [sys.executable, os.path.abspath(__file__), '--child', '--jobs={}'.format(arguments.jobs)],
+            cwd=project_dir, env=environment)
+        after = index.snapshot_stats()
+
+    result = json.loads(output.decode('utf-8').splitlines()[-1])
+    result.update({
+        'scenario': '{}/{}'.format(backend, size),
+        'backend': backend,
+        'size': size,
+        'throughput': size / result['phases']['lookup_cold'] if result['phases']['lookup_cold'] else None,
+        'index': {name: after[name] - before[name] for name in after},
+    })
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=REPO_DIR,
+                                       stderr=subprocess.DEVNULL).decode('utf-8').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='End-to-end benchmark of pip-ascent against a local stand-in index.')
+    parser.add_argument('--sizes', default=','.join(str(size) for size in DEFAULT_SIZES),
+                        help='Comma separated numbers of packages.')
+    parser.add_argument('--backends', default=','.join(BACKENDS), help='Comma separated index flavours.')
+    parser.add_argument('--latency-ms', type=float, default=20, help='Latency of every index answer.')
+    parser.add_argument('--releases', type=int, default=30, help='Number of releases of every package.')
+    parser.add_argument('--payload-kb', type=int, default=4, help='Description size of the PyPI JSON documents.')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Ratio of index answers that are 503s.')
+    parser.add_argument('--jobs', type=int, default=8, help='Value of the --jobs option.')
+    parser.add_argument('--output', help='Report file, the report is printed when missing.')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    arguments = parser.parse_args()
+
+    if arguments.child:
+        return run_scenario(arguments.jobs)
+
+    index = FakeIndex(latency_ms=arguments.latency_ms, releases=arguments.releases,
+                      payload_kb=arguments.payload_kb, error_rate=arguments.error_rate).start()
+    results = []
+    try:
+        with tempfile.TemporaryDirectory() as bin_dir:
+            fake_pip.install(bin_dir)
+            for backend in arguments.backends.split(','):
+                for size in [int(size) for size in arguments.sizes.split(',')]:
+                    result = benchmark(index, backend, size, arguments, bin_dir)
+                    sys.stderr.write('{:<20} {:>8.2f}s {:>9.1f} pkg/s {:>8} kB\n'.format(
+                        result['scenario'], result['wall_time'], result['throughput'] or 0, result['peak_rss_kb']))
+                    results.append(result)
+    finally:
+        index.stop()
+
+    report = json.dumps({
+        'benchmark': 'end_to_end',
+        'timestamp': time.time(),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': {name: value for name, value in vars(arguments).items() if name not in ('output', 'child')},
+        'results': results,
+    }, indent=2)
+
+    if arguments.output:
+        with open(arguments.output, 'w') as fh:
+            fh.write(report + '\n')
+    else:
+        print(report)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,253 @@
+"""
+Local stand-in for a package index, serving synthetic packages.
+
+Any package name exists. Every package has the same configurable number of releases ("1.0.0", "1.1.0", ...,
+plus a trailing prerelease), each with a wheel and an sdist. The server answers:
+
+  /pypi/<name>/json               PyPI JSON document, padded with a description of --payload-kb kilobytes
+  /pypi/<name>/<version>/json     PyPI JSON document of a single release
+  /simple/<name>/                 simple page, PEP 691 JSON or PEP 503 HTML depending on the Accept header
+  /html/simple/<name>/            simple page, always HTML (servers without PEP 691 support)
+  /files/<filename>               distribution file, its digest matches the index pages
+  /files/<filename>.metadata      PEP 658 core metadata of a wheel
+  /_stats                         request counters, as JSON
+
+Responses carry an ETag and answer conditional requests with 304. Latency and error rate are configurable.
+
+Usage:
+  python benchmarks/fake_index.py [--port=<port>] [--latency-ms=<ms>] [--releases=<n>] [--payload-kb=<kb>]
+                                  [--error-rate=<ratio>]
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+
+SIMPLE_JSON_CONTENT_TYPE = 'application/vnd.pypi.simple.v1+json'
+UPLOAD_TIME = '2024-01-01T00:00:00'
+
+
+class IndexData(object):
+    """ The synthetic packages, documents are built once per package and kept in memory """
+
+    def __init__(self, releases=30, payload_kb=4):
+        self.releases = releases
+        self.payload_kb = payload_kb
+        self.pypi_json = lru_cache(maxsize=None)(self._pypi_json)
+        self.simple_json = lru_cache(maxsize=None)(self._simple_json)
+        self.simple_html = lru_cache(maxsize=None)(self._simple_html)
+
+    def versions(self):
+        versions = ['1.{}.0'.format(i) for i in range(self.releases)]
+        return versions + ['1.{}.0rc1'.format(self.releases)]
+
+    @staticmethod
+    def normalize(name):
+        return name.lower().replace('_', '-').replace('.', '-')
+
+    def files(self, name, version):
+        project = self.normalize(name).replace('-', '_')
+        filenames = ['{}-{}-py3-none-any.whl'.format(project, version), '{}-{}.tar.gz'.format(project, version)]
+        return [(filename, hashlib.sha256(self.file_content(filename)).hexdigest()) for filename in filenames]
+
+    @staticmethod
+    def file_content(filename):
+        return 'synthetic distribution {}\n'.format(filename).encode('utf-8')
+
+    def metadata(self, filename):
+        name, version = filename.split('-')[:2]
+        return ('Metadata-Version: 2.1\nName: {}\nVersion: {}\nRequires-Python: >=3.8\n\n'
+                .format(name.replace('_', '-'), version)).encode('utf-8')
+
+    def release_files(self, name, version, host):
+        return [{
+            'filename': filename,
+            'url': 'http://{}/files/{}'.format(host, filename),
+            'digests': {'sha256': digest},
+            'packagetype': 'bdist_wheel' if filename.endswith('.whl') else 'sdist',
+            'requires_python': '>=3.8',
+            'upload_time': UPLOAD_TIME,
+            'upload_time_iso_8601': UPLOAD_TIME + '.000000Z',
+            'yanked': False,
+            'yanked_reason': None,
+        } for filename, digest in self.files(name, version)]
+
+    def _pypi_json(self, name, host, version=None):
+        versions = self.versions()
+        info = {
+            'name': name,
+            'version': version or versions[-2],
+            'summary': 'Synthetic package {}'.format(name),
+            'description': 'x' * (self.payload_kb * 1024),
+            'requires_dist': [],
+            'requires_python': '>=3.8',
+        }
+        if version is not None:
+            return json.dumps({'info': info, 'urls': self.release_files(name, version, host)}).encode('utf-8')
+        releases = {vers: self.release_files(name, vers, host) for vers in versions}
+        return json.dumps({'info': info, 'releases': releases, 'urls': releases[versions[-2]]}).encode('utf-8')
+
+    def _simple_json(self, name):
+        files = []
+        for version in self.versions():
+            for filename, digest in self.files(name, version):
+                files.append({
+                    'filename': filename,
+                    'url': '/files/{}'.format(filename),
+                    'hashes': {'sha256': digest},
+                    'requires-python': '>=3.8',
+                    'upload-time': UPLOAD_TIME + 'Z',
+                    'core-metadata': filename.endswith('.whl'),
+                })
+        document = {'meta': {'api-version': '1.1'}, 'name': self.normalize(name), 'files': files}
+        return json.dumps(document).encode('utf-8')
+
+    def _simple_html(self, name):
+        links = []
+        for version in self.versions():
+            for filename, digest in self.files(name, version):
+                metadata = ' data-core-metadata="true"' if filename.endswith('.whl') else ''
+                links.append('<a href="/files/{0}#sha256={1}" data-requires-python="&gt;=3.8"{2}>{0}</a><br/>'
+                             .format(filename, digest, metadata))
+        return '<!DOCTYPE html><html><body>{}</body></html>'.format('\n'.join(links)).encode('utf-8')
+
+
+class FakeIndex(object):
+    """
+    The stand-in index server, running in a background thread.
+
+    :param port: Port to listen on, 0 picks a free one.
+    :param latency_ms: Delay added to every answer.
+    :param releases: Number of releases of every package.
+    :param payload_kb: Size of the description padding the PyPI JSON documents.
+    :param error_rate: Ratio of requests answered with a 503.
+    """
+
+    def __init__(self, port=0, latency_ms=0, releases=30, payload_kb=4, error_rate=0.0, seed=0):
+        self.data = IndexData(releases, payload_kb)
+        self.latency = latency_ms / 1000.0
+        self.error_rate = error_rate
+        self.stats = {'requests': 0, 'not_modified': 0, 'errors': 0, 'bytes': 0}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', port), _make_handler(self))
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{}'.format(self._server.server_address[1])
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='fake-index')
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def count(self, name, value=1):
+        with self._lock:
+            self.stats[name] += value
+
+    def should_fail(self):
+        with self._lock:
+            return self.error_rate > 0 and self._random.random() < self.error_rate
+
+    def snapshot_stats(self):
+        with self._lock:
+            return dict(self.stats)
+
+
+def _make_handler(index):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True  # headers and body are separate writes, don't let them wait on acks
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            path = unquote(self.path.split('?')[0])
+            if path == '/_stats':
+                return self._answer(200, 'application/json', json.dumps(index.snapshot_stats()).encode('utf-8'), False)
+
+            index.count('requests')
+            if index.latency:
+                time.sleep(index.latency)
+            if index.should_fail():
+                index.count('errors')
+                return self._answer(503, 'text/plain', b'unavailable', False)
+
+            answer = self._route([part for part in path.split('/') if part])
+            if answer is None:
+                return self._answer(404, 'text/plain', b'not found', False)
+            self._answer(200, *answer)
+
+        def _route(self, parts):
+            host = self.headers.get('Host', '127.0.0.1')
+            if len(parts) == 3 and parts[0] == 'pypi' and parts[2] == 'json':
+                return 'application/json', index.data.pypi_json(parts[1], host)
+            if len(parts) == 4 and parts[0] == 'pypi' and parts[3] == 'json':
+                return 'application/json', index.data.pypi_json(parts[1], host, parts[2])
+            if len(parts) == 2 and parts[0] == 'simple':
+                if SIMPLE_JSON_CONTENT_TYPE in self.headers.get('Accept', ''):
+                    return SIMPLE_JSON_CONTENT_TYPE, index.data.simple_json(parts[1])
+                return 'text/html', index.data.simple_html(parts[1])
+            if len(parts) == 3 and parts[:2] == ['html', 'simple']:
+                return 'text/html', index.data.simple_html(parts[2])
+            if len(parts) == 2 and parts[0] == 'files':
+                if parts[1].endswith('.metadata'):
+                    return 'text/plain', index.data.metadata(parts[1][:-len('.metadata')])
+                return 'application/octet-stream', index.data.file_content(parts[1])
+            return None
+
+        def _answer(self, status, content_type, body, cacheable=True):
+            etag = '"{}"'.format(hashlib.md5(body).hexdigest())
+            if cacheable and self.headers.get('If-None-Match') == etag:
+                index.count('not_modified')
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+
+            index.count('bytes', len(body))
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            if cacheable:
+                self.send_header('ETag', etag)
+            self.end_headers()
+            self.wfile.write(body)
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local stand-in for a package index, serving synthetic packages.')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency-ms', type=float, default=0)
+    parser.add_argument('--releases', type=int, default=30)
+    parser.add_argument('--payload-kb', type=int, default=4)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    arguments = parser.parse_args()
+
+    index = FakeIndex(arguments.port, arguments.latency_ms, arguments.releases, arguments.payload_kb,
+                      arguments.error_rate)
+    print('Serving synthetic packages on {}'.format(index.url))
+    try:
+        index._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""
+Stand-in for the pip executable: accepts "pip install" calls without installing anything.
+
+Environment variables:
+  FAKE_PIP_LOG        File receiving one line per call, with the arguments.
+  FAKE_PIP_FAIL       Comma separated package names whose installation fails.
+  FAKE_PIP_DELAY_MS   Time spent per installed package.
+
+install(bin_dir) writes a "pip" wrapper in bin_dir, to put first on the PATH.
+"""
+import os
+import re
+import stat
+import sys
+import time
+
+
+def install(bin_dir):
+    """ Writes an executable "pip" wrapper running this module, returns its path """
+    path = os.path.join(bin_dir, 'pip')
+    with open(path, 'w') as fh:
+        fh.write('#!/bin/sh\nexec "{}" "{}" "$@"\n'.format(sys.executable, os.path.abspath(__file__)))
+    os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    return path
+
+
+def main(arguments):
+    if os.environ.get('FAKE_PIP_LOG'):
+        with open(os.environ['FAKE_PIP_LOG'], 'a') as fh:
+            fh.write(' '.join(arguments) + '\n')
+
+    if not arguments or arguments[0] != 'install':
+        return 0
+
+    requirements = [argument for argument in arguments[1:] if not argument.startswith('-')]
+    failing = {name.strip().lower() for name in os.environ.get('FAKE_PIP_FAIL', '').split(',') if name.strip()}
+    for requirement in requirements:
+        if re.split(r'[=<>!~\[; ]', requirement, 1)[0].lower() in failing:
+            sys.stderr.write('ERROR: Could not install {}\n'.format(requirement))
+            return 1
+
+    time.sleep(float(os.environ.get('FAKE_PIP_DELAY_MS', 0)) * len(requirements) / 1000.0)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,109 @@
+"""
+Cold startup benchmark of the pip-ascent CLI.
+
+Every scenario runs the CLI in fresh interpreters and keeps the best wall time, minus the time of an empty
+interpreter, so only our own startup cost is measured. The run fails when a scenario goes over the budget,
+or when the CLI imports a module that must stay lazy.
+
+Usage:
+  python benchmarks/import_time.py [--budget-ms=<ms>] [--runs=<n>]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_BUDGET_MS = 100
+DEFAULT_RUNS = 7
+
+# modules of the later stages, they must not be imported by the CLI module itself
+LAZY_MODULES = ('requests', 'urllib3', 'pip', 'pkg_resources', 'terminaltables', 'packaging.requirements', 'sqlite3')
+
+SCENARIOS = [
+    ('--version', ['--version']),
+    ('--help', ['--help']),
+    ('status (no daemon)', ['status', '--socket={tmp}/missing.sock']),
+    ('no requirements file', ['--skip-virtualenv-check']),
+]
+
+# pip internals are never imported, the pip configuration files are located and read without them
+PIP_FREE_DETECTORS = [
+    ('pip configuration files', {}, {}),
+    ('PIP_INDEX_URL', {'PIP_INDEX_URL': 'http://127.0.0.1:1/simple/'}, {}),
+    ('--use-default-index', {}, {'--use-default-index': True}),
+]
+
+
+def _environment(extra=None):
+    """ Environment of the measured interpreters: the repository on the path, no custom index url """
+    environment = dict(os.environ, PYTHONPATH=REPO_DIR)
+    environment.pop('PIP_INDEX_URL', None)
+    environment.update(extra or {})
+    return environment
+
+
+def best_time(arguments, runs, cwd):
+    best = None
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable] + arguments, cwd=cwd, env=_environment(),
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def imported_modules(code, extra_environment=None):
+    output = subprocess.check_output(
+        [sys.executable, '-c', code + '\nimport json, sys\nprint(json.dumps(sorted(sys.modules)))'],
+        env=_environment(extra_environment), cwd=REPO_DIR)
+    return set(json.loads(output.decode('utf-8').splitlines()[-1]))
+
+
+def lazy_violations(modules):
+    return sorted(name for name in LAZY_MODULES if name in modules)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Cold startup benchmark of the pip-ascent CLI.')
+    parser.add_argument('--budget-ms', type=float, default=DEFAULT_BUDGET_MS,
+                        help='Startup budget of every scenario, on top of an empty interpreter.')
+    parser.add_argument('--runs', type=int, default=DEFAULT_RUNS, help='Number of runs per scenario.')
+    arguments = parser.parse_args()
+
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        baseline = best_time(['-c', 'pass'], arguments.runs, tmp)
+        print('empty interpreter: {:.1f} ms'.format(baseline * 1000))
+
+        for name, cli_arguments in SCENARIOS:
+            cli_arguments = [argument.format(tmp=tmp) for argument in cli_arguments]
+            elapsed = (best_time(['-m', 'pip_ascent.cli'] + cli_arguments, arguments.runs, tmp) - baseline) * 1000
+            over = elapsed > arguments.budget_ms
+            print('{:<24} {:>7.1f} ms{}'.format(name, elapsed, '  OVER BUDGET' if over else ''))
+            if over:
+                failures.append('{} takes {:.1f} ms, budget is {:.1f} ms'.format(name, elapsed, arguments.budget_ms))
+
+    violations = lazy_violations(imported_modules('import pip_ascent.cli'))
+    if violations:
+        failures.append('importing pip_ascent.cli loads {}'.format(', '.join(violations)))
+
+    for name, environment, options in PIP_FREE_DETECTORS:
+        code = ('from pip_ascent.PackageStatusDetector import PackageStatusDetector\n'
+                'PackageStatusDetector([], dict({{"--check-greater-equal": False, "--no-cache": True}}, **{!r}))'
+                .format(options))
+        if 'pip' in imported_modules(code, environment):
+            failures.append('the index lookup imports pip internals with {}'.format(name))
+
+    for failure in failures:
+        print('FAIL: {}'.format(failure))
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
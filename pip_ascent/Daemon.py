@@ -0,0 +1,327 @@
+import json
+import os
+import socketserver
+import threading
+import time
+
+from colorclass import Color
+from packaging.utils import canonicalize_name
+
+from pip_ascent.daemon_client import query_daemon
+from pip_ascent.IndexCache import DEFAULT_TTL
+from pip_ascent.options import numeric_option
+from pip_ascent.PackageDetector import PackageDetector
+from pip_ascent.PackageStatusDetector import PackageStatusDetector
+
+DEFAULT_POLL_INTERVAL = 2  # seconds
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """ Answers one JSON command per connection """
+
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.readline().decode('utf-8'))
+        except ValueError:
+            request = None
+        if isinstance(request, dict):
+            answer = self.server.daemon.handle_command(request.get('command'), request)
+        else:
+            answer = {'ok': False, 'error': 'invalid request'}
+        self.wfile.write(json.dumps(answer).encode('utf-8') + b'\n')
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    daemon = None
+
+
+class Daemon(object):
+    """
+    Keeps the index metadata of the packages of a project warm in memory, and answers status queries
+    over a local Unix socket.
+
+    The requirements files are polled for changes, and detected again to pick up new ones: a new or changed
+    file is parsed again, and only the packages it adds are looked up on the index, changed pins are answered
+    from memory. Every package is refreshed in the background once the cache ttl has elapsed, through the
+    pooled sessions and the on-disk cache (so unchanged packages only cost a conditional request).
+    """
+
+    socket_path = None
+    poll_interval = DEFAULT_POLL_INTERVAL
+    refresh_interval = DEFAULT_TTL
+    filenames = []
+    index_urls = (None, [])
+
+    def __init__(self, detect_files, options, socket_path):
+        """
+        Initializes the Daemon instance.
+
+        :param detect_files: Callable returning the requirements files of the project, called again whenever
+                             a requirements file changes (to follow new inclusions).
+        :param options: Command-line options.
+        :param socket_path: Path of the Unix socket to listen on.
+        :raises ValueError: for invalid index options, see PackageStatusDetector.
+        """
+        self.detect_files = detect_files
+        self.socket_path = socket_path
+        self.poll_interval = numeric_option(options, '--poll-interval', DEFAULT_POLL_INTERVAL, cast=float)
+        self.refresh_interval = numeric_option(options, '--cache-ttl', DEFAULT_TTL, minimum=1)
+        self.options = options
+        # the indexes set in the requirements files, like the other commands
+        self.index_urls = PackageDetector(detect_files(), quiet=True).get_index_urls()
+        self.detector = PackageStatusDetector([], options, index_urls=self.index_urls)
+
+        self.filenames = []
+        self._files = {}  # filename -> (mtime, pinned packages, sources, index urls)
+        self._indexes = {}  # canonical name -> VersionIndex
+        self._errors = {}  # canonical name -> reason of the last failed lookup
+        self._refreshed_at = None
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._server = None
+
+    def run(self):
+        """ Warms up, then serves until stopped with the stop command or Ctrl+C """
+        if self._is_listening():
+            print(Color('{{autored}}A pip-ascent daemon is already listening on {}{{/autored}}'.format(
+                self.socket_path)))
+            self.detector.close()
+            return
+
+        try:
+            self._serve()
+        finally:
+            self.detector.close()
+
+    def _serve(self):
+        started = time.time()
+        self._reload_files()
+        self._refresh(self._pinned_names(), full=True)
+        print(Color('{{autogreen}}Loaded {} package(s) from {} requirements file(s) in {:.2f}s{{/autogreen}}'.format(
+            len(self._indexes), len(self.filenames), time.time() - started)))
+
+        self._listen()
+        watcher = threading.Thread(target=self._watch, name='pip-ascent-watcher')
+        watcher.daemon = True
+        watcher.start()
+
+        print(Color('Listening on {{autoyellow}}{}{{/autoyellow}}'.format(self.socket_path)))
+        try:
+            self._server.serve_forever()
+        finally:
+            self._stopped.set()
+            self._server.server_close()
+            self._unlink_socket()
+
+    def handle_command(self, command, request):
+        """
+        Answers a client command.
+
+        :param command: "status", "ping" or "stop".
+        :param request: The whole decoded request.
+        :return: A JSON serializable dict.
+        """
+        if command == 'ping':
+            return {'ok': True, 'pid': os.getpid()}
+        if command == 'status':
+            return dict(self.status(), ok=True)
+        if command == 'stop':
+            # shutdown() waits for serve_forever() to return, it cannot run in the serving thread
+            threading.Thread(target=self._server.shutdown).start()
+            return {'ok': True}
+        return {'ok': False, 'error': 'unknown command: {}'.format(command)}
+
+    def status(self):
+        """
+        Computes the status of every pinned package from the in-memory indexes, in requirements order.
+
+        :return: A dict with the requirements files, the time of the last index refresh, the package
+                 statuses and the failed lookups.
+        """
+        with self._lock:
+            filenames = list(self.filenames)
+            files = dict(self._files)
+            indexes = dict(self._indexes)
+            errors = dict(self._errors)
+            refreshed_at = self._refreshed_at
+
+        statuses, sources = {}, {}
+        for filename in filenames:
+            _, pinned, file_sources, _ = files[filename]
+            for canonical_name, locations in file_sources.items():
+                sources.setdefault(canonical_name, []).extend(locations)
+
+            for package_name, current_version, specifier in pinned:
+                canonical_name = canonicalize_name(package_name)
+                if canonical_name not in indexes:
+                    continue
+
+                package_status, reason = self.detector.package_status(package_name, current_version,
+                                                                      indexes[canonical_name], specifier)
+                if not package_status:  # pragma: nocover
+                    errors[canonical_name] = reason
+                    continue
+
+                # a single status per package: the one of its oldest pin
+                existing_status = statuses.get(canonical_name)
+                if existing_status is None or current_version < existing_status['current_version']:
+                    statuses[canonical_name] = package_status
+
+        packages = []
+        for canonical_name, package_status in statuses.items():
+            packages.append({
+                'name': package_status['name'],
+                'current_version': package_status.get('specifier') or str(package_status['current_version']),
+                'latest_version': str(package_status['latest_version']),
+                'upgrade_available': package_status['upgrade_available'],
+                'upload_time': package_status['upload_time'],
+                'sources': sources.get(canonical_name, []),
+            })
+
+        return {
+            'files': filenames,
+            'refreshed_at': refreshed_at,
+            'packages': packages,
+            'errors': errors,
+        }
+
+    def _watch(self):
+        """ Polls the requirements files for changes, and refreshes every package after the refresh interval """
+        while not self._stopped.wait(self.poll_interval):
+            try:
+                # the files are detected again too, to pick up new ones (a requirements file added to the workspace)
+                filenames = self.detect_files()
+                if filenames != self.filenames or self._changed_files():
+                    index_urls = self.index_urls
+                    added = self._reload_files(filenames)
+                    if self.index_urls != index_urls:
+                        # another index may know other versions, every package is looked up again
+                        self._refresh(self._pinned_names(), full=True)
+                    elif added:
+                        self._refresh(added)
+
+                if time.time() - self._refreshed_at >= self.refresh_interval:
+                    self._refresh(self._pinned_names(), full=True)
+            except Exception as e:  # noqa  # pragma: nocover
+                print(Color('{{autored}}Error while refreshing: {}{{/autored}}'.format(e)))
+
+    def _changed_files(self):
+        for filename, (mtime, _, _, _) in list(self._files.items()):
+            if self._mtime(filename) != mtime:
+                return True
+        return False
+
+    def _reload_files(self, filenames=None):
+        """
+        Detects the requirements files again and parses the new or changed ones. The index options of the files are
+        followed: the detector is rebuilt when they change.
+
+        :param filenames: The requirements files, when they were just detected.
+
+        :return: Names of the packages that are not indexed yet.
+        """
+        if filenames is None:
+            filenames = self.detect_files()
+        files = {}
+        for filename in filenames:
+            mtime = self._mtime(filename)
+            known = self._files.get(filename)
+            if known is not None and known[0] == mtime:
+                files[filename] = known
+                continue
+
+            package_detector = PackageDetector([filename])
+            pinned = [(package_name, current_version, self.detector.range_specifier(requirement))
+                      for _, requirement, package_name, current_version
+                      in self.detector.pinned_packages(package_detector.get_packages())]
+            files[filename] = (mtime, pinned, package_detector.get_sources(), package_detector.get_index_urls())
+            if known is not None:
+                print(Color('Reloaded {{autoyellow}}{}{{/autoyellow}}'.format(filename)))
+
+        index_urls = self._index_urls(filenames, files)
+        previous_detector = None
+        if index_urls != self.index_urls:
+            previous_detector = self.detector
+            self.detector = PackageStatusDetector([], self.options, index_urls=index_urls)
+            self.index_urls = index_urls
+
+        with self._lock:
+            self.filenames = filenames
+            self._files = files
+        if previous_detector is not None:
+            previous_detector.close()
+
+        return [package_name for package_name in self._pinned_names()
+                if canonicalize_name(package_name) not in self._indexes]
+
+    def _refresh(self, package_names, full=False):
+        """
+        Looks the packages up on the index, and swaps their in-memory indexes.
+
+        :param package_names: Names of the packages to refresh.
+        :param full: Whether every package is refreshed, indexes of packages no longer pinned are dropped.
+        """
+        indexes, errors = {}, {}
+        for package_name, version_index, reason in self.detector.fetch_version_indexes(package_names):
+            if version_index is None:  # pragma: nocover
+                errors[canonicalize_name(package_name)] = reason
+            else:
+                indexes[canonicalize_name(package_name)] = version_index
+
+        with self._lock:
+            if full:
+                self._indexes, self._errors = indexes, errors
+                self._refreshed_at = time.time()
+            else:
+                self._indexes.update(indexes)
+                for canonical_name in indexes:
+                    self._errors.pop(canonical_name, None)
+                self._errors.update(errors)
+
+    @staticmethod
+    def _index_urls(filenames, files):
+        """ The indexes set across the requirements files, as PackageDetector.get_index_urls() reads them """
+        index_url, extra_index_urls = None, []
+        for filename in filenames:
+            file_index_url, file_extra_index_urls = files[filename][3]
+            index_url = file_index_url or index_url
+            extra_index_urls.extend(file_extra_index_urls)
+        return index_url, extra_index_urls
+
+    def _pinned_names(self):
+        """ Distinct names of the pinned packages, across all the requirements files """
+        names = {}
+        for filename in self.filenames:
+            for package_name, _, _ in self._files[filename][1]:
+                names.setdefault(canonicalize_name(package_name), package_name)
+        return list(names.values())
+
+    def _listen(self):
+        self._unlink_socket()
+        self._server = _UnixServer(self.socket_path, _RequestHandler)
+        self._server.daemon = self
+        os.chmod(self.socket_path, 0o600)  # only the owner may query the daemon
+
+    def _is_listening(self):
+        """ Whether another daemon answers on the socket; a leftover socket of a dead daemon is removed """
+        if not os.path.exists(self.socket_path):
+            return False
+        try:
+            return query_daemon('ping', self.socket_path, timeout=1).get('ok', False)
+        except IOError:
+            self._unlink_socket()
+            return False
+
+    def _unlink_socket(self):
+        try:
+            os.unlink(self.socket_path)
+        except OSError:
+            pass
+
+    @staticmethod
+    def _mtime(filename):
+        try:
+            return os.stat(filename).st_mtime_ns
+        except OSError:
+            return None
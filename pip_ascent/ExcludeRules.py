@@ -0,0 +1,101 @@
+import os
+import re
+
+
+def _translate(pattern):
+    """ Translates a .gitignore glob into a regular expression matching slash separated paths """
+    regex = ''
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if pattern.startswith('**/', i):
+            regex += '(?:.*/)?'
+            i += 3
+            continue
+        if pattern.startswith('**', i):
+            regex += '.*'
+            i += 2
+            continue
+        if char == '*':
+            regex += '[^/]*'
+        elif char == '?':
+            regex += '[^/]'
+        elif char == '[':
+            end = pattern.find(']', i + 1)
+            if end == -1:
+                regex += re.escape(char)
+            else:
+                content = pattern[i + 1:end]
+                if content.startswith('!'):
+                    content = '^' + content[1:]
+                regex += '[{}]'.format(content.replace('\\', '\\\\'))
+                i = end
+        elif char == '\\' and i + 1 < len(pattern):
+            i += 1
+            regex += re.escape(pattern[i])
+        else:
+            regex += re.escape(char)
+        i += 1
+    return re.compile(regex + r'(?:/.*)?\Z')
+
+
+class ExcludeRules(object):
+    """
+    Ordered set of .gitignore-style exclude rules; like git, the last matching rule wins.
+
+    Supported syntax: comments, "!" negation, trailing "/" for directories only, patterns anchored
+    to their base directory when they contain a slash, "*", "?", "[...]" and "**".
+    """
+
+    rules = ()
+
+    def __init__(self, rules=()):
+        # (base directory, compiled pattern, negated, directories only, anchored)
+        self.rules = tuple(rules)
+
+    def extend(self, base_dir, patterns):
+        """
+        Returns a new ExcludeRules with the patterns appended, relative to base_dir.
+
+        :param base_dir: Directory the patterns are relative to.
+        :param patterns: Iterable of .gitignore lines.
+        """
+        rules = list(self.rules)
+        for pattern in patterns:
+            pattern = pattern.rstrip('\n').rstrip()
+            if not pattern or pattern.startswith('#'):
+                continue
+
+            negated = pattern.startswith('!')
+            if negated:
+                pattern = pattern[1:]
+            dir_only = pattern.endswith('/')
+            pattern = pattern.rstrip('/')
+            anchored = '/' in pattern
+            pattern = pattern.lstrip('/')
+            if pattern:
+                rules.append((base_dir, _translate(pattern), negated, dir_only, anchored))
+        return ExcludeRules(rules)
+
+    def extend_from_file(self, base_dir, filename):
+        """ Same as extend, with the patterns read from a .gitignore file, if it exists """
+        try:
+            with open(filename) as fh:
+                return self.extend(base_dir, fh.readlines())
+        except (IOError, UnicodeDecodeError):
+            return self
+
+    def is_excluded(self, path, is_dir=False):
+        excluded = False
+        for base_dir, pattern, negated, dir_only, anchored in self.rules:
+            if dir_only and not is_dir:
+                continue
+
+            relative_path = os.path.relpath(path, base_dir).replace(os.sep, '/')
+            if relative_path.startswith('../'):
+                continue
+
+            subject = relative_path if anchored else relative_path.rsplit('/', 1)[-1]
+            if pattern.match(subject):
+                excluded = not negated
+        return excluded
@@ -0,0 +1,92 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from colorclass import Color
+from packaging.utils import canonicalize_name
+
+from pip_ascent.options import DEFAULT_JOBS, numeric_option
+from pip_ascent.Wheelhouse import DIGEST_ALGORITHMS
+
+
+class HashPinner(object):
+    """
+    Collects the digests of the new versions of the hash-pinned requirements (--hash), for pip's hash-checking mode.
+
+    The digests of every file of a release are read from the index (the "digests" of the PyPI JSON API, the
+    "hashes" of PEP 691 pages or the URL fragments of PEP 503 pages), concurrently and without downloading any
+    distribution. The algorithms of the current --hash options are kept, every file gets the digest of the
+    strongest one the index publishes. An upgrade is left out when the index does not publish a digest of every
+    file of its release, as pip would refuse to install it.
+    """
+
+    detector = None
+    algorithms = None
+    jobs = DEFAULT_JOBS
+
+    def __init__(self, detector, requirement_lines, options):
+        """
+        Initializes the HashPinner instance.
+
+        :param detector: PackageStatusDetector listing the release files, on the indexes it was configured with.
+        :param requirement_lines: RequirementLine records, as detected by PackageDetector.
+        :param options: Command-line options.
+        """
+        self.detector = detector
+        self.jobs = numeric_option(options, '--jobs', DEFAULT_JOBS, minimum=1)
+        self.algorithms = {}  # canonical name -> algorithms of its --hash options
+        for requirement in requirement_lines:
+            for hash_option in requirement.hashes:
+                self.algorithms.setdefault(requirement.canonical_name, set()).add(hash_option.split(':', 1)[0])
+
+    def collect(self, selected_packages):
+        """
+        Sets the "hashes" of the selected packages that are hash-pinned: the "<algorithm>:<digest>" list of every
+        file of their new version.
+
+        :param selected_packages: Package status dicts, with the name and latest_version.
+        :return: The selected packages that are not hash-pinned or whose digests are known, in the same order.
+        """
+        pinned = [package for package in selected_packages if canonicalize_name(package['name']) in self.algorithms]
+        if not pinned:
+            return selected_packages
+
+        with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+            results = list(executor.map(self._release_hashes, pinned))
+
+        dropped = set()
+        for package, (hashes, reason) in zip(pinned, results):
+            if hashes:
+                package['hashes'] = hashes
+                continue
+            dropped.add(package['name'])
+            print(Color('{{autored}}Not upgrading {} to {}: {}{{/autored}}'.format(
+                package['name'], package['latest_version'], reason)))
+
+        print(Color('{{autogreen}}Collected the digests of {} hash-pinned package(s){{/autogreen}}'.format(
+            len(pinned) - len(dropped))))
+        return [package for package in selected_packages if package['name'] not in dropped]
+
+    def _release_hashes(self, package):
+        """
+        :return: Tuple of the sorted "<algorithm>:<digest>" list (None when incomplete), and the reason it is.
+        """
+        pinned_algorithms = self.algorithms[canonicalize_name(package['name'])]
+        # strongest first, the unknown ones last
+        algorithms = sorted(pinned_algorithms, key=lambda algorithm: (
+            DIGEST_ALGORITHMS.index(algorithm) if algorithm in DIGEST_ALGORITHMS else len(DIGEST_ALGORITHMS),
+            algorithm))
+        try:
+            files = self.detector.release_files(package['name'], package['latest_version'])
+        except Exception as e:  # noqa  # pragma: nocover
+            return None, 'could not list its files ({})'.format(e)
+        if not files:
+            return None, 'the index does not list its files'
+
+        hashes = set()
+        for file_info in files:
+            file_hashes = file_info.get('hashes') or {}
+            algorithm = next((algorithm for algorithm in algorithms if file_hashes.get(algorithm)), None)
+            if algorithm is None:
+                return None, 'the index does not publish the {} digest of {}'.format(
+                    '/'.join(algorithms), file_info['filename'])
+            hashes.add('{}:{}'.format(algorithm, file_hashes[algorithm].lower()))
+        return sorted(hashes), None
@@ -0,0 +1,277 @@
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from pip_ascent.IndexTransport import IndexTransport
+
+DEFAULT_TTL = 3600  # seconds
+DEFAULT_MAX_SIZE = 200  # megabytes
+
+# response headers kept alongside a cached body
+STORED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified')
+
+
+def user_cache_dir():
+    """
+    Returns the pip-ascent directory inside the platform user cache dir.
+
+    The location can be overridden with the PIP_ASCENT_CACHE_DIR environment variable.
+    """
+    if os.environ.get('PIP_ASCENT_CACHE_DIR'):
+        return os.environ['PIP_ASCENT_CACHE_DIR']
+
+    if sys.platform == 'win32':  # pragma: nocover
+        base_dir = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~\\AppData\\Local')
+    elif sys.platform == 'darwin':  # pragma: nocover
+        base_dir = os.path.expanduser('~/Library/Caches')
+    else:
+        base_dir = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+
+    return os.path.join(base_dir, 'pip-ascent')
+
+
+class IndexCache(object):
+    """
+    Persistent on-disk cache for index responses.
+
+    Every entry is a single file holding a JSON header line (url, validators, storage time)
+    followed by the raw response body. Fresh entries (younger than the ttl) are served without
+    any request, stale ones are revalidated with a conditional GET, where a 304 answer refreshes
+    the entry without transferring the body again. The file mtime tracks the last use, and the
+    least recently used entries are evicted once the cache grows past its size cap.
+
+    Data derived from a cached body (such as its parsed VersionIndex) can be attached to the entry,
+    it is stored in a side file and discarded as soon as the body changes.
+    """
+
+    directory = None
+    ttl = DEFAULT_TTL
+    max_size = DEFAULT_MAX_SIZE * 1024 * 1024
+    refresh = False
+    transport = None
+
+    def __init__(self, directory=None, ttl=DEFAULT_TTL, max_size=DEFAULT_MAX_SIZE, refresh=False, transport=None):
+        """
+        Initializes the IndexCache instance.
+
+        :param directory: Cache directory, defaults to the user cache dir.
+        :param ttl: Number of seconds an entry is used without revalidation.
+        :param max_size: Size cap of the cache, in megabytes.
+        :param refresh: Revalidate every entry, regardless of its age.
+        :param transport: IndexTransport used for the requests that cannot be served from disk.
+        """
+        self.directory = os.path.join(directory or user_cache_dir(), 'index')
+        self.ttl = ttl
+        self.max_size = max_size * 1024 * 1024
+        self.refresh = refresh
+        self.transport = transport or IndexTransport()
+        self._lock = threading.Lock()
+        self._size = None
+
+    def get(self, url, headers=None):
+        """
+        Performs a GET request through the cache.
+
+        :param url: The requested url.
+        :param headers: Extra request headers, the Accept header is part of the cache key.
+        :return: A requests.Response, rebuilt from disk when served from the cache.
+        """
+        headers = dict(headers or {})
+        key = self._key(url, headers.get('Accept'))
+        entry = self._load(key)
+
+        if entry is not None:
+            meta, body = entry
+            if not self.refresh and time.time() - meta['stored_at'] < self.ttl:
+                self._touch(key)
+                return self._build_response(key, url, meta, body)
+
+            if meta['headers'].get('ETag'):
+                headers['If-None-Match'] = meta['headers']['ETag']
+            if meta['headers'].get('Last-Modified'):
+                headers['If-Modified-Since'] = meta['headers']['Last-Modified']
+
+        response = self.transport.get(url, headers=headers)
+
+        if response.status_code == 304 and entry is not None:
+            meta, body = entry
+            meta['stored_at'] = time.time()
+            self._store(key, meta, body)
+            return self._build_response(key, url, meta, body)
+
+        if response.ok:
+            meta = {
+                'url': url,
+                'stored_at': time.time(),
+                'digest': hashlib.sha256(response.content).hexdigest(),
+                'headers': {name: response.headers[name] for name in STORED_HEADERS if name in response.headers},
+            }
+            self._store(key, meta, response.content)
+            response.cache_key, response.cache_digest = key, meta['digest']
+
+        return response
+
+    def get_attachment(self, response, name):
+        """
+        Returns the data attached to the cache entry of a response, None when missing or outdated.
+
+        :param response: A response returned by get().
+        :param name: Name of the attachment.
+        """
+        digest = getattr(response, 'cache_digest', None)
+        if not digest:
+            return None
+
+        path = '{}.{}'.format(self._path(response.cache_key), name)
+        try:
+            with open(path, 'r') as fh:
+                attachment = json.load(fh)
+        except (OSError, ValueError):
+            return None
+
+        if attachment.get('digest') != digest:
+            return None
+        self._touch_path(path)
+        return attachment.get('data')
+
+    def set_attachment(self, response, name, data):
+        """
+        Attaches JSON serializable data to the cache entry of a response.
+
+        :param response: A response returned by get().
+        :param name: Name of the attachment.
+        :param data: The attached data, only valid as long as the response body is unchanged.
+        """
+        digest = getattr(response, 'cache_digest', None)
+        if digest:
+            content = json.dumps({'digest': digest, 'data': data}).encode('utf-8')
+            self._write('{}.{}'.format(response.cache_key, name), b'', content)
+
+    def clear(self):
+        """ Removes every cached entry """
+        with self._lock:
+            for filename in self._entries():
+                self._remove(filename)
+            self._size = 0
+
+    @staticmethod
+    def _key(url, accept=None):
+        return hashlib.sha256('{} {}'.format(url, accept or '').encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key)
+
+    def _entries(self):
+        try:
+            return [os.path.join(self.directory, name) for name in os.listdir(self.directory)
+                    if not name.startswith('.')]
+        except OSError:
+            return []
+
+    def _load(self, key):
+        try:
+            with open(self._path(key), 'rb') as fh:
+                header = fh.readline()
+                body = fh.read()
+            return json.loads(header.decode('utf-8')), body
+        except (OSError, ValueError):
+            return None
+
+    def _store(self, key, meta, body):
+        self._write(key, json.dumps(meta).encode('utf-8') + b'\n', body)
+
+    def _write(self, key, header, body):
+        path = self._path(key)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            try:
+                previous_size = os.path.getsize(path)
+            except OSError:
+                previous_size = 0
+
+            # write to a temporary file first, concurrent readers only ever see complete entries
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.tmp-')
+            try:
+                with os.fdopen(fd, 'wb') as fh:
+                    fh.write(header)
+                    fh.write(body)
+                os.replace(tmp_path, path)
+            except BaseException:
+                self._remove(tmp_path)
+                raise
+        except OSError:  # pragma: nocover
+            return  # an unwritable cache only costs the next run a download
+
+        self._grow(len(header) + len(body) - previous_size)
+
+    def _touch(self, key):
+        self._touch_path(self._path(key))
+
+    @staticmethod
+    def _touch_path(path):
+        try:
+            os.utime(path)
+        except OSError:  # pragma: nocover
+            pass
+
+    def _grow(self, delta):
+        with self._lock:
+            if self._size is None:
+                self._size = sum(self._file_size(filename) for filename in self._entries())
+            else:
+                self._size += delta
+
+            if self._size > self.max_size:
+                self._evict()
+
+    def _evict(self):
+        """ Removes the least recently used entries until the cache is back under 90% of its cap """
+        entries = []
+        for filename in self._entries():
+            try:
+                stat = os.stat(filename)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, filename))
+
+        entries.sort()
+        self._size = sum(size for _, size, _ in entries)
+        for _, size, filename in entries:
+            if self._size <= self.max_size * 0.9:
+                break
+            self._remove(filename)
+            self._size -= size
+
+    @staticmethod
+    def _file_size(filename):
+        try:
+            return os.path.getsize(filename)
+        except OSError:
+            return 0
+
+    @staticmethod
+    def _remove(filename):
+        try:
+            os.remove(filename)
+        except OSError:
+            pass
+
+    @staticmethod
+    def _build_response(key, url, meta, body):
+        response = requests.models.Response()
+        response.status_code = 200
+        response.reason = 'OK'
+        response.url = url
+        response.headers = CaseInsensitiveDict(meta['headers'])
+        response._content = body
+        response._content_consumed = True
+        response.from_cache = True
+        response.cache_key, response.cache_digest = key, meta.get('digest')
+        return response
@@ -0,0 +1,138 @@
+import fnmatch
+import json
+import os
+import tempfile
+import threading
+import time
+
+from packaging.utils import canonicalize_name
+
+from pip_ascent.PackageIndex import PackageIndex
+
+DEFAULT_MISS_TTL = 3600  # seconds
+
+
+class IndexRouter(object):
+    """
+    Decides which indexes are queried for each package.
+
+    Routes send the packages whose canonical name matches a pattern ("acme-*" for a prefix, or a plain name) to
+    a single index; the first matching route wins. The other packages are looked up on every index, except
+    the ones known not to host them: a 404 answer is remembered in the routing table, and the index is
+    skipped for that package until the entry expires. With a filename, the table is kept across runs.
+    """
+
+    indexes = []
+    routes = []
+    filename = None
+    ttl = DEFAULT_MISS_TTL
+    refresh = False
+
+    def __init__(self, indexes, routes=(), filename=None, ttl=DEFAULT_MISS_TTL, refresh=False):
+        """
+        Initializes the IndexRouter instance.
+
+        :param indexes: The configured indexes, the primary one first.
+        :param routes: Routes as "<pattern>=<index url>" strings.
+        :param filename: JSON file keeping the routing table across runs, None to keep it in memory.
+        :param ttl: Number of seconds a miss is trusted.
+        :param refresh: Ignore the misses recorded by previous runs.
+        """
+        self.indexes = list(indexes)
+        self.routes = []
+        for route in routes:
+            pattern, index_url = self.parse_route(route)
+            self.routes.append((pattern, PackageIndex(index_url, 'route {}'.format(route))))
+
+        self.filename = filename
+        self.ttl = ttl
+        self.refresh = refresh
+        self._misses = {}  # index api url -> {canonical package name: time of the 404}
+        self._changed = False
+        self._lock = threading.Lock()
+        if filename and not refresh:
+            self._load()
+
+    @staticmethod
+    def parse_route(route):
+        """
+        Splits a "<pattern>=<index url>" route.
+
+        :raises ValueError: for malformed routes.
+        """
+        pattern, separator, index_url = route.partition('=')
+        if not separator or not pattern.strip() or not index_url.strip():
+            raise ValueError('Invalid index route "{}", expected <pattern>=<index url>'.format(route))
+        # patterns are normalized like the package names they are matched against, wildcards are kept
+        return canonicalize_name(pattern.strip()), index_url.strip()
+
+    def all_indexes(self):
+        """ The configured indexes, followed by the indexes only used by routes """
+        indexes = list(self.indexes)
+        for _, index in self.routes:
+            if index not in indexes:
+                indexes.append(index)
+        return indexes
+
+    def indexes_for(self, package_name):
+        """
+        Returns the indexes to query for a package, by priority.
+
+        :type package_name: str
+        :rtype: list[PackageIndex]
+        """
+        canonical_name = canonicalize_name(package_name)
+        for pattern, index in self.routes:
+            if fnmatch.fnmatchcase(canonical_name, pattern):
+                return [index]
+
+        if len(self.indexes) == 1:
+            return list(self.indexes)
+
+        now = time.time()
+        with self._lock:
+            indexes = [index for index in self.indexes
+                       if now - self._misses.get(index.api_url, {}).get(canonical_name, 0) >= self.ttl]
+        # when every index is known to miss the package, ask them all again rather than nothing
+        return indexes or list(self.indexes)
+
+    def record_miss(self, index, package_name):
+        """ Remembers that the index does not host the package """
+        with self._lock:
+            self._misses.setdefault(index.api_url, {})[canonicalize_name(package_name)] = time.time()
+            self._changed = True
+
+    def record_hit(self, index, package_name):
+        """ Forgets a previous miss of the index for the package """
+        canonical_name = canonicalize_name(package_name)
+        with self._lock:
+            if canonical_name in self._misses.get(index.api_url, {}):
+                del self._misses[index.api_url][canonical_name]
+                self._changed = True
+
+    def save(self):
+        """ Writes the routing table when it changed, atomically; expired entries are dropped """
+        with self._lock:
+            if not self.filename or not self._changed:
+                return
+            now = time.time()
+            misses = {api_url: {name: missed_at for name, missed_at in names.items() if now - missed_at < self.ttl}
+                      for api_url, names in self._misses.items()}
+            self._changed = False
+
+        directory = os.path.dirname(os.path.abspath(self.filename))
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_filename = tempfile.mkstemp(dir=directory, prefix='.routes.', suffix='.tmp')
+            with os.fdopen(fd, 'w') as fh:
+                json.dump({'misses': {api_url: names for api_url, names in misses.items() if names}}, fh)
+            os.replace(tmp_filename, self.filename)
+        except OSError:  # pragma: nocover
+            pass  # the routing table is an optimization, never fail a run on it
+
+    def _load(self):
+        try:
+            with open(self.filename) as fh:
+                self._misses = json.load(fh).get('misses', {})
+        except (OSError, ValueError, AttributeError):
+            self._misses = {}
@@ -0,0 +1,158 @@
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from pip_ascent.profiler import span
+from pip_ascent.RequestScheduler import THROTTLE_STATUSES, RequestScheduler
+
+DEFAULT_POOL_SIZE = 8
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF_FACTOR = 0.5
+DEFAULT_CONNECT_TIMEOUT = 5  # seconds
+DEFAULT_READ_TIMEOUT = 15  # seconds
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+MAX_RETRY_AFTER = 60  # seconds
+
+
+class IndexTransport(object):
+    """
+    HTTP transport used by every index query.
+
+    Keeps one pooled keep-alive session per index host, so consecutive lookups reuse the same
+    TCP/TLS connections, and retries connection errors, 5xx and 429 answers with an exponential backoff,
+    or after the delay of their Retry-After header. The requests in flight to each host are limited by
+    a RequestScheduler, which adapts to the latency and the throttling answers of the host.
+    """
+
+    pool_size = DEFAULT_POOL_SIZE
+    retries = DEFAULT_RETRIES
+    backoff_factor = DEFAULT_BACKOFF_FACTOR
+    connect_timeout = DEFAULT_CONNECT_TIMEOUT
+    read_timeout = DEFAULT_READ_TIMEOUT
+    scheduler = None
+
+    def __init__(self, pool_size=DEFAULT_POOL_SIZE, retries=DEFAULT_RETRIES, backoff_factor=DEFAULT_BACKOFF_FACTOR,
+                 connect_timeout=DEFAULT_CONNECT_TIMEOUT, read_timeout=DEFAULT_READ_TIMEOUT):
+        """
+        Initializes the IndexTransport instance.
+
+        :param pool_size: Number of keep-alive connections kept per host, should match the lookup concurrency. It is
+                          also the maximum number of requests in flight per host.
+        :param retries: Number of retries for connection errors and retryable statuses.
+        :param backoff_factor: Base of the exponential backoff between retries, in seconds.
+        :param connect_timeout: Timeout for establishing a connection, in seconds.
+        :param read_timeout: Timeout for waiting on the server answer, in seconds.
+        """
+        self.pool_size = pool_size
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.scheduler = RequestScheduler(pool_size)
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def get(self, url, headers=None, stream=False):
+        """
+        Performs a GET request on the pooled session of the url host.
+
+        :param url: The requested url.
+        :param headers: Extra request headers.
+        :param stream: Defer downloading the response body until it is accessed.
+        :return: A requests.Response; the last answer is returned once retries are exhausted.
+        :raises requests.ConnectionError: once the transport is closed.
+        """
+        host = self._host(url)
+        for attempt in range(self.retries + 1):
+            # checked before every attempt: a lookup still running when the transport is closed must not reopen it
+            session = self.session_for(url)
+            started = self.scheduler.acquire(host)
+            try:
+                with span(url, 'http') as http_span:
+                    response = session.get(url, headers=headers, stream=stream,
+                                           timeout=(self.connect_timeout, self.read_timeout))
+                    # the size of streamed bodies is only known upfront from the Content-Length header
+                    http_span.set(status=response.status_code, attempt=attempt,
+                                  bytes=int(response.headers.get('Content-Length') or 0) if stream else
+                                  len(response.content))
+            except requests.RequestException:
+                self.scheduler.release(host, started)
+                raise
+
+            delay = None
+            if response.status_code in RETRY_STATUSES:
+                delay = _retry_after(response.headers.get('Retry-After'))
+                if delay is None:
+                    delay = self.backoff_factor * (2 ** attempt)
+            # a throttling host is paused for every request, not only this one
+            throttled = response.status_code in THROTTLE_STATUSES
+            self.scheduler.release(host, started, response.status_code, response.elapsed.total_seconds(),
+                                   delay if throttled else None)
+
+            if delay is None or attempt == self.retries:
+                return response
+            response.close()
+            if not throttled:
+                time.sleep(delay)
+
+    def session_for(self, url):
+        """ Returns the session dedicated to the host of the url, creating it on first use """
+        host = self._host(url)
+        with self._lock:
+            if self._closed:
+                raise requests.ConnectionError('The index transport is closed: {}'.format(url))
+            session = self._sessions.get(host)
+            if session is None:
+                session = self._sessions[host] = self._create_session()
+            return session
+
+    def close(self):
+        """ Closes every pooled connection, the transport refuses the requests from then on """
+        with self._lock:
+            self._closed = True
+            for session in self._sessions.values():
+                session.close()
+            self._sessions = {}
+
+    @staticmethod
+    def _host(url):
+        parts = urlsplit(url)
+        return '{}://{}'.format(parts.scheme, parts.netloc)
+
+    def _create_session(self):
+        # only connection errors are retried here, the answers are retried by get() so that the scheduler sees them
+        retry = Retry(
+            total=self.retries,
+            backoff_factor=self.backoff_factor,
+            allowed_methods=frozenset(['GET', 'HEAD']),
+            respect_retry_after_header=False,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=retry)
+
+        session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+
+def _retry_after(value):
+    """ Seconds to wait from a Retry-After header, a number of seconds or an HTTP date; None when unset """
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds()
+        except (TypeError, ValueError):
+            return None
+    return min(max(seconds, 0.0), MAX_RETRY_AFTER)
@@ -4,6 +4,8 @@ from collections import OrderedDict
 from colorclass import Color
 from terminaltables import AsciiTable
 
+from pip_ascent.profiler import span
+
 
 def user_input(prompt=None):  # pragma: nocover
     try:
@@ -52,21 +54,28 @@ class InteractivePackageSelector(object):
     def get_packages(self):
         return self.selected_packages
 
-    def ask_for_packages(self):
-        data = [[
+    @staticmethod
+    def table_header():
+        return [
             Color('{autoblue}No.{/autoblue}'),
             Color('{autoblue}Package{/autoblue}'),
             Color('{autoblue}Current version{/autoblue}'),
             Color('{autoblue}Latest version{/autoblue}'),
             Color('{autoblue}Release date{/autoblue}'),
-        ]]
+        ]
 
+    @staticmethod
+    def table_row(i, package):
+        return [Color('{{autobgblack}}{{autogreen}} {} {{/autogreen}}{{/bgblack}}'.format(i)),
+                Color('{{autogreen}} {} {{/autogreen}}'.format(package['name'])),
+                str(package.get('specifier') or package['current_version']),
+                str(package['latest_version']),
+                package['upload_time']]
+
+    def ask_for_packages(self):
+        data = [self.table_header()]
         for i, package in self.packages_for_upgrade.items():
-            data.append([Color('{{autobgblack}}{{autogreen}} {} {{/autogreen}}{{/bgblack}}'.format(i)),
-                         Color('{{autogreen}} {} {{/autogreen}}'.format(package['name'])),
-                         package['current_version'],
-                         package['latest_version'],
-                         package['upload_time']])
+            data.append(self.table_row(i, package))
 
         print('')
         print(Color('{autogreen}Available upgrades:{/autogreen}'))
@@ -78,7 +87,8 @@ class InteractivePackageSelector(object):
             'Please choose which packages should be upgraded. '
             'Choices: "all -1 -2 -3", "q" (quit), "x" (exit) or "1 2 3"'
         )
-        choice = user_input('Choice: ').strip()
+        with span('choice', 'user_input'):  # time spent waiting on the user, not on pip-ascent
+            choice = user_input('Choice: ').strip()
 
         if not choice and not choice.strip():
             print(Color('{autored}No choice selected.{/autored}'))
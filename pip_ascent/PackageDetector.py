@@ -1,27 +1,76 @@
+import re
+from collections import OrderedDict
+
+from colorclass import Color
+from packaging.requirements import InvalidRequirement
+
+from pip_ascent.profiler import span
+from pip_ascent.RequirementLine import RequirementLine
+
+INDEX_OPTION_RE = re.compile(r'^(-i|--index-url|--extra-index-url)(?:\s*=\s*|\s+)?(\S+)')
+COMMENT_RE = re.compile(r'(^|\s+)#.*$')
+
+
 class PackageDetector(object):
     """ 
     This class takes a list of requirements files and returns the list of packages from all of them.
     """
 
     packages = []
+    sources = None
+    index_url = None
+    extra_index_urls = []
+    quiet = False
 
-    def __init__(self, requirements_files):
+    def __init__(self, requirements_files, quiet=False):
         """
         Initializes the PackageDetector instance.
 
         :param requirements_files: A list of requirement file names.
+        :param quiet: Whether the invalid requirement lines are skipped without a warning.
         """
+        self.quiet = quiet
         self.packages = []
+        self.sources = OrderedDict()
+        self.index_url = None
+        self.extra_index_urls = []
         self.detect_packages(requirements_files)
 
     def get_packages(self):
         """
         Get the list of packages detected from the requirements files.
 
-        :return: List of package names.
+        :return: List of RequirementLine records, in the order of the requirements files.
         """
         return self.packages
 
+    def get_package_names(self):
+        """
+        Get the distinct names of the detected packages, pinned or not.
+
+        :return: List of package names, in order of first appearance.
+        """
+        names = OrderedDict()
+        for requirement in self.packages:
+            names.setdefault(requirement.canonical_name, requirement.name)
+        return list(names.values())
+
+    def get_sources(self):
+        """
+        Get the locations of every package across all the requirements files.
+
+        :return: A dict of canonical package name to a list of (filename, line number) tuples.
+        """
+        return self.sources
+
+    def get_index_urls(self):
+        """
+        Get the indexes set in the requirements files, like pip the last --index-url wins.
+
+        :return: Tuple of the index url (None when not set) and the list of extra index urls.
+        """
+        return self.index_url, self.extra_index_urls
+
     def detect_packages(self, requirements_files):
         """
         Detect packages from the given requirements files.
@@ -29,33 +78,104 @@ class PackageDetector(object):
         :param requirements_files: A list of requirement file names.
         """
         for filename in requirements_files:
-            with open(filename) as fh:
-                for line in fh:
-                    self._process_req_line(line)
+            with span(filename, 'requirements_file'):
+                # newline='' keeps the original line endings, the offsets of the records point in the file text
+                with open(filename, newline='') as fh:
+                    self.detect_content(fh.read(), filename)
 
-    def _process_req_line(self, line):
+    def detect_content(self, content, filename=None):
+        """
+        Detect packages from the text of a requirements file, such as one that is not on disk.
+
+        :param content: The text of a requirements file.
+        :param filename: The name the packages are reported under in the sources, they are not when None.
+        """
+        for lineno, line, offsets in self.logical_lines(content):
+            self._process_req_line(line, filename, lineno, offsets)
+
+    @staticmethod
+    def logical_lines(content):
+        """
+        Splits a requirements file in logical lines like pip does: a line ending with a backslash continues on the
+        next one, unless it is a comment.
+
+        :param content: The text of a requirements file.
+        :return: Generator of (line number of the first line, logical line, offsets) tuples, where offsets is a
+                 list of (position in the logical line, position in content) tuples, one per physical line.
+        """
+        position = 0
+        first_lineno, parts, offsets, length = None, [], [], 0
+        for lineno, physical_line in enumerate(content.split('\n'), 1):
+            line_position, position = position, position + len(physical_line) + 1
+            line = physical_line.rstrip('\r')
+            if first_lineno is None:
+                first_lineno = lineno
+
+            continued = line.endswith('\\') and not COMMENT_RE.match(line)
+            if continued:
+                line = line[:-1]
+            parts.append(line)
+            offsets.append((length, line_position))
+            length += len(line)
+
+            if not continued:
+                yield first_lineno, ''.join(parts), offsets
+                first_lineno, parts, offsets, length = None, [], [], 0
+
+        if parts:  # pragma: nocover
+            yield first_lineno, ''.join(parts), offsets
+
+    def _process_req_line(self, line, filename=None, lineno=None, offsets=None):
         """
         Process a line from a requirements file and extract package names.
 
-        :param line: A line from a requirements file.
+        :param line: A logical line from a requirements file.
+        :param filename: The requirements file the line comes from.
+        :param lineno: The line number in the requirements file.
+        :param offsets: Positions of the line in the file, see logical_lines().
         """
-        if not line or not line.strip():
-            return
+        # comments start with a "#" at the beginning of the line or after a whitespace ("url#egg=" is kept)
+        line = COMMENT_RE.sub('', line)
+        start = len(line) - len(line.lstrip())
         line = line.strip()
+        if not line:
+            return
+
+        match = INDEX_OPTION_RE.match(line)
+        if match:
+            if match.group(1) == '--extra-index-url':
+                self.extra_index_urls.append(match.group(2))
+            else:
+                self.index_url = match.group(2)
+            return
 
-        if line.startswith('#'):
+        if line.startswith('-'):
+            # Private repositories, other files (-r, -c), editables and special flags
             return
 
-        if line.startswith('-f') or line.startswith('--find-links') or \
-                line.startswith('-i') or line.startswith('--index-url') or \
-                line.startswith('--extra-index-url') or \
-                line.startswith('--no-index') or \
-                line.startswith('-r') or \
-                line.startswith('-Z') or line.startswith('--always-unzip'):
-            # Private repositories or special flags
+        try:
+            requirement = RequirementLine(line, filename, lineno, self._shift_offsets(offsets, start))
+        except InvalidRequirement as e:
+            if self.quiet:
+                return
+            print(Color('{{autoyellow}}Skipping requirement "{}" ({}:{}): {}{{/autoyellow}}'.format(
+                line, filename, lineno, str(e).splitlines()[0])))
             return
 
-        if '#' in line:  # Inline comment in file
-            line = line.split('#')[0].strip()
+        self.packages.append(requirement)
+        if filename:
+            self.sources.setdefault(requirement.canonical_name, []).append((filename, lineno))
+
+    @staticmethod
+    def _shift_offsets(offsets, start):
+        """ The offsets of a logical line once its first characters are dropped """
+        if offsets is None:
+            return None
 
-        self.packages.append(line)
+        shifted = []
+        for text_position, file_position in offsets:
+            if text_position <= start:
+                shifted = [(0, file_position + start - text_position)]
+            else:
+                shifted.append((text_position - start, file_position))
+        return shifted
@@ -0,0 +1,64 @@
+from urllib.parse import urljoin
+
+DEFAULT_INDEX_URL = 'https://pypi.python.org/pypi/'
+
+
+class PackageIndex(object):
+    """
+    A package index to query, as configured (index url) and as queried (API flavour and url template).
+    """
+
+    index_url = None
+    origin = None
+    api_url = None
+    api_type = None
+
+    def __init__(self, index_url, origin=None):
+        """
+        Initializes the PackageIndex instance.
+
+        :param index_url: The index url, as found in the pip configuration or the requirements files.
+        :param origin: Where the index url was found, for messages.
+        """
+        self.index_url = index_url
+        self.origin = origin
+        self.api_url, self.api_type = self.prepare_api_url(index_url)
+
+    def __repr__(self):
+        return 'PackageIndex({!r})'.format(self.index_url)
+
+    def __eq__(self, other):
+        return isinstance(other, PackageIndex) and self.api_url == other.api_url
+
+    def __hash__(self):
+        return hash(self.api_url)
+
+    def package_url(self, package_name):
+        return self.api_url.format(package=package_name)
+
+    def release_url(self, package_name, release):
+        """ Url of the JSON document of a single release, PyPI JSON API only """
+        return self.package_url(package_name)[:-len('json')] + '{}/json'.format(release)
+
+    @staticmethod
+    def prepare_api_url(index_url):  # pragma: nocover
+        """
+        Returns the url template of the package pages, and the API flavour ("simple" or "pypi_json").
+
+        :param index_url: An index url, such as https://pypi.org/simple/ or https://pypi.org/pypi/
+        """
+        if not index_url.endswith('/'):
+            index_url += '/'
+
+        # simple indexes are queried through PEP 691 content negotiation (JSON, falling back to HTML)
+        if index_url.endswith('/simple/'):
+            return urljoin(index_url, '{package}/'), 'simple'
+
+        if index_url.endswith('/+simple/'):
+            return urljoin(index_url, '{package}/'), 'simple'
+
+        if '/pypi/' in index_url:
+            base_url = index_url.split('/pypi/')[0]
+            return urljoin(base_url, '/pypi/{package}/json'), 'pypi_json'
+
+        return urljoin(index_url, '/pypi/{package}/json'), 'pypi_json'
@@ -1,265 +1,708 @@
+import hashlib
 import os
 import re
-import requests
 import sys
 
-from configparser import ConfigParser, NoOptionError, NoSectionError
-from urllib.parse import urljoin
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from email.parser import HeaderParser
 
 from colorclass import Color
 from packaging import version
 from packaging.utils import canonicalize_name
-from requests import HTTPError
-
-try:
-    from pip.locations import site_config_files
-except ImportError:
-    try:
-        from pip._internal.locations import site_config_files
-    except ImportError:  # pragma: nocover
-        site_config_files = None
+from requests import RequestException
+
+from pip_ascent.IndexCache import DEFAULT_MAX_SIZE, DEFAULT_TTL, IndexCache, user_cache_dir
+from pip_ascent.index_config import USER_CONFIG_FILES, configured_indexes
+from pip_ascent.IndexRouter import IndexRouter
+from pip_ascent.IndexTransport import DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT, DEFAULT_RETRIES, IndexTransport
+from pip_ascent.options import DEFAULT_JOBS, numeric_option
+from pip_ascent.PackageIndex import DEFAULT_INDEX_URL, PackageIndex
+from pip_ascent.profiler import span
+from pip_ascent.PypiJsonReader import PypiJsonReader
+from pip_ascent.RequestScheduler import DEFAULT_PRIORITY, EXPLICIT_PRIORITY
+from pip_ascent.SnapshotIndex import SnapshotIndex
+from pip_ascent.SimpleIndexParser import SIMPLE_ACCEPT_HEADER, parse_simple_files, version_from_filename
+from pip_ascent.version_ranges import SPECIFIER_UPDATES, lower_bound, updated_clauses
+from pip_ascent.VersionIndex import VersionIndex, parse_version
 
 
 class PackageStatusDetector(object):
     packages = []
+    sources = None
     packages_status_map = {}
     PYPI_API_URL = None
     PYPI_API_TYPE = None
-    pip_config_locations = [
-        '~/.pip/pip.conf',
-        '~/.pip/pip.ini',
-        '~/.config/pip/pip.conf',
-        '~/.config/pip/pip.ini',
-    ]
+    pip_config_locations = USER_CONFIG_FILES
+    indexes = []
+    router = None
+    installed = None
+    explicit_names = frozenset()
+    pending_lookups = None
 
     check_gte = False
+    check_specifiers = False
+    specifier_update = 'bump'
+    jobs = DEFAULT_JOBS
+    transport = None
+    cache = None
+    snapshot = None
+    quiet = False
     _prerelease = False
 
-    def __init__(self, packages, options):
+    def __init__(self, packages, options, sources=None, index_urls=(None, ()), installed=None, quiet=False):
+        """
+        :param index_urls: The --index-url (or None) and the --extra-index-url list found in the requirements files.
+        :param installed: Snapshot of the installed versions (canonical name -> version), None when unknown.
+        :param quiet: Whether the messages about the indexes and the skipped pins are left out.
+        :raises ValueError: for invalid options, such as an unknown index route or a missing offline index.
+        """
         self.packages = packages
+        self.quiet = quiet
+        self.sources = sources or {}
+        self.installed = installed
         self.packages_status_map = {}
-        self.PYPI_API_URL = 'https://pypi.python.org/pypi/{package}/json'
-        self.PYPI_API_TYPE = 'pypi_json'
-
-        if not options.get('--use-default-index'):
-            self._update_index_url_from_configs()
-
-        self.check_gte = options['--check-greater-equal']
-        self._prerelease = False
-
-    def _update_index_url_from_configs(self):
-        """ Checks for alternative index-url in pip.conf """
-
-        if 'VIRTUAL_ENV' in os.environ:
-            self.pip_config_locations.append(os.path.join(os.environ['VIRTUAL_ENV'], 'pip.conf'))
-            self.pip_config_locations.append(os.path.join(os.environ['VIRTUAL_ENV'], 'pip.ini'))
-
-        if site_config_files:
-            self.pip_config_locations.extend(site_config_files)
-
-        index_url = None
-        custom_config = None
-
-        if 'PIP_INDEX_URL' in os.environ and os.environ['PIP_INDEX_URL']:
-            # environ variable takes priority
-            index_url = os.environ['PIP_INDEX_URL']
-            custom_config = 'PIP_INDEX_URL environment variable'
-        else:
-            for pip_config_filename in self.pip_config_locations:
-                if pip_config_filename.startswith('~'):
-                    pip_config_filename = os.path.expanduser(pip_config_filename)
-
-                if os.path.isfile(pip_config_filename):
-                    config = ConfigParser()
-                    config.read([pip_config_filename])
-                    try:
-                        index_url = config.get('global', 'index-url')
-                        custom_config = pip_config_filename
-                        break  # stop on first detected, because config locations have a priority
-                    except (NoOptionError, NoSectionError):  # pragma: nocover
-                        pass
-
-        if index_url:
-            self.PYPI_API_URL = self._prepare_api_url(index_url)
-            print(Color('Setting API url to {{autoyellow}}{}{{/autoyellow}} as found in {{autoyellow}}{}{{/autoyellow}}'
-                        '. Use --default-index-url to use pypi default index'.format(self.PYPI_API_URL, custom_config)))
-
-    def _prepare_api_url(self, index_url):  # pragma: nocover
-        if not index_url.endswith('/'):
-            index_url += '/'
+        self.indexes = [PackageIndex(DEFAULT_INDEX_URL)]
+        self.pending_lookups = OrderedDict()  # canonical name -> (package name, current version, range specifier)
+        self._lookup_futures = {}
+        self._cancelled = set()
 
-        if index_url.endswith('/simple/'):
-            self.PYPI_API_TYPE = 'simple_html'
-            return urljoin(index_url, '{package}/')
-
-        if index_url.endswith('/+simple/'):
-            self.PYPI_API_TYPE = 'simple_html'
-            return urljoin(index_url, '{package}/')
-
-        if '/pypi/' in index_url:
-            base_url = index_url.split('/pypi/')[0]
-            return urljoin(base_url, '/pypi/{package}/json')
+        if options.get('--offline-index'):
+            # every lookup is answered from the snapshot file, without any network access
+            try:
+                self.snapshot = SnapshotIndex(options['--offline-index'])
+            except IOError as e:
+                raise ValueError(str(e))
+        elif not options.get('--use-default-index'):
+            self._update_index_url_from_configs(*index_urls)
 
-        return urljoin(index_url, '/pypi/{package}/json')
+        # the primary index, extra indexes are only queried through the router
+        self.PYPI_API_URL, self.PYPI_API_TYPE = self.indexes[0].api_url, self.indexes[0].api_type
 
-    def detect_available_upgrades(self, options):
+        self.check_gte = options['--check-greater-equal']
+        self.check_specifiers = options.get('--check-specifiers', False)
+        self.specifier_update = options.get('--specifier-update') or 'bump'
+        if self.specifier_update not in SPECIFIER_UPDATES:
+            raise ValueError('Invalid --specifier-update "{}", expected one of: {}'.format(
+                self.specifier_update, ', '.join(SPECIFIER_UPDATES)))
+        self.jobs = numeric_option(options, '--jobs', DEFAULT_JOBS, minimum=1)
         self._prerelease = options.get('--prerelease', False)
-        explicit_packages_lower = None
-        if options['-p'] and options['-p'] != ['all']:
-            explicit_packages_lower = [pack_name.lower() for pack_name in options['-p']]
 
-        for i, package in enumerate(self.packages):
-            try:
-                package_name, pinned_version = self._expand_package(package)
-                if not package_name or not pinned_version:  # pragma: nocover
-                    # todo: treat <= or >= instead of ==
-                    continue
+        # one pooled session per index host, sized to the lookup concurrency
+        self.transport = IndexTransport(
+            pool_size=self.jobs,
+            retries=numeric_option(options, '--retries', DEFAULT_RETRIES),
+            connect_timeout=numeric_option(options, '--connect-timeout', DEFAULT_CONNECT_TIMEOUT, cast=float),
+            read_timeout=numeric_option(options, '--read-timeout', DEFAULT_READ_TIMEOUT, cast=float),
+        )
+
+        self.cache = None
+        if not options.get('--no-cache'):
+            self.cache = IndexCache(ttl=numeric_option(options, '--cache-ttl', DEFAULT_TTL),
+                                    max_size=numeric_option(options, '--cache-size', DEFAULT_MAX_SIZE),
+                                    refresh=options.get('--refresh', False),
+                                    transport=self.transport)
+
+        self.router = IndexRouter(
+            self.indexes,
+            routes=options.get('--index-route') or [],
+            filename=None if options.get('--no-cache') else os.path.join(user_cache_dir(), 'routes.json'),
+            ttl=numeric_option(options, '--cache-ttl', DEFAULT_TTL),
+            refresh=options.get('--refresh', False),
+        )
+
+        # the first index of a package is queried from its lookup thread, the other ones concurrently from here
+        self._fanout = None
+        if len(self.router.all_indexes()) > 1 and not self.snapshot:
+            self._fanout = ThreadPoolExecutor(max_workers=self.jobs * (len(self.router.all_indexes()) - 1),
+                                              thread_name_prefix='index-fanout')
+
+    def close(self):
+        """ Closes the pooled connections, the fan-out threads and the offline index """
+        self.transport.close()
+        if self._fanout is not None:
+            self._fanout.shutdown()
+        if self.snapshot is not None:
+            self.snapshot.close()
+
+    def _update_index_url_from_configs(self, requirements_index_url=None, requirements_extra_index_urls=()):
+        """ Collects the index-url and extra-index-url of the requirements files, the environment and pip.conf """
+        self.indexes = configured_indexes(requirements_index_url, requirements_extra_index_urls,
+                                          user_config_files=self.pip_config_locations)
+
+        if self.quiet:
+            return
+        primary_index = self.indexes[0]
+        if primary_index.origin:
+            print(Color('Setting API url to {{autoyellow}}{}{{/autoyellow}} as found in {{autoyellow}}{}{{/autoyellow}}'
+                        '. Use --use-default-index to use pypi default index'.format(primary_index.api_url,
+                                                                                     primary_index.origin)))
+        for index in self.indexes[1:]:
+            print(Color('Adding extra index {{autoyellow}}{}{{/autoyellow}} as found in {{autoyellow}}{}{{/autoyellow}}'
+                        .format(index.api_url, index.origin)))
 
-                if explicit_packages_lower and package_name.lower() not in explicit_packages_lower:
-                    found = False
-                    for option_package in explicit_packages_lower:
-                        if re.search(option_package, package_name.lower()):
-                            found = True
-                    if not found:
-                        # skip if explicit and not chosen
+    def detect_available_upgrades(self, options):
+        lookups = self._select_lookups(options)
+
+        # A package pinned in several files (or several times) is queried once, under its first spelling
+        distinct_names = OrderedDict()
+        for _, _, package_name, _ in lookups:
+            distinct_names.setdefault(canonicalize_name(package_name), package_name)
+
+        # Query the index concurrently, the packages chosen by name first, but report the results in the
+        # requirements order
+        with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+            lookup_order = sorted(distinct_names.items(), key=self._lookup_priority)
+            futures = {canonical_name: executor.submit(self._fetch_version_index, package_name)
+                       for canonical_name, package_name in lookup_order}
+
+            for i, package, package_name, current_version in lookups:
+                try:
+                    canonical_name = canonicalize_name(package_name)
+                    version_index, reason = futures[canonical_name].result()
+                    if version_index is None:  # pragma: nocover
+                        print(package, reason)
                         continue
 
-                current_version = version.parse(pinned_version)
-
-                if pinned_version and isinstance(current_version, version.Version):  # version parsing is correct
-                    package_status, reason = self._fetch_index_package_info(package_name, current_version)
+                    package_status, reason = self.package_status(package_name, current_version, version_index,
+                                                                 self.range_specifier(package))
                     if not package_status:  # pragma: nocover
                         print(package, reason)
                         continue
 
                     print('{}/{}: {} ... '.format(i + 1, len(self.packages), package_name), end='')
+                    if 'specifier' in package_status:
+                        print('{} (latest compatible: {}, latest: {}) '.format(
+                            package_status['specifier'], package_status['latest_compatible'] or 'none',
+                            package_status['latest_overall']), end='')
                     sys.stdout.flush()
 
                     # compare versions
-                    if current_version < package_status['latest_version']:
+                    if package_status['upgrade_available']:
                         print('upgrade available: {} ==> {} (uploaded on {})'.format(current_version,
                                                                                      package_status['latest_version'],
-                                                                                     package_status['upload_time']))
+                                                                                     package_status['upload_time']),
+                              end='')
                     else:
-                        print('up to date: {}'.format(current_version))
+                        print('up to date: {}'.format(current_version), end='')
+                    print(self._installed_note(package_name, current_version))
                     sys.stdout.flush()
 
-                    self.packages_status_map[package_name] = package_status
-            except Exception as e:  # noqa  # pragma: nocover
-                print('Error while parsing package {} (skipping). \nException: '.format(package), e)
+                    self._add_package_status(distinct_names[canonical_name], package_status)
+                except Exception as e:  # noqa  # pragma: nocover
+                    print('Error while parsing package {} (skipping). \nException: '.format(package), e)
 
+        self.router.save()
         return self.packages_status_map
 
+    def stream_status_records(self, options):
+        """
+        Looks the packages up on the index, and yields a record per package as soon as its lookup completes.
+
+        A package pinned several times is reported once, with its oldest pin and every place pinning it.
+
+        :return: Generator of JSON serializable dicts with the name, pinned_version (the lower bound of a range),
+                 specifier (None for an exact pin), installed_version (None when not installed, or without snapshot
+                 of the environment), latest_version, latest_compatible (the latest version the range allows, None
+                 for an exact pin), upgrade_available, upload_time, sources ([{"file": ..., "line": ...}]) and error
+                 (None on success).
+        """
+        for package_name, current_version, specifier, version_index, reason in self.stream_lookups(options):
+            yield self.status_record(package_name, current_version, version_index, reason, specifier)
+
+    def stream_package_statuses(self, options):
+        """
+        Looks the packages up on the index, and yields the status of each package as soon as its lookup completes,
+        without printing anything. The statuses are kept in packages_status_map too, as detect_available_upgrades()
+        does.
+
+        The packages to look up are listed in pending_lookups right away, before the first lookup completes.
+
+        :return: Generator of (package name, package status, reason) tuples; the status is None on errors.
+        """
+        return self._package_statuses(self.stream_lookups(options))
+
+    def _package_statuses(self, lookups):
+        for package_name, current_version, specifier, version_index, reason in lookups:
+            package_status = None
+            if version_index is not None:
+                package_status, reason = self.package_status(package_name, current_version, version_index, specifier)
+            if package_status:
+                self._add_package_status(package_name, package_status)
+            yield package_name, package_status, reason
+
+    def stream_lookups(self, options):
+        """
+        Looks the packages up on the index concurrently, the packages chosen by name first, and yields each result
+        as soon as its lookup completes. A package pinned several times is looked up once, with its oldest pin.
+
+        The lookups not completed yet are listed in pending_lookups (right away, before the first one completes), and
+        can be cancelled with cancel_lookups(), from another thread.
+
+        :return: Generator of (package name, current version, range specifier, VersionIndex, reason) tuples; the
+                 VersionIndex is None on errors, the range specifier None for an exact pin.
+        """
+        pins = OrderedDict()  # canonical name -> (first spelling, oldest pinned version, range of the oldest pin)
+        for _, package, package_name, current_version in self._select_lookups(options):
+            canonical_name = canonicalize_name(package_name)
+            pin = pins.get(canonical_name)
+            if pin is None or current_version < pin[1]:
+                pins[canonical_name] = (pin[0] if pin else package_name, current_version, self.range_specifier(package))
+        self.pending_lookups.update((canonical_name, pin) for canonical_name, pin in pins.items()
+                                    if canonical_name not in self._cancelled)
+        return self._stream_lookups(pins)
+
+    def _stream_lookups(self, pins):
+        with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+            futures = {}
+            for canonical_name, (package_name, _, _) in sorted(pins.items(), key=self._lookup_priority):
+                if canonical_name not in self._cancelled:
+                    futures[executor.submit(self._fetch_version_index, package_name)] = canonical_name
+            self._lookup_futures.update((canonical_name, future) for future, canonical_name in futures.items())
+
+            for future in as_completed(futures):
+                canonical_name = futures[future]
+                # a cancelled lookup is dropped, even when it was already running
+                if self.pending_lookups.pop(canonical_name, None) is None or canonical_name in self._cancelled:
+                    continue
+                package_name, current_version, specifier = pins[canonical_name]
+                try:
+                    version_index, reason = future.result()
+                except Exception as e:  # noqa  # pragma: nocover
+                    version_index, reason = None, 'Exception: {}'.format(e)
+                yield package_name, current_version, specifier, version_index, reason
+
+        self.router.save()
+
+    def cancel_lookups(self, canonical_names):
+        """
+        Cancels the lookups of stream_lookups(): the ones not started yet are never sent, the results of the running
+        ones are dropped.
+
+        :param canonical_names: Canonical names of the packages.
+        """
+        for canonical_name in canonical_names:
+            self._cancelled.add(canonical_name)
+            self.pending_lookups.pop(canonical_name, None)
+            future = self._lookup_futures.get(canonical_name)
+            if future is not None:
+                future.cancel()
+
+    def _installed_note(self, package_name, current_version):
+        """ Points out a pin that differs from the installed version """
+        if self.installed is None:
+            return ''
+        installed_version = self.installed.get(canonicalize_name(package_name))
+        if installed_version is None:
+            return ' (not installed)'
+        return ' (installed: {})'.format(installed_version) if installed_version != current_version else ''
+
+    def status_record(self, package_name, current_version, version_index, reason, specifier=None):
+        """
+        The record of a package, as streamed by stream_status_records().
+
+        :param version_index: The VersionIndex of the package, None when its lookup failed.
+        :param reason: Why the lookup failed, reported as the error of the record.
+        """
+        installed_version = self.installed.get(canonicalize_name(package_name)) if self.installed is not None else None
+        record = {
+            'name': package_name,
+            'pinned_version': str(current_version),
+            'specifier': str(specifier) if specifier is not None else None,
+            'installed_version': str(installed_version) if installed_version else None,
+            'latest_version': None,
+            'latest_compatible': None,
+            'upgrade_available': None,
+            'upload_time': None,
+            'sources': [{'file': filename, 'line': lineno}
+                        for filename, lineno in self.sources.get(canonicalize_name(package_name), [])],
+            'error': None,
+        }
+
+        package_status = None
+        if version_index is not None:
+            package_status, reason = self.package_status(package_name, current_version, version_index, specifier)
+        if not package_status:
+            record['error'] = reason
+            return record
+
+        latest_version = package_status.get('latest_overall', package_status['latest_version'])
+        latest_compatible = package_status.get('latest_compatible')
+        record.update({
+            'latest_version': str(latest_version),
+            'latest_compatible': str(latest_compatible) if latest_compatible else None,
+            'upgrade_available': package_status['upgrade_available'],
+            'upload_time': version_index.upload_time(latest_version),
+        })
+        return record
+
+    def _select_lookups(self, options):
+        """
+        Pinned packages to look up, restricted to the ones chosen with -p.
+
+        :return: List of (position, requirement line, package name, current version) tuples.
+        """
+        self._prerelease = options.get('--prerelease', False)
+        explicit_packages_lower = None
+        if options['-p'] and options['-p'] != ['all']:
+            explicit_packages_lower = [pack_name.lower() for pack_name in options['-p']]
+            self.explicit_names = {canonicalize_name(pack_name) for pack_name in options['-p']}
+
+        lookups = []
+        for i, package, package_name, current_version in self.pinned_packages():
+            if explicit_packages_lower and package_name.lower() not in explicit_packages_lower:
+                found = False
+                for option_package in explicit_packages_lower:
+                    if re.search(option_package, package_name.lower()):
+                        found = True
+                if not found:
+                    # skip if explicit and not chosen
+                    continue
+
+            lookups.append((i, package, package_name, current_version))
+        return lookups
+
+    def _lookup_priority(self, item):
+        """ Sort key of a (canonical name, ...) item: the packages named with -p are looked up first """
+        return EXPLICIT_PRIORITY if item[0] in self.explicit_names else DEFAULT_PRIORITY
+
+    def pinned_packages(self, packages=None):
+        """
+        Selects the pinned requirements, skipping the unpinned ones and invalid versions. With --check-specifiers,
+        the ranges with a lower bound are selected too, their current version is that bound.
+
+        :param packages: RequirementLine records, defaults to the packages of the detector.
+        :return: Generator of (position, requirement, package name, current version) tuples.
+        """
+        pin_types = ('==', '>=') if self.check_gte else ('==',)
+        for i, requirement in enumerate(self.packages if packages is None else packages):
+            if self.range_specifier(requirement) is not None:
+                current_version = lower_bound((operator, raw_version) for operator, raw_version, _
+                                              in requirement.clauses)
+                if current_version is not None:
+                    yield i, requirement, requirement.name, current_version
+                continue
+
+            if requirement.operator not in pin_types or requirement.version.endswith('.*'):
+                continue
+            try:
+                yield i, requirement, requirement.name, parse_version(requirement.version)
+            except version.InvalidVersion as e:  # pragma: nocover
+                if not self.quiet:
+                    print('Error while parsing package {} (skipping). \nException: '.format(requirement), e)
+
+    def range_specifier(self, requirement):
+        """
+        The specifier of a requirement checked as a range, with --check-specifiers (such as ">=4.2,<5" or "~=5.3").
+
+        :type requirement: pip_ascent.RequirementLine.RequirementLine
+        :return: The SpecifierSet, None for exact pins (and >= pins with --check-greater-equal).
+        """
+        if not self.check_specifiers or not requirement.clauses:
+            return None
+        if requirement.operator == '==' and not requirement.version.endswith('.*'):
+            return None
+        if requirement.operator == '>=' and self.check_gte:
+            return None
+        return requirement.specifier
+
+    def _add_package_status(self, package_key, package_status):
+        """ Keep a single status per package: the one of its oldest pin, with every file and line pinning it """
+        package_status['sources'] = self.sources.get(canonicalize_name(package_status['name']), [])
+        existing_status = self.packages_status_map.get(package_key)
+        if existing_status is None or package_status['current_version'] < existing_status['current_version']:
+            self.packages_status_map[package_key] = package_status
+
+    def fetch_version_indexes(self, package_names):
+        """
+        Queries the index concurrently for the given packages.
+
+        :param package_names: List of package names.
+        :return: Generator of (package name, VersionIndex, reason) tuples, in the order of package_names;
+                 the VersionIndex is None when the lookup failed.
+        """
+        with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+            futures = [executor.submit(self._fetch_version_index, package_name) for package_name in package_names]
+            for package_name, future in zip(package_names, futures):
+                try:
+                    version_index, reason = future.result()
+                except Exception as e:  # noqa  # pragma: nocover
+                    version_index, reason = None, 'Exception: {}'.format(e)
+                yield package_name, version_index, reason
+
+        self.router.save()
+
     def _fetch_index_package_info(self, package_name, current_version):
         """
         :type package_name: str
         :type current_version: version.Version
         """
+        version_index, reason = self._fetch_version_index(package_name)
+        if version_index is None:  # pragma: nocover
+            return False, reason
 
-        try:
-            package_canonical_name = package_name
-            if self.PYPI_API_TYPE == 'simple_html':
-                package_canonical_name = canonicalize_name(package_name)
-            response = requests.get(self.PYPI_API_URL.format(package=package_canonical_name), timeout=15)
-        except HTTPError as e:  # pragma: nocover
-            return False, e.message
+        return self.package_status(package_name, current_version, version_index)
 
-        if not response.ok:  # pragma: nocover
-            return False, 'API error: {}'.format(response.reason)
+    def _fetch_version_index(self, package_name):
+        """
+        Returns the VersionIndex of the package and a reason, the index is None on errors.
+
+        Every index routed for the package is queried concurrently, and their releases are merged,
+        the ones of the earlier (primary) indexes taking precedence. A lookup only fails when every index fails.
+
+        :type package_name: str
+        """
+        with span(package_name, 'package') as package_span:
+            if self.snapshot:
+                version_index = self.snapshot.load(package_name)
+                if version_index is None:  # pragma: nocover
+                    return None, 'not found in the offline index'
+                return version_index, 'success'
+
+            indexes = self.router.indexes_for(package_name)
+            futures = [self._fanout.submit(self._fetch_index_versions, index, package_name)
+                       for index in indexes[1:]]
+            results = [self._fetch_index_versions(indexes[0], package_name)] + [future.result() for future in futures]
+
+            merged_index, reasons = None, []
+            for index, (version_index, reason, status_code) in zip(indexes, results):
+                if version_index is None:
+                    if status_code == 404 and len(indexes) > 1:
+                        self.router.record_miss(index, package_name)
+                    reasons.append(reason if len(indexes) == 1 else '{} ({})'.format(reason, index.index_url))
+                    continue
 
-        if self.PYPI_API_TYPE == 'pypi_json':
-            return self._parse_pypi_json_package_info(package_name, current_version, response)
-        elif self.PYPI_API_TYPE == 'simple_html':
-            return self._parse_simple_html_package_info(package_name, current_version, response)
-        else:  # pragma: nocover
-            raise NotImplementedError('This type of PYPI_API_TYPE type is not supported')
+                self.router.record_hit(index, package_name)
+                if merged_index is None:
+                    merged_index = version_index
+                else:
+                    merged_index.update(version_index)
 
-    def _expand_package(self, package_line):
-        pin_types = ['==', '>='] if self.check_gte else ['==']
+            package_span.set(indexes=len(indexes))
+            if merged_index is None:  # pragma: nocover
+                return None, ', '.join(reasons)
+            return merged_index, 'success'
 
-        for pin_type in pin_types:
-            if pin_type in package_line:
-                name, vers = package_line.split(pin_type)
+    def _fetch_index_versions(self, index, package_name):
+        """
+        Queries a single index.
 
-                if '[' in name and name.strip().endswith(']'):
-                    name = name.split('[')[0]
+        :type index: PackageIndex
+        :type package_name: str
+        :return: Tuple of the VersionIndex (None on errors), a reason, and the HTTP status code (None without answer).
+        """
+        priority = self._lookup_priority((canonicalize_name(package_name),))
+        with span(package_name, 'index', index=index.index_url) as index_span, \
+                self.transport.scheduler.priority(priority):
+            try:
+                package_url_name = package_name
+                headers = None
+                if index.api_type == 'simple':
+                    package_url_name = canonicalize_name(package_name)
+                    headers = {'Accept': SIMPLE_ACCEPT_HEADER}
+                # JSON documents are read incrementally, don't download them upfront
+                response = self._get(index.package_url(package_url_name), headers, stream=index.api_type == 'pypi_json')
+            except RequestException as e:  # pragma: nocover
+                return None, 'API error: {}'.format(e), None
+
+            if not response.ok:  # pragma: nocover
+                response.close()
+                return None, 'API error: {}'.format(response.reason), response.status_code
+
+            index_span.set(from_cache=getattr(response, 'from_cache', False))
+
+            # the parsed index is kept next to the cached response, unchanged bodies are not parsed again
+            if self.cache:
+                cached_index = self.cache.get_attachment(response, 'versions')
+                if cached_index is not None:
+                    return VersionIndex.from_dict(cached_index), 'success', response.status_code
+
+            with span(package_name, 'parse_index', format=index.api_type):
+                if index.api_type == 'pypi_json':
+                    version_index = self._parse_pypi_json_versions(response)
+                elif index.api_type == 'simple':
+                    version_index = self._parse_simple_versions(package_name, response)
+                else:  # pragma: nocover
+                    raise NotImplementedError('This type of PYPI_API_TYPE type is not supported')
+
+            if self.cache:
+                self.cache.set_attachment(response, 'versions', version_index.to_dict())
+            return version_index, 'success', response.status_code
+
+    def release_files(self, package_name, release):
+        """
+        Lists the distribution files of a release, on the first index routed for the package that has it.
 
-                return name, vers
+        :type package_name: str
+        :type release: version.Version
+        :return: List of dicts with the filename, url, hashes, requires_python and yanked flag;
+                 empty when no index lists the release, or offline.
+        """
+        if self.snapshot:
+            return []
 
-        return None, None
+        for index in self.router.indexes_for(package_name):
+            files, _ = self._index_release(index, package_name, release)
+            if files:
+                return files
+        return []
 
-    def _parse_pypi_json_package_info(self, package_name, current_version, response):
+    def release_metadata(self, package_name, release):
         """
+        Reads the dependencies of a release without downloading any distribution: from the release document of the
+        PyPI JSON API, or from the PEP 658 core metadata file of simple indexes.
+
         :type package_name: str
-        :type current_version: version.Version
-        :type response: requests.models.Response
+        :type release: version.Version
+        :return: Dict with the requires_dist list and requires_python (None when unset), None when no index
+                 publishes the metadata of the release, or offline.
         """
+        if self.snapshot:
+            return None
 
-        data = response.json()
-        all_versions = [version.parse(vers) for vers in data['releases'].keys()]
-        if not self._prerelease:
-            filtered_versions = [vers for vers in all_versions if not vers.is_prerelease and not vers.is_postrelease]
-        else:
-            filtered_versions = all_versions
+        for index in self.router.indexes_for(package_name):
+            files, info = self._index_release(index, package_name, release)
+            if info is not None:
+                return {'requires_dist': info.get('requires_dist') or [],
+                        'requires_python': info.get('requires_python')}
 
-        if not filtered_versions:  # pragma: nocover
-            return False, 'error while parsing version'
+            for file_info in files:
+                if file_info.get('core_metadata') is None:
+                    continue
+                core_metadata = self._fetch_core_metadata(file_info)
+                if core_metadata is not None:
+                    return core_metadata
+        return None
 
-        latest_version = max(filtered_versions)
+    def _index_release(self, index, package_name, release):
+        """
+        Lists the files of a release on a single index.
 
-        # even if user did not choose prerelease, if the package from requirements is pre/post release, use it
-        if self._prerelease or current_version.is_postrelease or current_version.is_prerelease:
-            prerelease_versions = [vers for vers in all_versions if vers.is_prerelease or vers.is_postrelease]
-            if prerelease_versions:
-                if max(prerelease_versions) > latest_version:
-                    latest_version = max(prerelease_versions)
+        :return: Tuple of the file dicts, and the release info of the PyPI JSON API (None for simple indexes and on
+                 errors).
+        """
         try:
-            try:
-                latest_version_info = data['releases'][str(latest_version)][0]
-            except KeyError:  # pragma: nocover
-                # non-RFC versions, get the latest from pypi response
-                latest_version = version.parse(data['info']['version'])
-                latest_version_info = data['releases'][str(latest_version)][0]
-        except Exception:  # pragma: nocover
-            return False, 'error while parsing version'
+            if index.api_type == 'simple':
+                response = self._get(index.package_url(canonicalize_name(package_name)),
+                                     {'Accept': SIMPLE_ACCEPT_HEADER})
+                if not response.ok:  # pragma: nocover
+                    return [], None
+                return [file_info for file_info in parse_simple_files(response)
+                        if version_from_filename(file_info['filename'], package_name) == release], None
+
+            response = self._get(index.release_url(package_name, release))
+            if not response.ok:  # pragma: nocover
+                return [], None
+            document = response.json()
+        except (RequestException, ValueError):  # pragma: nocover
+            return [], None
+
+        return [{
+            'filename': file_info['filename'],
+            'url': file_info['url'],
+            'hashes': file_info.get('digests') or {},
+            'requires_python': file_info.get('requires_python'),
+            'yanked': bool(file_info.get('yanked')),
+        } for file_info in document.get('urls', [])], document.get('info') or {}
+
+    def _fetch_core_metadata(self, file_info):
+        """
+        Downloads the PEP 658 metadata file of a distribution, checked against its published digest.
 
-        upload_time = latest_version_info['upload_time'].replace('T', ' ')
+        :return: Dict with the requires_dist list and requires_python, None on errors.
+        """
+        try:
+            response = self._get(file_info['url'] + '.metadata')
+        except RequestException:  # pragma: nocover
+            return None
+        if not response.ok:  # pragma: nocover
+            return None
 
-        return {
-            'name': package_name,
-            'current_version': current_version,
-            'latest_version': latest_version,
-            'upgrade_available': current_version < latest_version,
-            'upload_time': upload_time
-        }, 'success'
+        for hash_name, hash_value in file_info['core_metadata'].items():
+            if hash_name in hashlib.algorithms_guaranteed and \
+                    hashlib.new(hash_name, response.content).hexdigest() != hash_value.lower():
+                return None  # pragma: nocover
+
+        headers = HeaderParser().parsestr(response.content.decode('utf-8', errors='replace'))
+        return {'requires_dist': headers.get_all('Requires-Dist') or [], 'requires_python': headers['Requires-Python']}
 
-    def _parse_simple_html_package_info(self, package_name, current_version, response):
+    def package_status(self, package_name, current_version, version_index, specifier=None):
         """
         :type package_name: str
         :type current_version: version.Version
-        :type response: requests.models.Response
+        :type version_index: VersionIndex
+        :param specifier: The range of the requirement (see range_specifier()), None for an exact pin. The status
+                          of a range also holds its specifier, the latest_compatible version it allows and the
+                          latest_overall version; the latest_version is the one it is upgraded to: the latest
+                          compatible one, or the latest one when the bounds can be widened to it with
+                          --specifier-update=widen.
+        :type specifier: packaging.specifiers.SpecifierSet
         """
-        pattern = r'<a.*>.*{name}-([A-z0-9\.-]*)(?:-py|\.tar).*<\/a>'.format(name=re.escape(package_name))
-        versions_match = re.findall(pattern, response.content.decode('utf-8'), flags=re.IGNORECASE)
-
-        all_versions = [version.parse(vers) for vers in versions_match]
-        filtered_versions = [vers for vers in all_versions if not vers.is_prerelease and not vers.is_postrelease]
+        # even if user did not choose prerelease, if the package from requirements is pre/post release, use it
+        include_prereleases = self._prerelease or current_version.is_postrelease or current_version.is_prerelease
+        latest_version = version_index.latest(include_prereleases)
 
-        if not filtered_versions:  # pragma: nocover
+        if latest_version is None:  # pragma: nocover
             return False, 'error while parsing version'
 
-        latest_version = max(filtered_versions)
+        package_status = {
+            'name': package_name,
+            'current_version': current_version,
+            'latest_version': latest_version,
+            'upgrade_available': current_version < latest_version,
+        }
+
+        if specifier is not None:
+            clauses = [(spec.operator, spec.version) for spec in specifier]
+            latest_compatible = version_index.latest_matching(specifier, include_prereleases)
+            target = latest_compatible
+            if self.specifier_update == 'widen' and updated_clauses(clauses, latest_version) is not None:
+                target = latest_version
+
+            # a range is only upgraded when its bounds move, "~=5.3" is up to date with 5.3.2
+            new_versions = updated_clauses(clauses, target) if target is not None else None
+            package_status.update({
+                'specifier': str(specifier),
+                'latest_compatible': latest_compatible,
+                'latest_overall': latest_version,
+                'latest_version': target or current_version,
+                'upgrade_available': new_versions is not None and new_versions != [raw for _, raw in clauses],
+            })
+
+        upload_time = version_index.upload_time(package_status['latest_version'])
+        package_status['upload_time'] = upload_time[:19].replace('T', ' ') if upload_time else '-'
+        return package_status, 'success'
+
+    def _get(self, url, headers=None, stream=False):
+        if self.cache:
+            return self.cache.get(url, headers)
+        return self.transport.get(url, headers, stream=stream)
+
+    def _parse_pypi_json_versions(self, response):
+        """
+        :type response: requests.models.Response
+        :rtype: VersionIndex
+        """
+        version_index = VersionIndex()
+        for release, upload_time, yanked in PypiJsonReader(response).releases():
+            version_index.add(release, upload_time, yanked)
+        return version_index
 
-        # even if user did not choose prerelease, if the package from requirements is pre/post release, use it
-        if self._prerelease or current_version.is_postrelease or current_version.is_prerelease:
-            prerelease_versions = [vers for vers in all_versions if vers.is_prerelease or vers.is_postrelease]
-            if prerelease_versions:
-                latest_version = max(prerelease_versions)
-
-        return {
-           'name': package_name,
-           'current_version': current_version,
-           'latest_version': latest_version,
-           'upgrade_available': current_version < latest_version,
-           'upload_time': '-'
-        }, 'success'
\ No newline at end of file
+    def _parse_simple_versions(self, package_name, response):
+        """
+        :type package_name: str
+        :type response: requests.models.Response
+        :rtype: VersionIndex
+        """
+        # a version is yanked (PEP 592) only when all of its files are
+        releases = OrderedDict()
+        for file_info in parse_simple_files(response):
+            file_version = version_from_filename(file_info['filename'], package_name)
+            if file_version is not None:
+                release = releases.setdefault(str(file_version), [file_info['upload_time'], True])
+                release[1] = release[1] and file_info['yanked']
+
+        version_index = VersionIndex()
+        for release, (upload_time, yanked) in releases.items():
+            version_index.add(release, upload_time, yanked)
+        return version_index
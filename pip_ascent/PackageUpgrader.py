@@ -1,10 +1,20 @@
 import os
+import re
+import shutil
+import tempfile
 
 import subprocess
+from collections import OrderedDict
 from subprocess import CalledProcessError
 
-import re
 from colorclass import Color
+from packaging.utils import canonicalize_name
+
+from pip_ascent.profiler import span
+from pip_ascent.version_ranges import updated_clauses
+
+# the whitespace before a --hash option, line continuations included
+HASH_SEPARATOR_RE = re.compile(r'[ \t]*(?:\\\r?\n[ \t]*)?$')
 
 
 class PackageUpgrader(object):
@@ -14,8 +24,22 @@ class PackageUpgrader(object):
     upgraded_packages = None
     dry_run = False
     check_gte = False
+    batch_install = True
+    wheelhouse = None
+    prefetched = set()
+    installed = None
+    requirements = None
 
-    def __init__(self, selected_packages, requirements_files, options):
+    def __init__(self, selected_packages, requirements_files, options, wheelhouse=None, installed=None,
+                 requirements=None):
+        """
+        :param wheelhouse: Wheelhouse the selected packages are prefetched into before pip runs, None to let pip
+                           download them.
+        :param installed: Snapshot of the installed versions (canonical name -> version), the packages already
+                          installed in their new version are not passed to pip. None when unknown.
+        :param requirements: RequirementLine records of the requirements files, as detected by PackageDetector; the
+                             new versions are written over their version tokens. None to parse the files again.
+        """
         self.selected_packages = selected_packages
         self.requirements_files = requirements_files
         self.upgraded_packages = []
@@ -25,21 +49,43 @@ class PackageUpgrader(object):
         if 'PIP_UPGRADER_SKIP_PACKAGE_INSTALLATION' in os.environ:
             skip_pkg_install = True  # pragma: nocover
         self.skip_package_installation = skip_pkg_install
+        self.batch_install = not options.get('--no-batch-install', False)
+        self.wheelhouse = wheelhouse
+        self.prefetched = set()
+        self.installed = installed
+        self.requirements = requirements
 
     def do_upgrade(self):
-        for package in self.selected_packages:
-            self._update_package(package)
+        installing = not self.dry_run and not self.skip_package_installation
+        # only the delta goes to pip: a new version may already be installed, from another branch or a previous run
+        to_install = [package for package in self.selected_packages if not self._is_installed(package)]
+        if installing and self.wheelhouse and to_install:
+            self.prefetched = self.wheelhouse.prefetch(to_install)
+
+        if self.batch_install and installing:
+            for package in self.selected_packages:
+                if self._is_installed(package):
+                    self._print_already_installed(package)
+            installed_names = {package['name'] for package in self._install_packages(to_install)}
+            installed_packages = [package for package in self.selected_packages
+                                  if package['name'] in installed_names or self._is_installed(package)]
+        else:
+            installed_packages = [package for package in self.selected_packages if self._update_package(package)]
+
+        # update only the packages that could be installed
+        self._update_requirements_files(installed_packages)
 
         return self.upgraded_packages
 
     def _update_package(self, package):
         """ Update (install) the package in current environment,
-        and if success, also replace version in file """
+        and return whether its version should be replaced in files """
         try:
             if not self.dry_run and not self.skip_package_installation:  # pragma: nocover
-                pinned = '{}=={}'.format(package['name'],
-                                         package['latest_version'])
-                subprocess.check_call(['pip', 'install', pinned])
+                if self._is_installed(package):
+                    self._print_already_installed(package)
+                else:
+                    self._pip_install([package])
             else:
                 # dry run has priority in messages
                 if self.dry_run:
@@ -48,52 +94,171 @@ class PackageUpgrader(object):
                     lbl = "Skip Install"  # pragma: nocover
                 print('[{}]: skipping package installation:'.format(lbl),
                       package['name'])
-            # update only if installation success
-            self._update_requirements_package(package)
+            return True
 
         except CalledProcessError:  # pragma: nocover
             print(Color('{{autored}}Failed to install package "{}"{{/autored}}'.format(package['name'])))
+            return False
+
+    def _is_installed(self, package):
+        return self.installed is not None and \
+            self.installed.get(canonicalize_name(package['name'])) == package['latest_version']
+
+    @staticmethod
+    def _print_already_installed(package):
+        print('[Already Installed]: skipping package installation: {}=={}'.format(package['name'],
+                                                                                  package['latest_version']))
+
+    def _install_packages(self, packages):
+        """ Install all packages with a single pip call. If it fails, bisect the selection
+        to find the failing packages, and return the ones that could be installed """
+        if not packages:
+            return []
+
+        try:
+            self._pip_install(packages)
+            return list(packages)
+        except CalledProcessError:  # pragma: nocover
+            if len(packages) == 1:
+                print(Color('{{autored}}Failed to install package "{}"{{/autored}}'.format(packages[0]['name'])))
+                return []
+
+        middle = len(packages) // 2  # pragma: nocover
+        return self._install_packages(packages[:middle]) + self._install_packages(packages[middle:])  # pragma: nocover
+
+    def _pip_install(self, packages):  # pragma: nocover
+        pinned = ['{}=={}'.format(package['name'], package['latest_version']) for package in packages]
+        with span('pip install', 'pip', packages=len(pinned)):
+            if self.wheelhouse is None:
+                subprocess.check_call(['pip', 'install'] + pinned)
+                return
+
+            find_links = '--find-links={}'.format(self.wheelhouse.directory)
+            if all(canonicalize_name(package['name']) in self.prefetched for package in packages):
+                try:
+                    subprocess.check_call(['pip', 'install', '--no-index', find_links] + pinned)
+                    return
+                except CalledProcessError:
+                    # typically a new dependency, which is not in the wheelhouse
+                    print(Color('{autoyellow}Installing from the wheelhouse failed, retrying with the index'
+                                '{/autoyellow}'))
+            subprocess.check_call(['pip', 'install', find_links] + pinned)
+
+    def _update_requirements_files(self, packages):
+        """ Write the new versions over the version tokens of the pins, reading and writing each file only once """
+        if not packages:
+            return
 
-    def _update_requirements_package(self, package):
-        for filename in set(self.requirements_files):
-            lines = []
-
-            # read current lines
-            with open(filename, 'r') as frh:
-                for line in frh:
-                    lines.append(line)
-
-            try:
-                # write updates lines
-                with open(filename, 'w') as fwh:
-                    for line in lines:
-                        line = self._maybe_update_line_package(line, package)
-                        fwh.write(line)
-            except Exception as e:  # pragma: nocover
-                # at exception, restore old file
-                with open(filename, 'w') as fwh:
-                    for line in lines:
-                        fwh.write(line)
-                raise e
-
-    def _maybe_update_line_package(self, line, package):
-        original_line = line
-        pin_type = r'[>=]=' if self.check_gte else '=='
-
-        pattern = r'\b({package}(?:\[\w*\])?{pin_type})[a-zA-Z0-9\.]+\b'.format(
-            package=re.escape(package['name']),
-            pin_type=pin_type
-        )
-
-        repl = r'\g<1>{}'.format(package['latest_version'])
-        line = re.sub(pattern, repl, line)
-
-        if line != original_line:
-            self.upgraded_packages.append(package)
-
-            if self.dry_run:  # pragma: nocover
-                print('[Dry Run]: skipping requirements replacement:',
-                      original_line.replace('\n', ''), ' / ',
-                      line.replace('\n', ''))
-                return original_line
-        return line
+        packages_by_name = OrderedDict((canonicalize_name(package['name'].strip()), package) for package in packages)
+        pin_types = ('==', '>=') if self.check_gte else ('==',)
+        upgraded_names = set()
+
+        for filename in OrderedDict.fromkeys(self.requirements_files):
+            with span(filename, 'rewrite'):
+                # newline='' keeps the original line endings
+                with open(filename, 'r', newline='') as frh:
+                    content = frh.read()
+
+                edits = []  # (start, end, replacement) tuples
+                for requirement in self._file_requirements(filename, content):
+                    package = packages_by_name.get(requirement.canonical_name)
+                    if package is None:
+                        continue
+
+                    if requirement.operator in pin_types and not requirement.version.endswith('.*'):
+                        if requirement.span is None:  # pragma: nocover
+                            continue
+                        edits.append(requirement.span + (str(package['latest_version']),))
+                    elif 'specifier' in package and requirement.clauses:
+                        range_edits = self._range_edits(requirement, package['latest_version'])
+                        if range_edits is None:  # pragma: nocover
+                            print(Color('{{autoyellow}}The range {} of {} can not start at {}, it was left unchanged '
+                                        '({}:{}){{/autoyellow}}'.format(requirement.specifier, package['name'],
+                                                                        package['latest_version'], filename,
+                                                                        requirement.lineno)))
+                            continue
+                        edits.extend(range_edits)
+                    else:
+                        continue
+
+                    upgraded_names.add(requirement.canonical_name)
+                    if requirement.hash_span is not None and package.get('hashes'):
+                        edits.append(requirement.hash_span + (self._hash_block(content, requirement.hash_span,
+                                                                               package['hashes']),))
+                    elif requirement.hashes:  # pragma: nocover
+                        print(Color('{{autoyellow}}The --hash options of {} were left unchanged ({}:{}){{/autoyellow}}'
+                                    .format(package['name'], filename, requirement.lineno)))
+
+                edits.sort()
+                updated_content = content
+                # from the end of the file, so that the offsets of the edits left are still valid
+                for start, end, replacement in reversed(edits):
+                    updated_content = updated_content[:start] + replacement + updated_content[end:]
+
+                if self.dry_run:  # pragma: nocover
+                    for start, end, replacement in edits:
+                        self._print_dry_run_replacement(content, start, end, replacement)
+                    continue
+
+                if updated_content != content:
+                    self._write_file_atomically(filename, updated_content)
+
+        self.upgraded_packages.extend(package for name, package in packages_by_name.items()
+                                      if name in upgraded_names)
+
+    def _file_requirements(self, filename, content):
+        """ The requirements of a file, as detected before the upgrade; parsed again when the file changed since """
+        requirements = [requirement for requirement in self.requirements or [] if requirement.filename == filename]
+        if self.requirements is not None and all(
+                (requirement.span is None or content[slice(*requirement.span)] == requirement.version) and
+                (requirement.hash_span is None or content.startswith('--hash', requirement.hash_span[0]))
+                for requirement in requirements):
+            return requirements
+
+        from pip_ascent.PackageDetector import PackageDetector
+        return PackageDetector([filename]).get_packages()
+
+    @staticmethod
+    def _range_edits(requirement, target):
+        """ The edits moving the bounds of a range to the target version, None when it can not admit it """
+        new_versions = updated_clauses([(operator, raw_version) for operator, raw_version, _ in requirement.clauses],
+                                       target)
+        if new_versions is None:
+            return None
+
+        edits = []
+        for (_, raw_version, clause_span), new_version in zip(requirement.clauses, new_versions):
+            if new_version != raw_version:
+                if clause_span is None:  # pragma: nocover
+                    return None
+                edits.append(clause_span + (new_version,))
+        return edits
+
+    @staticmethod
+    def _hash_block(content, hash_span, hashes):
+        """ The --hash options of the new version, laid out like the current ones (on continuation lines or not) """
+        separator = HASH_SEPARATOR_RE.search(content, max(0, hash_span[0] - 256), hash_span[0]).group(0) or ' '
+        return separator.join('--hash={}'.format(hash_option) for hash_option in hashes)
+
+    @staticmethod
+    def _print_dry_run_replacement(content, start, end, replacement):  # pragma: nocover
+        line_start = content.rfind('\n', 0, start) + 1
+        line_end = content.find('\n', end)
+        text = content[line_start:line_end if line_end != -1 else len(content)]
+        print('[Dry Run]: skipping requirements replacement:', text.rstrip('\r'), ' / ',
+              (text[:start - line_start] + replacement + text[end - line_start:]).rstrip('\r'))
+
+    @staticmethod
+    def _write_file_atomically(filename, content):
+        """ Write to a temporary file next to the original, then swap it in place,
+        so that a crash never leaves a truncated requirements file behind """
+        fd, tmp_filename = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(filename)),
+                                            prefix='.{}.'.format(os.path.basename(filename)), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', newline='') as fwh:
+                fwh.write(content)
+            shutil.copymode(filename, tmp_filename)
+            os.replace(tmp_filename, filename)
+        except BaseException:  # pragma: nocover
+            os.remove(tmp_filename)
+            raise
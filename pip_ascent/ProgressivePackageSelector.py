@@ -0,0 +1,254 @@
+import os
+import queue
+import re
+import select
+import sys
+import threading
+from collections import OrderedDict
+
+from colorclass import Color
+from terminaltables import AsciiTable
+
+from pip_ascent.InteractivePackageSelector import InteractivePackageSelector, user_input
+
+
+class ProgressivePackageSelector(InteractivePackageSelector):
+    """
+    Interactive selection that starts while the lookups are still running (--progressive).
+
+    The available upgrades are added to the table as soon as their lookup completes, and the choices are read
+    meanwhile, one line at a time: numbers select rows, "-<number>" unselects one, "all" selects every row shown so
+    far, and "-<package>" (a name or a regex, as with -p) rules packages out, cancelling their lookups when they are
+    still pending. An empty line confirms the selection, and cancels the lookups still pending.
+
+    The lookups run in a worker thread, the choices are read in the main thread, polling the standard input in between
+    the lookup results (on Windows, the results are only handled once a line is entered).
+    """
+
+    detector = None
+    poll_interval = 0.1
+
+    def __init__(self, detector, options):
+        """
+        Initializes the ProgressivePackageSelector instance, and runs the selection.
+
+        :param detector: PackageStatusDetector the packages are looked up with.
+        :param options: Command-line options.
+        """
+        self.selected_packages = []
+        self.packages_for_upgrade = OrderedDict()
+        self.detector = detector
+        self._chosen = set()
+        self._widths = None
+        self._table_open = False
+        self._events = queue.Queue()
+        self._done = False
+        self._stdin = self._stdin_fileno()
+        self._partial_line = b''
+
+        statuses = self.detector.stream_package_statuses(options)
+        self._pins = list(self.detector.pending_lookups.values())
+        lookups = threading.Thread(target=self._look_up, args=(statuses,), name='pip-ascent-lookups')
+        lookups.daemon = True
+        lookups.start()
+
+        print(Color('{autogreen}Available upgrades are listed as their lookup completes.{/autogreen}'))
+        print('Please choose which packages should be upgraded, meanwhile. Choices: "1 2 3", "all -1 -2", '
+              '"-<package>" (rule a package out), empty line (confirm), "q" (quit) or "x" (exit)')
+
+        try:
+            self._select()
+        except KeyboardInterrupt:
+            self.detector.cancel_lookups(list(self.detector.pending_lookups))
+            raise
+
+    def _look_up(self, statuses):
+        try:
+            for result in statuses:
+                self._events.put(('status', result))
+        finally:
+            self._events.put(('done', None))
+
+    def _select(self):
+        """ Handles the lookup results and the choices in turn, until the selection is confirmed """
+        while True:
+            self._handle_lookups()
+            for choice in self._read_choices():
+                if self._choose(choice, self._done):
+                    return
+
+    def _handle_lookups(self):
+        """ Adds the lookup results received so far """
+        while True:
+            try:
+                event, value = self._events.get_nowait()
+            except queue.Empty:
+                return
+
+            if event == 'status':
+                self._add_status(*value)
+                continue
+            self._done = True
+            if not self.packages_for_upgrade:
+                print(Color('{autogreen}All packages are up-to-date.{/autogreen}'))
+                raise KeyboardInterrupt()
+            self._print_line(Color('{autogreen}All lookups completed.{/autogreen}'))
+            self._print_selection()
+
+    @staticmethod
+    def _stdin_fileno():
+        """ The file descriptor of the standard input, None when it can not be polled """
+        if sys.platform == 'win32':  # pragma: nocover
+            return None  # select() only handles sockets on Windows
+        try:
+            return sys.stdin.fileno()
+        except (AttributeError, ValueError, OSError):  # pragma: nocover
+            return None
+
+    def _read_choices(self):
+        """
+        The lines entered since the last call, waiting for one at most poll_interval seconds.
+
+        :return: List of lines, the last one is None at the end of the input.
+        """
+        if self._stdin is None:  # pragma: nocover
+            try:
+                return [user_input('')]
+            except EOFError:
+                return [None]
+
+        if not select.select([self._stdin], [], [], self.poll_interval)[0]:
+            return []
+        data = os.read(self._stdin, 4096)
+        if not data:
+            # the last line may lack its line break
+            return ([self._decode(self._partial_line)] if self._partial_line else []) + [None]
+
+        lines = (self._partial_line + data).split(b'\n')
+        self._partial_line = lines.pop()
+        return [self._decode(line) for line in lines]
+
+    @staticmethod
+    def _decode(line):
+        return line.decode(getattr(sys.stdin, 'encoding', None) or 'utf-8', 'replace').rstrip('\r')
+
+    def _add_status(self, package_name, package_status, reason):
+        if package_status is None:  # pragma: nocover
+            self._print_line(Color('{{autoyellow}}{}: {}{{/autoyellow}}'.format(package_name, reason)))
+            return
+        if not package_status['upgrade_available']:
+            return
+
+        i = len(self.packages_for_upgrade) + 1
+        self.packages_for_upgrade[i] = package_status.copy()
+        self._print_row(self.table_row(i, package_status))
+
+    def _choose(self, choice, done):
+        """
+        :return: True once the selection is confirmed.
+        """
+        if choice is None or choice.strip() in ('q', 'x'):
+            print(Color('{autored}Exit.{/autored}' if choice and choice.strip() == 'x' else '{autored}Quit.{/autored}'))
+            raise KeyboardInterrupt()
+
+        tokens = choice.split()
+        if not tokens:
+            if self._chosen:
+                self._confirm()
+                return True
+            if done:
+                print(Color('{autored}No choice selected.{/autored}'))
+                raise KeyboardInterrupt()
+            self._print_line(Color('{autored}No package selected yet.{/autored}'))
+            return False
+
+        if tokens[0] == 'all':
+            self._chosen.update(self.packages_for_upgrade)
+            tokens = tokens[1:]
+
+        for token in tokens:
+            try:
+                index = int(token)
+            except ValueError:
+                index = None
+
+            if index is not None and -index in self.packages_for_upgrade:
+                self._chosen.discard(-index)
+            elif index is not None and index in self.packages_for_upgrade:
+                self._chosen.add(index)
+            elif index is None and token.startswith('-') and len(token) > 1:
+                try:
+                    self._rule_out(token[1:].lower())
+                except re.error:
+                    self._print_line(Color('{{autored}}Invalid choice: {}{{/autored}}'.format(token)))
+            else:
+                self._print_line(Color('{{autored}}Invalid choice: {}{{/autored}}'.format(token)))
+
+        self._print_selection()
+        return False
+
+    def _rule_out(self, pattern):
+        """ Unselects the packages matching the pattern, and cancels their lookups """
+        def matches(package_name):
+            return package_name.lower() == pattern or re.search(pattern, package_name.lower())
+
+        cancelled = OrderedDict((canonical_name, package_name) for canonical_name, (package_name, _, _)
+                                in list(self.detector.pending_lookups.items()) if matches(package_name))
+        self.detector.cancel_lookups(cancelled)
+        unselected = [i for i in self._chosen if matches(self.packages_for_upgrade[i]['name'])]
+        self._chosen.difference_update(unselected)
+
+        if not cancelled and not unselected:
+            self._print_line(Color('{{autored}}No pending or selected package matches {}{{/autored}}'.format(pattern)))
+        elif cancelled:
+            self._print_line(Color('{{autoyellow}}Cancelled the lookup of {}{{/autoyellow}}'.format(
+                ', '.join(cancelled.values()))))
+
+    def _confirm(self):
+        pending = list(self.detector.pending_lookups)
+        self.detector.cancel_lookups(pending)
+        if pending:
+            print(Color('{{autoyellow}}Cancelled the {} lookup(s) still pending{{/autoyellow}}'.format(len(pending))))
+        self._select_packages(sorted(self._chosen))
+
+    def _print_selection(self):
+        pending = len(self.detector.pending_lookups)
+        self._print_line('Selected: {}{}. Press enter to confirm.'.format(
+            ' '.join(str(i) for i in sorted(self._chosen)) or 'none',
+            ' ({} lookup(s) pending)'.format(pending) if pending else ''))
+
+    def _print_line(self, line):
+        print(line)
+        self._table_open = False
+
+    def _print_row(self, row):
+        """ Prints a row of the table, below the previous one unless a message was printed in between """
+        if self._widths is None:
+            self._widths = self._column_widths()
+            self._print_cells(self.table_header(), heading=True)
+
+        self._print_cells(row, heading=False)
+
+    def _print_cells(self, row, heading):
+        table = AsciiTable([[cell.ljust(width) for cell, width in zip(row, self._widths)]])
+        lines = table.table.splitlines()
+        print('\n'.join(lines if heading or not self._table_open else lines[1:]))
+        self._table_open = True
+
+    def _column_widths(self):
+        """
+        Fixed column widths, so that the rows printed one by one line up: they fit every package looked up (listed
+        before the lookups start, as pending_lookups empties while they complete), and the versions still to come
+        are expected to be about as long as the current ones.
+        """
+        pins = self._pins
+        version_width = max([len(str(current_version)) for _, current_version, _ in pins] +
+                            [len(str(specifier)) for _, _, specifier in pins if specifier is not None])
+        widths = [
+            len(' {} '.format(len(pins))),
+            max(len(' {} '.format(package_name)) for package_name, _, _ in pins),
+            version_width,
+            version_width,
+            len('YYYY-MM-DD HH:MM:SS'),
+        ]
+        return [max(len(header.value_no_colors), width) for header, width in zip(self.table_header(), widths)]
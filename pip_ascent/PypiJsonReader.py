@@ -0,0 +1,103 @@
+import json
+
+try:
+    import ijson
+except ImportError:  # pragma: nocover
+    ijson = None
+
+CHUNK_SIZE = 64 * 1024
+
+
+class _ResponseStream(object):
+    """ File-like view over the body of a response, read chunk by chunk """
+
+    def __init__(self, response):
+        self._chunks = response.iter_content(CHUNK_SIZE)
+        self._buffer = b''
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buffer) < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer += chunk
+
+        if size < 0:
+            data, self._buffer = self._buffer, b''
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+
+class PypiJsonReader(object):
+    """
+    Extracts the releases of a /pypi/<name>/json document without keeping the whole document around.
+
+    With the optional ijson package the body is parsed incrementally as it is downloaded. Otherwise the
+    document is decoded with the standard json module, where every file entry is reduced to the few
+    fields we use as soon as it is decoded.
+    """
+
+    response = None
+    info = None
+
+    def __init__(self, response):
+        """
+        :type response: requests.models.Response
+        """
+        self.response = response
+        self.info = {}
+
+    def releases(self):
+        """
+        Yields (release, upload_time, yanked) for every release that has files, in document order.
+
+        upload_time is the upload time of the first file of the release, yanked is True when all of its
+        files are yanked. The `info` attribute is filled with the document info fields as they are read.
+        """
+        if ijson is not None:
+            return self._stream_releases()
+        return self._load_releases()
+
+    def _stream_releases(self):
+        release = None
+        item_prefix = None
+        upload_time = None
+        files = yanked_files = 0
+
+        for prefix, event, value in ijson.parse(_ResponseStream(self.response)):
+            if prefix == 'releases':
+                if event == 'map_key' or event == 'end_map':
+                    if files:
+                        yield release, upload_time, files == yanked_files
+                    if event == 'map_key':
+                        release, item_prefix = value, 'releases.{}.item'.format(value)
+                        upload_time, files, yanked_files = None, 0, 0
+            elif item_prefix is not None and prefix.startswith(item_prefix):
+                if prefix == item_prefix:
+                    if event == 'start_map':
+                        files += 1
+                elif prefix == item_prefix + '.upload_time':
+                    if upload_time is None:
+                        upload_time = value
+                elif prefix == item_prefix + '.yanked':
+                    yanked_files += bool(value)
+            elif prefix.startswith('info.') and event in ('string', 'number', 'boolean', 'null'):
+                field = prefix[len('info.'):]
+                if '.' not in field:
+                    self.info[field] = value
+
+    def _load_releases(self):
+        data = json.loads(self.response.content, object_hook=self._slim_object)
+        self.info = data.get('info') or {}
+
+        for release, files in data.get('releases', {}).items():
+            if files:
+                yield release, files[0]['upload_time'], all(file_info['yanked'] for file_info in files)
+
+    @staticmethod
+    def _slim_object(obj):
+        # file entries of the releases map are the only objects carrying a filename and an upload time
+        if 'filename' in obj and 'upload_time' in obj:
+            return {'upload_time': obj['upload_time'], 'yanked': bool(obj.get('yanked', False))}
+        return obj
@@ -0,0 +1,46 @@
+import json
+
+OUTPUT_FORMATS = ('text', 'ndjson', 'json')
+
+
+class RecordWriter(object):
+    """
+    Writes machine-readable records to a stream as they come, flushing after each one.
+
+    With the "ndjson" format every record is a JSON document on its own line. With the "json" format the
+    records are the items of a single JSON array, which is opened before the first record and closed by close().
+    """
+
+    stream = None
+    output_format = 'ndjson'
+    count = 0
+
+    def __init__(self, stream, output_format='ndjson'):
+        """
+        Initializes the RecordWriter instance.
+
+        :param stream: Text stream receiving the records.
+        :param output_format: "ndjson" or "json".
+        """
+        self.stream = stream
+        self.output_format = output_format
+        self.count = 0
+        if output_format == 'json':
+            self.stream.write('[')
+            self.stream.flush()
+
+    def write(self, record):
+        data = json.dumps(record, sort_keys=True)
+        if self.output_format == 'json':
+            data = '{}\n  {}'.format(',' if self.count else '', data)
+        else:
+            data += '\n'
+
+        self.stream.write(data)
+        self.stream.flush()
+        self.count += 1
+
+    def close(self):
+        if self.output_format == 'json':
+            self.stream.write('\n]\n' if self.count else ']\n')
+            self.stream.flush()
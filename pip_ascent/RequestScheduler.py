@@ -0,0 +1,134 @@
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+
+EXPLICIT_PRIORITY = 0
+DEFAULT_PRIORITY = 1
+THROTTLE_STATUSES = (429, 503)
+
+# the latency of a host is high when it exceeds both of these, relative to the fastest answer seen
+LATENCY_FACTOR = 2.0
+LATENCY_TOLERANCE = 0.1  # seconds
+
+DECREASE_ON_THROTTLE = 0.5
+DECREASE_ON_LATENCY = 0.75
+
+
+class _HostState(object):
+    __slots__ = ('limit', 'in_flight', 'waiting', 'paused_until', 'min_latency', 'decreased_at')
+
+    def __init__(self, limit):
+        self.limit = float(limit)
+        self.in_flight = 0
+        self.waiting = []  # heap of (priority, arrival) tuples
+        self.paused_until = 0.0
+        self.min_latency = None
+        self.decreased_at = 0.0
+
+
+class RequestScheduler(object):
+    """
+    Adaptive concurrency of the index requests, per host.
+
+    Each host has its own concurrency limit, tuned with AIMD (additive increase, multiplicative decrease): it starts
+    at the maximum, grows by one request every window of fast answers, is halved by a 429 or 503 answer (or a
+    connection error), and cut by a quarter when the latency climbs well above the fastest answer of the host (its
+    queue is building up). Only the requests sent after the last decrease can decrease the limit again, so that a
+    burst of throttled answers only counts once. A Retry-After answer pauses the whole host. Requests waiting for a
+    slot are granted one by priority, then in arrival order.
+    """
+
+    max_concurrency = 8
+    min_concurrency = 1
+
+    def __init__(self, max_concurrency=8):
+        """
+        Initializes the RequestScheduler instance.
+
+        :param max_concurrency: Maximum number of requests in flight per host.
+        """
+        self.max_concurrency = max(self.min_concurrency, max_concurrency)
+        self._hosts = {}
+        self._condition = threading.Condition()
+        self._arrivals = itertools.count()
+        self._local = threading.local()
+
+    @contextmanager
+    def priority(self, priority):
+        """ Requests issued by the current thread within the block get the priority, lowest first """
+        previous = getattr(self._local, 'priority', DEFAULT_PRIORITY)
+        self._local.priority = priority
+        try:
+            yield
+        finally:
+            self._local.priority = previous
+
+    def acquire(self, host):
+        """
+        Blocks until a request to the host may start.
+
+        :return: The time the request starts, to pass to release().
+        """
+        entry = (getattr(self._local, 'priority', DEFAULT_PRIORITY), next(self._arrivals))
+        with self._condition:
+            state = self._hosts.get(host)
+            if state is None:
+                state = self._hosts[host] = _HostState(self.max_concurrency)
+            heapq.heappush(state.waiting, entry)
+
+            while True:
+                now = time.monotonic()
+                if now < state.paused_until:
+                    self._condition.wait(state.paused_until - now)
+                elif state.waiting[0] != entry or state.in_flight >= int(state.limit):
+                    self._condition.wait()
+                else:
+                    heapq.heappop(state.waiting)
+                    state.in_flight += 1
+                    # the next waiter may fit in the limit too
+                    self._condition.notify_all()
+                    return now
+
+    def release(self, host, started, status_code=None, latency=None, retry_after=None):
+        """
+        Ends a request to the host, and adapts its limit to the answer.
+
+        :param started: The time the request started, as returned by acquire().
+        :param status_code: The HTTP status of the answer, None on connection errors.
+        :param latency: Seconds until the answer headers were received, None on connection errors.
+        :param retry_after: Seconds the host asked to wait before the next request (Retry-After), None if unset.
+        """
+        with self._condition:
+            state = self._hosts[host]
+            state.in_flight -= 1
+            now = time.monotonic()
+
+            if retry_after:
+                state.paused_until = max(state.paused_until, now + retry_after)
+
+            if status_code is None or status_code in THROTTLE_STATUSES:
+                self._decrease(state, started, now, DECREASE_ON_THROTTLE)
+            else:
+                if state.min_latency is None or latency < state.min_latency:
+                    state.min_latency = latency
+                if latency > max(state.min_latency * LATENCY_FACTOR, state.min_latency + LATENCY_TOLERANCE):
+                    self._decrease(state, started, now, DECREASE_ON_LATENCY)
+                else:
+                    # one more request per window of limit fast answers
+                    state.limit = min(self.max_concurrency, state.limit + 1.0 / state.limit)
+
+            self._condition.notify_all()
+
+    def limit(self, host):
+        """ The current concurrency limit of the host """
+        with self._condition:
+            state = self._hosts.get(host)
+            return int(state.limit) if state else self.max_concurrency
+
+    def _decrease(self, state, started, now, factor):
+        if started < state.decreased_at:
+            return
+        state.limit = max(self.min_concurrency, state.limit * factor)
+        state.decreased_at = now
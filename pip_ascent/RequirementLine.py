@@ -0,0 +1,105 @@
+import re
+
+from packaging.requirements import Requirement
+from packaging.utils import canonicalize_name
+
+# the leading name and extras of a PEP 508 requirement, the version specifiers follow
+NAME_RE = re.compile(r'\s*[A-Za-z0-9][A-Za-z0-9._-]*\s*(\[[^\]]*\])?')
+SPECIFIER_RE = re.compile(r'(===|==|~=|!=|<=|>=|<|>)\s*([^\s,;()]+)')
+# per-requirement options, such as --hash, follow the requirement
+OPTION_RE = re.compile(r'\s--?[A-Za-z]')
+HASH_OPTION_RE = re.compile(r'--hash(?:\s*=\s*|\s+)(\S+)')
+
+
+class RequirementLine(object):
+    """
+    A requirement of a requirements file, parsed once with PEP 508 rules.
+
+    Besides the parsed requirement, a record remembers where it comes from: the file, the line it starts on, and
+    the offsets of its version tokens in the file text, so that new versions can be written over them without
+    scanning the file again. Every clause of the specifier is kept as an (operator, version, span) tuple, in the
+    order of the text; the operator, version and span attributes are the ones of a single clause (such as "==1.0"
+    or ">=1.0"), None for ranges. A span is None when the token can not be located (a version split by a line
+    continuation). Likewise, the --hash options of the requirement are kept with the offsets of the whole block,
+    from the first one to the last one.
+    """
+
+    __slots__ = ('text', 'name', 'canonical_name', 'extras', 'specifier', 'marker', 'filename', 'lineno',
+                 'operator', 'version', 'span', 'clauses', 'hashes', 'hash_span')
+
+    def __init__(self, line, filename=None, lineno=None, offsets=None):
+        """
+        Initializes the RequirementLine instance.
+
+        :param line: The requirement and its options (such as --hash), without comment.
+        :param filename: The requirements file the requirement comes from.
+        :param lineno: The line number the requirement starts on.
+        :param offsets: List of (position in line, position in the file) tuples, one per physical line the line
+                        is made of; None when the line is not read from a file.
+        :raises packaging.requirements.InvalidRequirement: for an invalid requirement.
+        """
+        match = OPTION_RE.search(line)
+        text = line[:match.start()].rstrip() if match else line
+        requirement = Requirement(text)
+
+        self.text = text
+        self.name = requirement.name
+        self.canonical_name = canonicalize_name(requirement.name)
+        self.extras = frozenset(requirement.extras)
+        self.specifier = requirement.specifier
+        self.marker = requirement.marker
+        self.filename = filename
+        self.lineno = lineno
+        self.operator = self.version = self.span = None
+        self.clauses = ()
+        self.hashes, self.hash_span = (), None
+
+        hash_options = list(HASH_OPTION_RE.finditer(line, len(text)))
+        if hash_options:
+            self.hashes = tuple(hash_option.group(1) for hash_option in hash_options)
+            # the block is only rewritten as a whole when no other option is mixed with the hashes
+            contiguous = all(not line[previous.end():following.start()].strip()
+                             for previous, following in zip(hash_options, hash_options[1:]))
+            if offsets is not None and contiguous:
+                self.hash_span = self._file_span(hash_options[0].start(), hash_options[-1].end(), offsets)
+
+        if requirement.url or not requirement.specifier:
+            return
+
+        # the specifiers stop at the environment markers, a version never contains a semicolon
+        end = text.find(';')
+        matches = list(SPECIFIER_RE.finditer(text, NAME_RE.match(text).end(), end if end != -1 else len(text)))
+        if len(matches) != len(requirement.specifier):  # pragma: nocover
+            return
+
+        clauses = []
+        for match in matches:
+            clause_span = None
+            if offsets is not None:
+                clause_start, clause_end = self._file_span(match.start(2), match.end(2), offsets)
+                # a version split by a line continuation can not be written over
+                if clause_end - clause_start == match.end(2) - match.start(2):
+                    clause_span = (clause_start, clause_end)
+            clauses.append((match.group(1), match.group(2), clause_span))
+        self.clauses = tuple(clauses)
+
+        if len(clauses) == 1:
+            self.operator, self.version, self.span = clauses[0]
+
+    @staticmethod
+    def _file_span(start, end, offsets):
+        """ Maps a span of the line to the file, the span may cross line continuations """
+        return RequirementLine._file_position(start, offsets), RequirementLine._file_position(end - 1, offsets) + 1
+
+    @staticmethod
+    def _file_position(position, offsets):
+        for line_position, file_position in reversed(offsets):
+            if line_position <= position:
+                return file_position + position - line_position
+        return position  # pragma: nocover
+
+    def __str__(self):
+        return self.text
+
+    def __repr__(self):
+        return '<RequirementLine {!r} {}:{}>'.format(self.text, self.filename, self.lineno)
@@ -1,5 +1,17 @@
+import fnmatch
 import mimetypes
 import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from pip_ascent.ExcludeRules import ExcludeRules
+from pip_ascent.profiler import span
+
+# directories never worth walking into when looking for requirements files
+WORKSPACE_SKIPPED_DIRS = frozenset([
+    '.git', '.hg', '.svn', '.tox', '.nox', '.venv', 'venv', 'node_modules', '__pycache__',
+    '.mypy_cache', '.pytest_cache', 'site-packages', 'build', 'dist',
+])
+WORKSPACE_FILE_PATTERNS = ('requirements*.txt', 'requirements*.pip')
 
 
 class RequirementsDetector(object):
@@ -9,15 +21,20 @@ class RequirementsDetector(object):
 
     filenames = []
 
-    def __init__(self, requirements_arg):
+    def __init__(self, requirements_arg, workspace=None, excludes=None, jobs=8):
         """
         Initializes the RequirementsDetector instance.
 
         :param requirements_arg: List of raw requirements arguments.
+        :param workspace: Root directory of a repository to search for requirements files, recursively.
+        :param excludes: Extra .gitignore-style exclude patterns for the workspace search.
+        :param jobs: Number of directories scanned concurrently in the workspace search.
         """
         self.filenames = []
 
-        if not requirements_arg:
+        if workspace:
+            self.detect_workspace_files(workspace, excludes, jobs)
+        elif not requirements_arg:
             self.autodetect_files()
         else:
             self.detect_files(requirements_arg)
@@ -58,6 +75,69 @@ class RequirementsDetector(object):
                     self.filenames.append(file_path)
         self._check_inclusions_recursively()
 
+    def detect_workspace_files(self, root, excludes=None, jobs=8):
+        """
+        Walk a repository tree, scanning directories in parallel, and detect every requirements file.
+
+        Directories and files matched by .gitignore files (or by the extra exclude patterns) are skipped.
+
+        :param root: Root directory of the workspace.
+        :param excludes: Extra .gitignore-style patterns, relative to the root.
+        :param jobs: Number of directories scanned concurrently.
+        """
+        rules = ExcludeRules().extend(root, excludes or [])
+        found = []
+
+        with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+            pending = {executor.submit(self._scan_workspace_dir, root, rules)}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    filenames, subdirs = future.result()
+                    found.extend(filenames)
+                    for subdir, subdir_rules in subdirs:
+                        pending.add(executor.submit(self._scan_workspace_dir, subdir, subdir_rules))
+
+        # the scan order depends on thread timing, sort for a stable output
+        self.filenames = sorted(found)
+        self._check_inclusions_recursively()
+
+    def _scan_workspace_dir(self, directory, rules):
+        """
+        Scan a single directory of the workspace.
+
+        :return: A tuple of (requirements files, [(subdirectory, exclude rules of the subdirectory)]).
+        """
+        with span(directory, 'discovery'):
+            rules = rules.extend_from_file(directory, os.path.join(directory, '.gitignore'))
+            in_requirements_dir = os.path.basename(os.path.normpath(directory)) == 'requirements'
+            filenames, subdirs = [], []
+
+            try:
+                entries = list(os.scandir(directory))
+            except OSError:  # pragma: nocover
+                return filenames, subdirs
+
+            for entry in entries:
+                try:
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                except OSError:  # pragma: nocover
+                    continue
+
+                if rules.is_excluded(entry.path, is_dir):
+                    continue
+
+                if is_dir:
+                    if entry.name not in WORKSPACE_SKIPPED_DIRS and \
+                            not os.path.isfile(os.path.join(entry.path, 'pyvenv.cfg')):  # virtualenvs
+                        subdirs.append((entry.path, rules))
+                elif in_requirements_dir or any(fnmatch.fnmatch(entry.name, pattern)
+                                                for pattern in WORKSPACE_FILE_PATTERNS):
+                    if self._is_valid_requirements_file(entry.path):
+                        filenames.append(os.path.normpath(entry.path))
+
+            return filenames, subdirs
+
     @staticmethod
     def _is_valid_requirements_file(filename):
         """
@@ -78,7 +158,7 @@ class RequirementsDetector(object):
             for line in fh:
                 if line.strip().startswith('-r '):
                     included_filename = line.split('-r ')[1].strip()
-                    included_filename = os.path.join(os.path.dirname(filename), included_filename)
+                    included_filename = os.path.normpath(os.path.join(os.path.dirname(filename), included_filename))
                     if self._is_valid_requirements_file(included_filename) and included_filename not in self.filenames:
                         self.filenames.append(included_filename)
                         # Recursively, check if the included file contains other inclusions
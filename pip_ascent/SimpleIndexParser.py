@@ -0,0 +1,164 @@
+import json
+from html.parser import HTMLParser
+from urllib.parse import urldefrag, urljoin
+
+from packaging.utils import (InvalidSdistFilename, InvalidWheelFilename, canonicalize_name, parse_sdist_filename,
+                             parse_wheel_filename)
+from packaging.version import InvalidVersion, Version
+
+SIMPLE_JSON_CONTENT_TYPE = 'application/vnd.pypi.simple.v1+json'
+
+# PEP 691 content negotiation: prefer JSON, accept the HTML flavours from older servers
+SIMPLE_ACCEPT_HEADER = ', '.join([
+    SIMPLE_JSON_CONTENT_TYPE,
+    'application/vnd.pypi.simple.v1+html;q=0.2',
+    'text/html;q=0.01',
+])
+
+# legacy distribution formats still found on old simple pages
+ARCHIVE_EXTENSIONS = ('.tar.gz', '.tar.bz2', '.tar.xz', '.tar', '.tgz', '.zip', '.egg', '.exe', '.msi', '.rpm')
+
+
+class SimpleLinkParser(HTMLParser):
+    """
+    Collects the distribution links of a PEP 503 simple page in a single linear pass.
+    """
+
+    def __init__(self, base_url):
+        super(SimpleLinkParser, self).__init__(convert_charrefs=True)
+        self.base_url = base_url
+        self.files = []
+        self._anchor = None
+        self._text = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'base':
+            href = dict(attrs).get('href')
+            if href:
+                self.base_url = urljoin(self.base_url, href)
+        elif tag == 'a':
+            self._anchor = dict(attrs)
+            self._text = []
+
+    def handle_data(self, data):
+        if self._anchor is not None:
+            self._text.append(data)
+
+    def handle_endtag(self, tag):
+        if tag != 'a' or self._anchor is None:
+            return
+
+        anchor, self._anchor = self._anchor, None
+        href = anchor.get('href')
+        if not href:
+            return
+
+        url, fragment = urldefrag(urljoin(self.base_url, href))
+        hashes = {}
+        if '=' in fragment:
+            hash_name, hash_value = fragment.split('=', 1)
+            hashes[hash_name] = hash_value
+
+        core_metadata = anchor.get('data-core-metadata', anchor.get('data-dist-info-metadata'))
+        self.files.append({
+            'filename': ''.join(self._text).strip() or url.rsplit('/', 1)[-1],
+            'url': url,
+            'hashes': hashes,
+            'requires_python': anchor.get('data-requires-python') or None,
+            'yanked': 'data-yanked' in anchor,
+            'upload_time': None,
+            'core_metadata': _parse_html_core_metadata(core_metadata),
+        })
+
+
+def _parse_html_core_metadata(value):
+    """ data-core-metadata is either "true" or "<hashname>=<hashvalue>" (PEP 658/714) """
+    if value is None or value == 'false':
+        return None
+    if '=' in value:
+        hash_name, hash_value = value.split('=', 1)
+        return {hash_name: hash_value}
+    return {}
+
+
+def is_simple_json_response(response):
+    content_type = response.headers.get('Content-Type', '')
+    return content_type.split(';')[0].strip().lower() == SIMPLE_JSON_CONTENT_TYPE
+
+
+def parse_simple_files(response):
+    """
+    Returns the distribution files listed by a simple index page, whatever its serialization.
+
+    Each file is a dict with the filename, absolute url, hashes, requires_python, yanked flag,
+    upload_time (PEP 700, None when unknown) and core_metadata (PEP 658 hashes, None when absent).
+
+    :type response: requests.models.Response
+    """
+    if is_simple_json_response(response):
+        return _parse_simple_json_files(response)
+
+    parser = SimpleLinkParser(response.url)
+    parser.feed(response.content.decode('utf-8', errors='replace'))
+    parser.close()
+    return parser.files
+
+
+def _parse_simple_json_files(response):
+    data = json.loads(response.content)
+    files = []
+    for file_info in data.get('files', []):
+        # true, or a dict of hashes (PEP 658/714); an empty dict still means that the metadata is available
+        core_metadata = file_info.get('core-metadata', file_info.get('dist-info-metadata'))
+        if core_metadata is True:
+            core_metadata = {}
+        elif not isinstance(core_metadata, dict):
+            core_metadata = None
+        files.append({
+            'filename': file_info['filename'],
+            'url': urljoin(response.url, file_info['url']),
+            'hashes': file_info.get('hashes') or {},
+            'requires_python': file_info.get('requires-python') or None,
+            'yanked': bool(file_info.get('yanked')),
+            'upload_time': file_info.get('upload-time'),
+            'core_metadata': core_metadata,
+        })
+    return files
+
+
+def version_from_filename(filename, package_name):
+    """
+    Extracts the version of a distribution filename, None if it does not belong to the package.
+
+    :type filename: str
+    :type package_name: str
+    :rtype: Version
+    """
+    canonical_name = canonicalize_name(package_name)
+    try:
+        if filename.endswith('.whl'):
+            name, vers, _, _ = parse_wheel_filename(filename)
+        else:
+            name, vers = parse_sdist_filename(filename)
+        return vers if name == canonical_name else None
+    except (InvalidWheelFilename, InvalidSdistFilename, InvalidVersion):
+        pass
+
+    # legacy formats: "<name>-<version><ext>", where the name itself may contain dashes
+    stem = filename
+    for extension in ARCHIVE_EXTENSIONS:
+        if stem.lower().endswith(extension):
+            stem = stem[:-len(extension)]
+            break
+    else:
+        return None
+
+    position = stem.find('-')
+    while position != -1:
+        if canonicalize_name(stem[:position]) == canonical_name:
+            try:
+                return Version(stem[position + 1:].split('-')[0])
+            except InvalidVersion:
+                return None
+        position = stem.find('-', position + 1)
+    return None
@@ -0,0 +1,150 @@
+import os
+import sqlite3
+import threading
+import time
+
+from packaging.utils import canonicalize_name
+
+from pip_ascent.VersionIndex import VersionIndex
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS packages (
+    name TEXT PRIMARY KEY,
+    fetched_at REAL NOT NULL
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS releases (
+    name TEXT NOT NULL,
+    version TEXT NOT NULL,
+    upload_time TEXT,
+    yanked INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (name, version)
+) WITHOUT ROWID;
+"""
+
+
+class SnapshotIndex(object):
+    """
+    Offline copy of the index metadata (versions, upload times, yanked flags) stored in a SQLite file.
+
+    Packages are keyed by their canonical name, and releases are clustered by package on the
+    (name, version) primary key, so every lookup is a single indexed range query.
+    """
+
+    filename = None
+
+    def __init__(self, filename, create=False):
+        """
+        Opens a snapshot file.
+
+        :param filename: Path of the SQLite file.
+        :param create: Create the file when missing, otherwise a missing file raises IOError.
+        :raises IOError: for a missing file, or a file that is not a snapshot.
+        """
+        if not create and not os.path.isfile(filename):
+            raise IOError('Offline index not found: {}'.format(filename))
+
+        self.filename = filename
+        self._lock = threading.Lock()
+        # lookups run from the detector thread pool, the lock serializes access to the connection
+        self._connection = sqlite3.connect(filename, check_same_thread=False)
+        try:
+            self._connection.executescript(SCHEMA)
+            # an existing database must have the columns of a snapshot
+            self._connection.execute('SELECT name, fetched_at FROM packages LIMIT 0')
+            self._connection.execute('SELECT name, version, upload_time, yanked FROM releases LIMIT 0')
+        except sqlite3.DatabaseError as e:
+            self._connection.close()
+            raise IOError('Invalid offline index {}: {}'.format(filename, e))
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def load(self, package_name):
+        """
+        Returns the VersionIndex of a package, None when the package is not part of the snapshot.
+
+        :type package_name: str
+        :rtype: VersionIndex
+        """
+        name = canonicalize_name(package_name)
+        with self._lock:
+            known = self._connection.execute('SELECT 1 FROM packages WHERE name = ?', (name,)).fetchone()
+            rows = self._connection.execute(
+                'SELECT version, upload_time, yanked FROM releases WHERE name = ?', (name,)).fetchall()
+
+        if not known:
+            return None
+
+        version_index = VersionIndex()
+        for raw_version, upload_time, yanked in rows:
+            version_index.add(raw_version, upload_time, bool(yanked))
+        return version_index
+
+    def store(self, package_name, version_index, fetched_at=None):
+        """
+        Replaces the releases of a package.
+
+        :type package_name: str
+        :type version_index: VersionIndex
+        :param fetched_at: Timestamp of the index query, defaults to now.
+        """
+        name = canonicalize_name(package_name)
+        releases = version_index.to_dict()['releases']
+        self._replace(name, fetched_at or time.time(),
+                      [(name, raw_version, upload_time, int(bool(yanked)))
+                       for raw_version, upload_time, yanked in releases])
+
+    def merge(self, filename):
+        """
+        Merges another snapshot into this one; for packages present in both, the most recent fetch wins.
+
+        :param filename: Path of the snapshot file to merge.
+        :return: Number of merged packages.
+        """
+        source = SnapshotIndex(filename)
+        try:
+            with source._lock:
+                packages = source._connection.execute('SELECT name, fetched_at FROM packages').fetchall()
+
+            merged = 0
+            for name, fetched_at in packages:
+                with self._lock:
+                    current = self._connection.execute(
+                        'SELECT fetched_at FROM packages WHERE name = ?', (name,)).fetchone()
+                if current and current[0] >= fetched_at:
+                    continue
+
+                with source._lock:
+                    rows = source._connection.execute(
+                        'SELECT name, version, upload_time, yanked FROM releases WHERE name = ?', (name,)).fetchall()
+                self._replace(name, fetched_at, rows)
+                merged += 1
+            return merged
+        finally:
+            source.close()
+
+    def export(self):
+        """
+        Returns the whole snapshot as a JSON serializable dict:
+        {package name: {"fetched_at": timestamp, "releases": [[version, upload_time, yanked], ...]}}
+        """
+        with self._lock:
+            packages = self._connection.execute('SELECT name, fetched_at FROM packages ORDER BY name').fetchall()
+            rows = self._connection.execute(
+                'SELECT name, version, upload_time, yanked FROM releases ORDER BY name').fetchall()
+
+        exported = {name: {'fetched_at': fetched_at, 'releases': []} for name, fetched_at in packages}
+        for name, raw_version, upload_time, yanked in rows:
+            if name in exported:
+                exported[name]['releases'].append([raw_version, upload_time, bool(yanked)])
+        return exported
+
+    def _replace(self, name, fetched_at, rows):
+        with self._lock, self._connection:
+            self._connection.execute('DELETE FROM releases WHERE name = ?', (name,))
+            self._connection.execute('INSERT OR REPLACE INTO packages (name, fetched_at) VALUES (?, ?)',
+                                     (name, fetched_at))
+            self._connection.executemany(
+                'INSERT OR REPLACE INTO releases (name, version, upload_time, yanked) VALUES (?, ?, ?, ?)', rows)
@@ -0,0 +1,194 @@
+import sys
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from colorclass import Color
+from packaging.requirements import InvalidRequirement, Requirement
+from packaging.specifiers import InvalidSpecifier, SpecifierSet
+from packaging.utils import canonicalize_name
+from packaging.version import InvalidVersion
+
+from pip_ascent.installed_packages import installed_metadata
+from pip_ascent.options import DEFAULT_JOBS, numeric_option
+from pip_ascent.VersionIndex import parse_version
+
+
+def _python_version():
+    return '{}.{}.{}'.format(*sys.version_info[:3])
+
+
+class UpgradePlanner(object):
+    """
+    Checks the selected upgrades against the other pins of the requirements files, before pip runs.
+
+    The Requires-Dist and Requires-Python of the new versions are read from the index (the PyPI JSON API, or the
+    PEP 658 metadata files of simple indexes), without downloading any distribution. The ones of the pins that are
+    not upgraded come from the environment, when installed in their pinned version. An upgrade conflicts when the
+    new version does not support the running Python, requires another pin in a version it is not pinned to, or is
+    not accepted by another pin. Conflicting upgrades are dropped, until the remaining ones fit together.
+    """
+
+    detector = None
+    pins = None
+    extras = None
+    names = None
+    installed = None
+    jobs = DEFAULT_JOBS
+    allow_conflicts = False
+
+    def __init__(self, detector, requirement_lines, options, installed=None):
+        """
+        Initializes the UpgradePlanner instance.
+
+        :param detector: PackageStatusDetector reading the metadata of the new versions from the indexes.
+        :param requirement_lines: RequirementLine records, as detected by PackageDetector.
+        :param options: Command-line options.
+        :param installed: Snapshot of the installed versions (canonical name -> version), None when unknown.
+        """
+        self.detector = detector
+        self.installed = installed or {}
+        self.jobs = numeric_option(options, '--jobs', DEFAULT_JOBS, minimum=1)
+        self.allow_conflicts = options.get('--allow-conflicts', False)
+        self.pins, self.extras, self.names = self._parse_pins(requirement_lines)
+        self._metadata = {}  # (canonical name, version) -> metadata dict, None when unknown
+
+    @staticmethod
+    def _parse_pins(requirement_lines):
+        """
+        :return: Dicts of canonical name to the pinned version (the oldest one), to the extras of the pins, and to
+                 the name as first spelled.
+        """
+        pins, extras, names = {}, {}, {}
+        for requirement in requirement_lines:
+            names.setdefault(requirement.canonical_name, requirement.name)
+            extras.setdefault(requirement.canonical_name, set()).update(requirement.extras)
+
+            if requirement.operator != '==' or requirement.version.endswith('.*'):
+                continue
+            try:
+                pinned_version = parse_version(requirement.version)
+            except InvalidVersion:  # pragma: nocover
+                continue
+            pins[requirement.canonical_name] = min(pins.get(requirement.canonical_name, pinned_version),
+                                                   pinned_version)
+        return pins, extras, names
+
+    def plan(self, selected_packages):
+        """
+        Drops the upgrades that conflict with the other pins, or only reports them with --allow-conflicts.
+
+        :param selected_packages: Package status dicts, with the name and latest_version.
+        :return: The selected packages that can be upgraded together, in the same order.
+        """
+        if not selected_packages:
+            return selected_packages
+
+        selected = OrderedDict((canonicalize_name(package['name']), package) for package in selected_packages)
+        for canonical_name, package in selected.items():
+            self.names.setdefault(canonical_name, package['name'])
+
+        while True:
+            targets = dict(self.pins)
+            targets.update((canonical_name, package['latest_version']) for canonical_name, package in selected.items())
+            self._load_metadata(targets, selected)
+
+            conflicts = self._conflicts(targets, selected)
+            if self.allow_conflicts:
+                for canonical_name, message in conflicts:
+                    print(Color('{{autoyellow}}Upgrading {} to {} anyway: {}{{/autoyellow}}'.format(
+                        selected[canonical_name]['name'], selected[canonical_name]['latest_version'], message)))
+                break
+            if not conflicts:
+                break
+
+            # the targets change once an upgrade is dropped, check the remaining ones again
+            for canonical_name, message in conflicts:
+                package = selected.pop(canonical_name, None)
+                if package is not None:
+                    print(Color('{{autored}}Not upgrading {} to {}: {}{{/autored}}'.format(
+                        package['name'], package['latest_version'], message)))
+
+        unchecked = [package['name'] for canonical_name, package in selected.items()
+                     if self._metadata.get((canonical_name, package['latest_version'])) is None]
+        if unchecked:
+            print(Color('{{autoyellow}}Could not check the dependencies of {}: the index does not publish their '
+                        'metadata{{/autoyellow}}'.format(', '.join(unchecked))))
+
+        return [package for package in selected_packages if canonicalize_name(package['name']) in selected]
+
+    def _load_metadata(self, targets, selected):
+        """
+        Reads the metadata of the targets: new versions from the index, concurrently, and the other pins from the
+        environment. Pins that are not installed in their pinned version are left unknown.
+        """
+        missing = [(canonical_name, target) for canonical_name, target in targets.items()
+                   if (canonical_name, target) not in self._metadata]
+        remote = [(canonical_name, target) for canonical_name, target in missing
+                  if canonical_name in selected and self.installed.get(canonical_name) != target]
+
+        with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+            futures = {key: executor.submit(self.detector.release_metadata, self.names[key[0]], key[1])
+                       for key in remote}
+            for key in missing:
+                if key in futures:
+                    try:
+                        self._metadata[key] = futures[key].result()
+                    except Exception:  # noqa  # pragma: nocover
+                        self._metadata[key] = None
+                elif self.installed.get(key[0]) == key[1]:
+                    self._metadata[key] = installed_metadata(self.names[key[0]])
+                else:
+                    self._metadata[key] = None
+
+    def _conflicts(self, targets, selected):
+        """
+        :return: List of (canonical name of the upgrade to drop, reason) tuples.
+        """
+        conflicts = []
+        for canonical_name, target in targets.items():
+            metadata = self._metadata.get((canonical_name, target))
+            if metadata is None:
+                continue
+
+            upgraded = canonical_name in selected
+            if upgraded and metadata['requires_python']:
+                try:
+                    if _python_version() not in SpecifierSet(metadata['requires_python']):
+                        conflicts.append((canonical_name, 'it requires Python {}'.format(metadata['requires_python'])))
+                        continue
+                except InvalidSpecifier:  # pragma: nocover
+                    pass
+
+            for requirement_line in metadata['requires_dist']:
+                try:
+                    requirement = Requirement(requirement_line)
+                except InvalidRequirement:  # pragma: nocover
+                    continue
+
+                dependency = canonicalize_name(requirement.name)
+                if dependency not in targets or not self._applies(requirement, canonical_name):
+                    continue
+                if not upgraded and dependency not in selected:
+                    continue  # not caused by the upgrades
+                if requirement.specifier.contains(targets[dependency], prereleases=True):
+                    continue
+
+                requirement.marker = None
+                if upgraded:
+                    conflicts.append((canonical_name, 'it requires {}, pinned to {} ({})'.format(
+                        requirement, targets[dependency], self._sources(dependency))))
+                else:
+                    conflicts.append((dependency, '{} {} requires {} ({})'.format(
+                        self.names[canonical_name], target, requirement, self._sources(canonical_name))))
+        return conflicts
+
+    def _applies(self, requirement, canonical_name):
+        """ Whether a dependency is needed in the running environment, with the extras of the pins """
+        if requirement.marker is None:
+            return True
+        return any(requirement.marker.evaluate({'extra': extra})
+                   for extra in [''] + sorted(self.extras.get(canonical_name, ())))
+
+    def _sources(self, canonical_name):
+        return ', '.join('{}:{}'.format(filename, lineno)
+                         for filename, lineno in self.detector.sources.get(canonical_name, [])) or 'not pinned'
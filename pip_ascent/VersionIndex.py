@@ -0,0 +1,174 @@
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
+
+from packaging import version
+from packaging.specifiers import SpecifierSet
+
+
+@lru_cache(maxsize=65536)
+def parse_version(raw_version):
+    """
+    Memoized version.parse: the same release strings are parsed over and over across packages and runs.
+
+    :type raw_version: str
+    :rtype: version.Version
+    :raises version.InvalidVersion: for non PEP 440 versions
+    """
+    return version.parse(raw_version)
+
+
+class VersionIndex(object):
+    """
+    The releases of a package, parsed once and kept sorted in two streams: stable releases,
+    and pre/post releases. Yanked releases are remembered but never offered as candidates.
+
+    Lookups ("latest stable", "latest including prereleases", "latest satisfying a specifier")
+    are answered with bisection instead of linear scans.
+    """
+
+    def __init__(self):
+        self._stable = []
+        self._prerelease = []
+        self._releases = {}  # Version -> (raw version, upload time, yanked)
+        self._sorted = True
+
+    def __len__(self):
+        return len(self._releases)
+
+    def add(self, raw_version, upload_time=None, yanked=False):
+        """
+        Adds a release to the index.
+
+        :param raw_version: The release string, as published on the index.
+        :param upload_time: Upload time of the release, None when unknown.
+        :param yanked: Whether the release is yanked (PEP 592).
+        :return: The parsed version, None if the release string is not a valid version.
+        """
+        try:
+            vers = parse_version(raw_version)
+        except version.InvalidVersion:
+            return None
+
+        if vers in self._releases:  # same release under another spelling
+            return vers
+
+        self._releases[vers] = (raw_version, upload_time, yanked)
+        if not yanked:
+            stream = self._prerelease if vers.is_prerelease or vers.is_postrelease else self._stable
+            stream.append(vers)
+            self._sorted = False
+        return vers
+
+    def latest_stable(self):
+        """ Latest release that is neither a pre nor a post release """
+        self._sort()
+        return self._stable[-1] if self._stable else None
+
+    def latest(self, include_prereleases=False):
+        """ Latest release, pre and post releases included on demand """
+        self._sort()
+        latest = self.latest_stable()
+        if include_prereleases and self._prerelease:
+            if latest is None or self._prerelease[-1] > latest:
+                latest = self._prerelease[-1]
+        return latest
+
+    def latest_matching(self, specifier, include_prereleases=False):
+        """
+        Latest release satisfying the specifier.
+
+        :type specifier: SpecifierSet | str
+        :type include_prereleases: bool
+        """
+        if not isinstance(specifier, SpecifierSet):
+            specifier = SpecifierSet(specifier)
+
+        self._sort()
+        lower, upper = self._bounds(specifier)
+        candidates = [self._latest_in(self._stable, specifier, lower, upper, False)]
+        if include_prereleases:
+            candidates.append(self._latest_in(self._prerelease, specifier, lower, upper, True))
+
+        candidates = [candidate for candidate in candidates if candidate is not None]
+        return max(candidates) if candidates else None
+
+    def upload_time(self, vers):
+        release = self._releases.get(vers)
+        return release[1] if release else None
+
+    def is_yanked(self, vers):
+        release = self._releases.get(vers)
+        return bool(release and release[2])
+
+    def update(self, other):
+        """
+        Adds the releases of another index of the same package, such as an extra index. The releases
+        already known keep their upload time and yanked status.
+
+        :type other: VersionIndex
+        """
+        for raw_version, upload_time, yanked in other._releases.values():
+            self.add(raw_version, upload_time, yanked)
+
+    def to_dict(self):
+        """ JSON serializable representation, see from_dict """
+        return {'releases': [list(release) for release in self._releases.values()]}
+
+    @classmethod
+    def from_dict(cls, data):
+        index = cls()
+        for raw_version, upload_time, yanked in data['releases']:
+            index.add(raw_version, upload_time, yanked)
+        return index
+
+    def _sort(self):
+        if not self._sorted:
+            self._stable.sort()
+            self._prerelease.sort()
+            self._sorted = True
+
+    @staticmethod
+    def _latest_in(stream, specifier, lower, upper, prereleases):
+        """ Walks down from the upper bound of the bisected range, the first match is the latest """
+        start = bisect_left(stream, lower) if lower is not None else 0
+        # the upper bound is compared on public versions, so that local versions (1.0+local) stay in range
+        end = bisect_right(stream, upper, key=_public_version) if upper is not None else len(stream)
+
+        for position in range(end - 1, start - 1, -1):
+            if specifier.contains(stream[position], prereleases=prereleases):
+                return stream[position]
+        return None
+
+    @staticmethod
+    def _bounds(specifier):
+        """
+        Inclusive range [lower, upper] of the versions that may satisfy the specifier set. It only
+        narrows the search, every candidate in the range is still checked against the specifier.
+        """
+        lower = upper = None
+        for spec in specifier:
+            operator, raw_version = spec.operator, spec.version
+            if operator in ('===', '!=') or raw_version.endswith('.*'):
+                continue
+            try:
+                vers = parse_version(raw_version)
+            except version.InvalidVersion:
+                continue
+
+            bounds = []
+            if operator in ('>=', '>', '~=', '=='):
+                lower = vers if lower is None else max(lower, vers)
+            if operator in ('<=', '<', '=='):
+                bounds.append(_public_version(vers))
+            if operator == '~=' and len(vers.release) > 1:
+                # ~=1.4.5 means >=1.4.5, ==1.4.*
+                release = vers.release[:-2] + (vers.release[-2] + 1,)
+                bounds.append(parse_version('{}!{}'.format(vers.epoch, '.'.join(str(part) for part in release))))
+
+            for bound in bounds:
+                upper = bound if upper is None else min(upper, bound)
+        return lower, upper
+
+
+def _public_version(vers):
+    return parse_version(vers.public) if vers.local else vers
@@ -0,0 +1,211 @@
+import hashlib
+import os
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from colorclass import Color
+from packaging.specifiers import InvalidSpecifier, SpecifierSet
+from packaging.tags import sys_tags
+from packaging.utils import InvalidWheelFilename, canonicalize_name, parse_wheel_filename
+from packaging.version import InvalidVersion
+from requests import RequestException
+
+from pip_ascent.IndexCache import user_cache_dir
+from pip_ascent.options import DEFAULT_JOBS
+from pip_ascent.profiler import span
+from pip_ascent.VersionIndex import parse_version
+
+CHUNK_SIZE = 256 * 1024
+
+# strongest first, the index may publish several digests of a file
+DIGEST_ALGORITHMS = ('sha512', 'sha384', 'sha256', 'sha224', 'sha1', 'md5')
+
+
+def default_wheelhouse_dir():
+    return os.path.join(user_cache_dir(), 'wheels')
+
+
+@lru_cache(maxsize=1)
+def _supported_tags():
+    """ Wheel tags of the running interpreter, ranked by preference like pip does """
+    return {tag: rank for rank, tag in enumerate(sys_tags())}
+
+
+def _python_version():
+    return '{}.{}.{}'.format(*sys.version_info[:3])
+
+
+class Wheelhouse(object):
+    """
+    A directory of downloaded wheels, which pip installs from with --no-index --find-links.
+
+    The wheels of the selected upgrades are downloaded concurrently before pip runs, and checked against the
+    digests published by the index. Files are named like on the index and written atomically, so the same
+    directory can be reused by later runs, other virtual environments, or other machines sharing it; a wheel
+    already present is only downloaded again when it does not match its digest.
+    """
+
+    directory = None
+    detector = None
+    jobs = DEFAULT_JOBS
+
+    def __init__(self, detector, directory=None, jobs=DEFAULT_JOBS):
+        """
+        Initializes the Wheelhouse instance.
+
+        :param detector: PackageStatusDetector listing the release files, on the indexes it was configured with.
+        :param directory: Wheelhouse directory, defaults to the user cache dir.
+        :param jobs: Number of concurrent downloads.
+        """
+        self.detector = detector
+        self.directory = os.path.abspath(directory or default_wheelhouse_dir())
+        self.jobs = jobs
+
+    def prefetch(self, packages):
+        """
+        Downloads a wheel of the latest version of every package, for the running interpreter.
+
+        :param packages: Package status dicts, with the name and latest_version.
+        :return: Set of the canonical names of the packages that can be installed from the wheelhouse.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        with span('prefetch'), ThreadPoolExecutor(max_workers=self.jobs) as executor:
+            results = list(executor.map(self._prefetch_package, packages))
+
+        # warnings are printed once every download is over, not interleaved by the download threads
+        for _, warning in results:
+            if warning:
+                print(warning)
+
+        downloaded = sum(1 for result, _ in results if result == 'downloaded')
+        reused = sum(1 for result, _ in results if result == 'reused')
+        print(Color('{{autogreen}}Prefetched {} wheel(s) into {} ({} already there){{/autogreen}}'.format(
+            downloaded + reused, self.directory, reused)))
+
+        return {canonicalize_name(package['name']) for package, (result, _) in zip(packages, results) if result}
+
+    def _prefetch_package(self, package):
+        """
+        :return: Tuple of "downloaded" or "reused" when a wheel of the package is in the wheelhouse (None otherwise),
+                 and a warning to print (None when there is nothing to report).
+        """
+        name, release = package['name'], package['latest_version']
+        try:
+            files = self.detector.release_files(name, release)
+        except Exception as e:  # noqa  # pragma: nocover
+            return None, Color('{{autoyellow}}Could not list the files of {} {}: {}{{/autoyellow}}'.format(
+                name, release, e))
+
+        file_info = self.best_wheel(files)
+        if file_info is None:
+            # offline, or an index without wheels: a wheel left by a previous run is still usable
+            return 'reused' if self._local_wheel(name, release) else None, None
+
+        filename = os.path.join(self.directory, os.path.basename(file_info['filename']))
+        algorithm, expected_digest = self._expected_digest(file_info)
+        if os.path.isfile(filename) and (expected_digest is None or
+                                         self._digest(filename, algorithm) == expected_digest):
+            return 'reused', None
+
+        with span(file_info['filename'], 'download'):
+            try:
+                return self._download(file_info['url'], filename, algorithm, expected_digest)
+            except (RequestException, OSError) as e:  # pragma: nocover
+                return None, Color('{{autoyellow}}Could not download {}: {}{{/autoyellow}}'.format(
+                    file_info['filename'], e))
+
+    @staticmethod
+    def best_wheel(files):
+        """
+        The wheel preferred by the running interpreter among the files of a release, None if none fits.
+
+        :param files: File dicts of a release, with the filename, url, hashes, requires_python and yanked flag.
+        """
+        supported_tags = _supported_tags()
+        best_rank, best_file = None, None
+        for file_info in files:
+            if file_info.get('yanked') or not file_info['filename'].endswith('.whl'):
+                continue
+            if file_info.get('requires_python'):
+                try:
+                    if _python_version() not in SpecifierSet(file_info['requires_python']):
+                        continue
+                except InvalidSpecifier:  # pragma: nocover
+                    pass
+            try:
+                _, _, _, tags = parse_wheel_filename(file_info['filename'])
+            except InvalidWheelFilename:  # pragma: nocover
+                continue
+
+            ranks = [supported_tags[tag] for tag in tags if tag in supported_tags]
+            if ranks and (best_rank is None or min(ranks) < best_rank):
+                best_rank, best_file = min(ranks), file_info
+        return best_file
+
+    def _local_wheel(self, name, release):
+        """ A compatible wheel of the release already in the wheelhouse, None if there is none """
+        canonical_name = canonicalize_name(name)
+        try:
+            release_version = parse_version(str(release))
+        except InvalidVersion:  # pragma: nocover
+            return None
+
+        files = []
+        for filename in os.listdir(self.directory):
+            try:
+                wheel_name, wheel_version, _, _ = parse_wheel_filename(filename)
+            except InvalidWheelFilename:
+                continue
+            if wheel_name == canonical_name and wheel_version == release_version:
+                files.append({'filename': filename})
+        return self.best_wheel(files)
+
+    @staticmethod
+    def _expected_digest(file_info):
+        """ The strongest digest published for the file, as (algorithm, hex digest), (None, None) without any """
+        hashes = file_info.get('hashes') or {}
+        for algorithm in DIGEST_ALGORITHMS:
+            if hashes.get(algorithm):
+                return algorithm, hashes[algorithm].lower()
+        return None, None
+
+    @staticmethod
+    def _digest(filename, algorithm):
+        digest = hashlib.new(algorithm)
+        with open(filename, 'rb') as fh:
+            for chunk in iter(lambda: fh.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _download(self, url, filename, algorithm, expected_digest):
+        """
+        Downloads the file next to its final name, and moves it in place once its digest is checked.
+
+        :return: Tuple of "downloaded" (None when the file is not in place) and a warning.
+        """
+        response = self.detector.transport.get(url, stream=True)
+        if not response.ok:  # pragma: nocover
+            response.close()
+            return None, Color('{{autoyellow}}Could not download {}: {}{{/autoyellow}}'.format(url, response.reason))
+
+        digest = hashlib.new(algorithm) if algorithm else None
+        fd, tmp_filename = tempfile.mkstemp(dir=self.directory, prefix='.download.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as fh:
+                for chunk in response.iter_content(CHUNK_SIZE):
+                    fh.write(chunk)
+                    if digest:
+                        digest.update(chunk)
+
+            if digest and digest.hexdigest() != expected_digest:
+                return None, Color('{{autored}}Digest mismatch for {}, it is installed from the index instead'
+                                   '{{/autored}}'.format(os.path.basename(filename)))
+
+            os.replace(tmp_filename, filename)
+            return 'downloaded', None
+        finally:
+            response.close()
+            if os.path.exists(tmp_filename):
+                os.unlink(tmp_filename)
@@ -1,6 +1,20 @@
-import pkg_resources
+__all__ = ['Scanner', 'ScanResult']
 
-try:
-    __version__ = pkg_resources.get_distribution('pip_ascent').version
-except Exception:  # pragma: nocover
-    __version__ = 'unknown'
+
+def __getattr__(name):
+    # reading the installed metadata is slow, and only --version needs it
+    if name == '__version__':
+        try:
+            from importlib.metadata import version
+            __version__ = version('pip-ascent')
+        except Exception:  # pragma: nocover
+            __version__ = 'unknown'
+        globals()['__version__'] = __version__
+        return __version__
+    # the Python API, imported on first use like the stages of the command line
+    if name in __all__:
+        from pip_ascent.scan_result import ScanResult
+        from pip_ascent.scanner import Scanner
+        globals().update(Scanner=Scanner, ScanResult=ScanResult)
+        return globals()[name]
+    raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
@@ -2,25 +2,78 @@
 pip-ascent
 
 Usage:
-  pip-ascent [<requirements_file>] ... [--prerelease] [-pk=<package>...] [--dry-run] [--check-greater-equal] [--skip-virtualenv-check] [--skip-package-installation] [--use-default-index]
+  pip-ascent snapshot build <snapshot_file> [<requirements_file>...] [--exclude=<pattern>...] [--index-route=<route>...] [options]
+  pip-ascent snapshot merge <snapshot_file> <source_snapshot>...
+  pip-ascent snapshot export <snapshot_file> [<output_file>]
+  pip-ascent daemon stop [--socket=<path>]
+  pip-ascent daemon [<requirements_file>...] [--socket=<path>] [--exclude=<pattern>...] [--index-route=<route>...] [options]
+  pip-ascent status [--socket=<path>]
+  pip-ascent drift [<requirements_file>...] [--exclude=<pattern>...] [options]
+  pip-ascent [<requirements_file>] ... [-p <package>...] [--exclude=<pattern>...] [--index-route=<route>...] [options]
 
 Arguments:
     requirements_file             Specifies the requirement FILE or uses a WILDCARD PATH to multiple files.
     --prerelease                  Includes prerelease versions for upgrades when querying PyPI repositories.
-    -pk <package>                  Pre-selects packages for upgrade, bypassing any prompts. You can also utilize regular expressions to filter packages for upgrading.
+    -p <package>                  Pre-selects packages for upgrade, bypassing any prompts. You can also utilize regular expressions to filter packages for upgrading.
+    --progressive                 Lists the available upgrades as their lookup completes, and takes the choices meanwhile; confirming cancels the lookups still pending.
     --dry-run                     Simulates the upgrade but does not perform the actual upgrade.
     --check-greater-equal         Also checks packages with minimum version pinning (package>=version).
+    --check-specifiers            Also checks the version ranges (package>=4.2,<5, package~=5.3), reporting the latest version they allow and the latest one.
+    --specifier-update=<mode>     How the ranges are upgraded: bump (raises their lower bound to the latest version they allow) or widen (moves their bounds to the latest version) [default: bump].
     --skip-package-installation   Upgrades the version in requirement files only; it does not install the new package.
     --skip-virtualenv-check       Disables virtualenv check, permitting the installation of new packages outside the virtualenv.
-    --use-default-index           Skips searching for a custom index-url in pip configuration file(s).
+    --use-default-index           Queries PyPI only, skipping the index-url and extra-index-url of the requirements files, environment and pip configuration file(s).
+    --index-route=<route>         Looks packages matching a pattern up on a single index, as <pattern>=<index-url> (e.g. "acme-*=https://pypi.acme.dev/simple/").
+    --jobs=<n>                    Maximum number of concurrent requests per index host [default: 8].
+    --no-cache                    Disables the on-disk cache of index responses.
+    --refresh                     Revalidates every cached index response, regardless of its age.
+    --cache-ttl=<seconds>         Number of seconds a cached index response is used without revalidation [default: 3600].
+    --cache-size=<mb>             Size cap of the index cache in megabytes, least recently used entries go first [default: 200].
+    --retries=<n>                 Number of retries for index connection errors, 5xx and 429 answers [default: 3].
+    --connect-timeout=<seconds>   Timeout for connecting to the index [default: 5].
+    --read-timeout=<seconds>      Timeout for waiting on an index answer [default: 15].
+    --allow-conflicts             Upgrades the selected packages even when their dependencies conflict with the other pins, the conflicts are only reported.
+    --no-batch-install            Installs the selected packages one pip call at a time, instead of a single pip call.
+    --wheelhouse=<dir>            Directory the new versions are downloaded into before installing them, defaults to the user cache (it can be shared across environments and machines).
+    --no-prefetch                 Lets pip download the new versions itself, instead of installing them from the wheelhouse.
+    --offline-index=<file>        Answers every index lookup from a snapshot file, without any network access.
+    --workspace=<root>            Searches the whole repository tree under root for requirements files (all services of a monorepo).
+    --exclude=<pattern>           Skips matching paths in the workspace search (.gitignore syntax, .gitignore files are honored too).
+    --socket=<path>               Unix socket of the daemon, defaults to a socket per project directory.
+    --poll-interval=<seconds>     Number of seconds between two checks of the requirements files by the daemon [default: 2].
+    --format=<format>             Output format: text, or ndjson / json to stream a record per package as soon as its lookup completes (report only, nothing is upgraded) [default: text].
+    --profile=<path>              Times every phase, package lookup, HTTP request, pip call and file rewrite, prints a summary and writes a Chrome trace to path.
+
+Snapshots:
+    snapshot build                Fetches the index metadata of the packages in the requirements files into a SQLite snapshot file.
+    snapshot merge                Merges other snapshot files into the snapshot file, the most recent metadata wins.
+    snapshot export               Exports the snapshot file as JSON, to the output file or the standard output.
+
+Daemon:
+    daemon                        Keeps the index metadata of the project warm in memory, watches the requirements files and answers status queries.
+    daemon stop                   Stops the daemon of the project.
+    status                        Prints the status of the packages of the project, as known by its daemon.
+
+Environment:
+    drift                         Lists the pins of the requirements files that differ from the installed packages, without any network access.
 
 Examples:
   pip-ascent             # Automatically discovers the requirements file
   pip-ascent requirements.txt
   pip-ascent requirements/dev.txt requirements/production.txt
-  pip-ascent requirements.txt -pk django -p celery
-  pip-ascent requirements.txt -pk all
+  pip-ascent requirements.txt -p django -p celery
+  pip-ascent requirements.txt -p all
+  pip-ascent requirements.txt --progressive  # Chooses the upgrades while the slow lookups are still running
   pip-ascent requirements.txt --dry-run  # Runs everything as a simulation (does not perform the actual upgrade)
+  pip-ascent snapshot build index.sqlite requirements.txt
+  pip-ascent requirements.txt --offline-index=index.sqlite
+  pip-ascent --workspace=. --exclude=legacy/
+  pip-ascent daemon --workspace=.
+  pip-ascent status
+  pip-ascent requirements.txt --profile=trace.json
+  pip-ascent --workspace=. --format=ndjson
+  pip-ascent drift --workspace=.
+  pip-ascent requirements.txt --index-route="acme-*=https://pypi.acme.dev/simple/"
 
 Help:
   Interactively upgrades packages from a requirements file and updates the pinned version in requirement file(s).
@@ -29,20 +82,30 @@ Help:
   https://github.com/thisisazeez/pip-ascent
 """
 
+import contextlib
+import json
+import sys
+
 from colorclass import Windows, Color
 from docopt import docopt
 
-from pip_ascent import __version__ as VERSION
-from pip_ascent.PackageDetector import PackageDetector
-from pip_ascent.InteractivePackageSelector import InteractivePackageSelector
-from pip_ascent.PackageStatusDetector import PackageStatusDetector
-from pip_ascent.PackageUpgrader import PackageUpgrader
+from pip_ascent import profiler
+from pip_ascent.daemon_client import default_socket_path, query_daemon
+from pip_ascent.options import DEFAULT_JOBS, numeric_option
+from pip_ascent.profiler import span
+from pip_ascent.RecordWriter import OUTPUT_FORMATS, RecordWriter
 from pip_ascent.RequirementsDetector import RequirementsDetector
 from pip_ascent.virtualenv_checker import check_for_virtualenv
 
+# Every stage imports its modules when it runs: --help, --version, the status client or a run without
+# requirements files never pay for requests, packaging, terminaltables or pip. See benchmarks/import_time.py.
+
 
 def get_options():
-    return docopt(__doc__, version=VERSION)
+    version = None
+    if '--version' in sys.argv[1:]:
+        from pip_ascent import __version__ as version
+    return docopt(__doc__, version=version)
 
 
 def main():
@@ -50,12 +113,56 @@ def main():
     options = get_options()
     Windows.enable(auto_colors=True, reset_atexit=True)
 
+    if options.get('daemon'):
+        return daemon(options)
+    if options.get('status'):
+        return daemon_status(options)
+
+    output_format = options.get('--format') or 'text'
+    if output_format not in OUTPUT_FORMATS:
+        print(Color('{{autored}}Unknown output format "{}", choose one of: {}{{/autored}}'.format(
+            output_format, ', '.join(OUTPUT_FORMATS))))
+        return
+
+    if options.get('snapshot'):
+        return run(snapshot, options)
+    if output_format == 'text':
+        return run(drift if options.get('drift') else upgrade, options)
+
+    # stdout only carries the records, everything meant for humans goes to stderr
+    writer = RecordWriter(sys.stdout, output_format)
+    command = drift if options.get('drift') else report
+    with contextlib.redirect_stdout(sys.stderr):
+        try:
+            return run(lambda options: command(options, writer), options)
+        finally:
+            writer.close()
+
+
+def run(command, options):
+    """ Runs a command, profiled with --profile. """
+    if options.get('--profile'):
+        profiler.enable()
+    try:
+        with span('run'):
+            command(options)
+    finally:
+        if options.get('--profile'):
+            profiler.print_summary()
+            profiler.write_trace(options['--profile'])
+            print(Color('Trace written to {{autoyellow}}{}{{/autoyellow}}'.format(options['--profile'])))
+
+
+def upgrade(options):
+    """ Checks the requirements files for upgrades, then installs and pins the selected packages. """
+    detector = None
     try:
         # Maybe check if the virtualenv is not activated
         check_for_virtualenv(options)
 
         # 1. Detect requirements files
-        filenames = RequirementsDetector(options.get('<requirements_file>')).get_filenames()
+        with span('detect_files'):
+            filenames = detect_requirements_files(options)
         if filenames:
             print(Color('{{autogreen}}Found valid requirements file(s):{{/autogreen}} '
                         '{{autoyellow}}\n{}{{/autoyellow}}'.format('\n'.join(filenames))))
@@ -64,17 +171,46 @@ def main():
                         'or manually specify requirements files as arguments.{/autored}'))
             return
         # 2. Detect all packages inside requirements
-        packages = PackageDetector(filenames).get_packages()
+        with span('parse_requirements'):
+            from pip_ascent.PackageDetector import PackageDetector
+            package_detector = PackageDetector(filenames)
+            packages = package_detector.get_packages()
+        with span('installed_packages'):
+            from pip_ascent.installed_packages import installed_versions
+            installed = installed_versions()
 
         # 3. Query PyPI API to see which packages have newer versions compared to the ones in requirements (or the current environment)
-        packages_status_map = PackageStatusDetector(
-            packages, options).detect_available_upgrades(options)
-
         # 4. [Optionally], display an interactive screen where the user can choose which packages to upgrade
-        selected_packages = InteractivePackageSelector(packages_status_map, options).get_packages()
+        with span('lookup'):
+            detector = create_status_detector(packages, options, package_detector.get_sources(),
+                                              package_detector.get_index_urls(), installed)
+        if options.get('--progressive') and not options['-p']:
+            # the choices are taken while the lookups are still running
+            with span('select'):
+                from pip_ascent.ProgressivePackageSelector import ProgressivePackageSelector
+                selected_packages = ProgressivePackageSelector(detector, options).get_packages()
+        else:
+            with span('lookup'):
+                packages_status_map = detector.detect_available_upgrades(options)
+            with span('select'):
+                from pip_ascent.InteractivePackageSelector import InteractivePackageSelector
+                selected_packages = InteractivePackageSelector(packages_status_map, options).get_packages()
+
+        # 5. Check the dependencies of the new versions against the other pins, before anything is installed
+        with span('plan'):
+            from pip_ascent.UpgradePlanner import UpgradePlanner
+            selected_packages = UpgradePlanner(detector, packages, options, installed).plan(selected_packages)
 
-        # 5. With the list of packages, perform the actual upgrade and replace the version inside all filenames
-        upgraded_packages = PackageUpgrader(selected_packages, filenames, options).do_upgrade()
+        # 6. Collect the digests of the new versions of the hash-pinned packages, from the index
+        with span('hashes'):
+            from pip_ascent.HashPinner import HashPinner
+            selected_packages = HashPinner(detector, packages, options).collect(selected_packages)
+
+        # 7. With the list of packages, perform the actual upgrade and replace the version inside all filenames
+        with span('upgrade'):
+            from pip_ascent.PackageUpgrader import PackageUpgrader
+            upgraded_packages = PackageUpgrader(selected_packages, filenames, options,
+                                                create_wheelhouse(options, detector), installed, packages).do_upgrade()
 
         print(Color('{{autogreen}}Successfully upgraded (and updated requirements) for the following packages: '
                     '{}{{/autogreen}}'.format(','.join([package['name'] for package in upgraded_packages]))))
@@ -83,6 +219,225 @@ def main():
 
     except KeyboardInterrupt:
         print(Color('\n{autored}Upgrade interrupted.{/autored}'))
+    finally:
+        # the pooled connections and the fan-out threads of the index queries
+        if detector is not None:
+            detector.close()
+
+
+def create_status_detector(packages, options, *args, **kwargs):
+    """ The PackageStatusDetector of a command, invalid options are reported and interrupt the command """
+    from pip_ascent.PackageStatusDetector import PackageStatusDetector
+    try:
+        return PackageStatusDetector(packages, options, *args, **kwargs)
+    except ValueError as e:
+        print(Color('{{autored}}{}{{/autored}}'.format(e)))
+        raise KeyboardInterrupt()
+
+
+def create_wheelhouse(options, detector):
+    """ The wheelhouse the upgrades are prefetched into, None with --no-prefetch """
+    if options.get('--no-prefetch'):
+        return None
+
+    from pip_ascent.Wheelhouse import Wheelhouse
+    return Wheelhouse(detector, options.get('--wheelhouse'), numeric_option(options, '--jobs', DEFAULT_JOBS, minimum=1))
+
+
+def report(options, writer):
+    """ Writes a record per package as soon as its lookup completes; nothing is installed nor rewritten. """
+    detector = None
+    try:
+        with span('detect_files'):
+            filenames = detect_requirements_files(options)
+        if not filenames:
+            print(Color('{autored}No requirements files found in the current directory. Change directory to your '
+                        'project or manually specify requirements files as arguments.{/autored}'))
+            return
+
+        with span('parse_requirements'):
+            from pip_ascent.PackageDetector import PackageDetector
+            package_detector = PackageDetector(filenames)
+
+        with span('installed_packages'):
+            from pip_ascent.installed_packages import installed_versions
+            installed = installed_versions()
+
+        with span('lookup'):
+            detector = create_status_detector(package_detector.get_packages(), options, package_detector.get_sources(),
+                                              package_detector.get_index_urls(), installed)
+            for record in detector.stream_status_records(options):
+                writer.write(record)
+    except KeyboardInterrupt:
+        print(Color('\n{autored}Report interrupted.{/autored}'))
+    finally:
+        if detector is not None:
+            detector.close()
+
+
+def drift(options, writer=None):
+    """
+    Lists the pins that differ from the installed packages, without any network access.
+
+    With a writer, a record per pin is written instead, with the name, pinned_version, installed_version
+    (None when not installed) and sources.
+    """
+    try:
+        filenames = detect_requirements_files(options)
+        if not filenames:
+            print(Color('{autored}No requirements files found in the current directory. Change directory to your '
+                        'project or manually specify requirements files as arguments.{/autored}'))
+            return
+
+        from packaging.utils import canonicalize_name
+        from pip_ascent.installed_packages import environment_paths, installed_versions, pin_drift
+        from pip_ascent.PackageDetector import PackageDetector
+
+        package_detector = PackageDetector(filenames)
+        sources = package_detector.get_sources()
+        differences = pin_drift(package_detector.get_packages(), installed_versions())
+
+        print(Color('Comparing {} requirements file(s) with the packages installed in {{autoyellow}}{}{{/autoyellow}}'
+                    .format(len(filenames), ', '.join(environment_paths() or [sys.prefix]))))
+        for name, pinned_version, installed_version in differences:
+            package_sources = sources.get(canonicalize_name(name), [])
+            if writer:
+                writer.write({
+                    'name': name,
+                    'pinned_version': str(pinned_version),
+                    'installed_version': str(installed_version) if installed_version else None,
+                    'sources': [{'file': filename, 'line': lineno} for filename, lineno in package_sources],
+                })
+                continue
+
+            installed_note = 'installed {}'.format(installed_version) if installed_version else 'not installed'
+            print(Color('{{autoyellow}}{}{{/autoyellow}}: pinned {}, {} ({})'.format(
+                name, pinned_version, installed_note,
+                ', '.join('{}:{}'.format(filename, lineno) for filename, lineno in package_sources))))
+
+        if differences:
+            print(Color('{{autored}}{} pin(s) differ from the installed packages{{/autored}}'.format(len(differences))))
+        else:
+            print(Color('{autogreen}The installed packages match the requirements files{/autogreen}'))
+    except KeyboardInterrupt:
+        print(Color('\n{autored}Drift check interrupted.{/autored}'))
+
+
+def snapshot(options):
+    """ Builds, merges or exports offline index snapshots. """
+    import sqlite3
+    from pip_ascent.SnapshotIndex import SnapshotIndex
+
+    try:
+        if options['build']:
+            build_snapshot(options)
+        elif options['merge']:
+            index = SnapshotIndex(options['<snapshot_file>'], create=True)
+            for source in options['<source_snapshot>']:
+                merged = index.merge(source)
+                print(Color('Merged {{autoyellow}}{}{{/autoyellow}} package(s) from {}'.format(merged, source)))
+            index.close()
+        elif options['export']:
+            index = SnapshotIndex(options['<snapshot_file>'])
+            exported = index.export()
+            index.close()
+            if options['<output_file>']:
+                with open(options['<output_file>'], 'w') as fh:
+                    json.dump(exported, fh, indent=2, sort_keys=True)
+            else:
+                json.dump(exported, sys.stdout, indent=2, sort_keys=True)
+                print('')
+    except (IOError, sqlite3.DatabaseError) as e:
+        print(Color('{{autored}}{}{{/autored}}'.format(e)))
+    except KeyboardInterrupt:
+        print(Color('\n{autored}Snapshot interrupted.{/autored}'))
+
+
+def daemon(options):
+    """ Runs or stops the daemon of the project. """
+    socket_path = options.get('--socket') or default_socket_path()
+    if options.get('stop'):
+        try:
+            query_daemon('stop', socket_path)
+            print(Color('{autogreen}Daemon stopped.{/autogreen}'))
+        except IOError:
+            print(Color('{{autored}}No pip-ascent daemon listening on {}{{/autored}}'.format(socket_path)))
+        return
+
+    from pip_ascent.Daemon import Daemon
+
+    try:
+        project_daemon = Daemon(lambda: detect_requirements_files(options), options, socket_path)
+    except ValueError as e:
+        print(Color('{{autored}}{}{{/autored}}'.format(e)))
+        return
+
+    try:
+        project_daemon.run()
+    except KeyboardInterrupt:
+        print(Color('\n{autored}Daemon stopped.{/autored}'))
+
+
+def daemon_status(options):
+    """ Prints the status of the packages of the project, as answered by its daemon. """
+    socket_path = options.get('--socket') or default_socket_path()
+    try:
+        status = query_daemon('status', socket_path)
+    except IOError:
+        print(Color('{{autored}}No pip-ascent daemon listening on {}, start one with: '
+                    'pip-ascent daemon{{/autored}}'.format(socket_path)))
+        return
+
+    packages = status['packages']
+    for i, package in enumerate(packages):
+        print('{}/{}: {} ... '.format(i + 1, len(packages), package['name']), end='')
+        if package['upgrade_available']:
+            print('upgrade available: {} ==> {} (uploaded on {})'.format(package['current_version'],
+                                                                         package['latest_version'],
+                                                                         package['upload_time']))
+        else:
+            print('up to date: {}'.format(package['current_version']))
+
+    for package_name, reason in sorted(status['errors'].items()):  # pragma: nocover
+        print(package_name, reason)
+
+
+def detect_requirements_files(options):
+    return RequirementsDetector(options.get('<requirements_file>'),
+                                workspace=options.get('--workspace'),
+                                excludes=options.get('--exclude'),
+                                jobs=numeric_option(options, '--jobs', DEFAULT_JOBS, minimum=1)).get_filenames()
+
+
+def build_snapshot(options):
+    from pip_ascent.PackageDetector import PackageDetector
+    from pip_ascent.SnapshotIndex import SnapshotIndex
+
+    filenames = detect_requirements_files(options)
+    if not filenames:
+        print(Color('{autored}No requirements files found in the current directory. Change directory to your project '
+                    'or manually specify requirements files as arguments.{/autored}'))
+        return
+
+    package_detector = PackageDetector(filenames)
+    package_names = package_detector.get_package_names()
+    detector = create_status_detector([], options, index_urls=package_detector.get_index_urls())
+    index = SnapshotIndex(options['<snapshot_file>'], create=True)
+
+    stored = 0
+    try:
+        for package_name, version_index, reason in detector.fetch_version_indexes(package_names):
+            if version_index is None:  # pragma: nocover
+                print(package_name, reason)
+                continue
+            index.store(package_name, version_index)
+            stored += 1
+    finally:
+        index.close()
+        detector.close()
+
+    print(Color('{{autogreen}}Stored {} of {} package(s) in {}{{/autogreen}}'.format(
+        stored, len(package_names), options['<snapshot_file>'])))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,58 @@
+import hashlib
+import json
+import os
+import socket
+import tempfile
+
+DEFAULT_TIMEOUT = 10  # seconds
+
+
+def default_socket_path(directory=None):
+    """
+    Returns the socket path of the daemon serving a project directory.
+
+    Every project gets its own daemon, so the path is derived from the absolute project directory. Sockets
+    live in the user runtime directory when there is one, otherwise in the temporary directory.
+
+    :param directory: The project directory, defaults to the current working directory.
+    """
+    project = os.path.abspath(directory or os.getcwd())
+    digest = hashlib.sha1(project.encode('utf-8')).hexdigest()[:12]
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR') or tempfile.gettempdir()
+    uid = os.getuid() if hasattr(os, 'getuid') else 0
+    return os.path.join(runtime_dir, 'pip-ascent-{}-{}.sock'.format(uid, digest))
+
+
+def query_daemon(command, socket_path=None, timeout=DEFAULT_TIMEOUT, **arguments):
+    """
+    Sends a single command to a running daemon and returns its answer.
+
+    The protocol is one JSON object per line in each direction: {"command": ..., **arguments} is sent,
+    a {"ok": bool, ...} object is read back.
+
+    :param command: The command name: "status", "ping" or "stop".
+    :param socket_path: The daemon socket, defaults to the socket of the current directory.
+    :param timeout: Number of seconds to wait for the answer.
+    :return: The decoded answer.
+    :raises IOError: when no daemon is listening on the socket, or the answer is invalid.
+    """
+    request = dict(arguments, command=command)
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.settimeout(timeout)
+    try:
+        client.connect(socket_path or default_socket_path())
+        client.sendall(json.dumps(request).encode('utf-8') + b'\n')
+
+        answer = b''
+        while not answer.endswith(b'\n'):
+            chunk = client.recv(64 * 1024)
+            if not chunk:
+                break
+            answer += chunk
+    finally:
+        client.close()
+
+    try:
+        return json.loads(answer.decode('utf-8'))
+    except ValueError:
+        raise IOError('Invalid answer from the pip-ascent daemon')
@@ -0,0 +1,99 @@
+import os
+import sys
+from configparser import ConfigParser, Error as ConfigParserError
+
+from pip_ascent.PackageIndex import DEFAULT_INDEX_URL, PackageIndex
+
+# legacy and current per-user pip configuration files, by priority
+USER_CONFIG_FILES = (
+    '~/.pip/pip.conf',
+    '~/.pip/pip.ini',
+    '~/.config/pip/pip.conf',
+    '~/.config/pip/pip.ini',
+)
+
+# pip reads the options of the install command from the [install] section, which overrides [global]
+CONFIG_SECTIONS = ('install', 'global')
+
+
+def site_config_files():
+    """
+    Site-wide pip configuration files, located like pip does, without importing pip.
+    """
+    if sys.platform == 'win32':  # pragma: nocover
+        return [os.path.join(os.environ.get('ProgramData', 'C:\\ProgramData'), 'pip', 'pip.ini')]
+    if sys.platform == 'darwin':  # pragma: nocover
+        return ['/Library/Application Support/pip/pip.conf']
+
+    config_dirs = os.environ.get('XDG_CONFIG_DIRS') or '/etc/xdg'
+    return [os.path.join(path, 'pip', 'pip.conf') for path in config_dirs.split(os.pathsep) if path] + ['/etc/pip.conf']
+
+
+def config_files(user_config_files=USER_CONFIG_FILES):
+    """
+    The pip configuration files that exist, by priority: PIP_CONFIG_FILE, the user, the virtualenv, then the site.
+    """
+    filenames = []
+    if os.environ.get('PIP_CONFIG_FILE'):
+        filenames.append(os.environ['PIP_CONFIG_FILE'])
+    filenames.extend(os.path.expanduser(filename) for filename in user_config_files)
+    if 'VIRTUAL_ENV' in os.environ:
+        filenames.append(os.path.join(os.environ['VIRTUAL_ENV'], 'pip.conf'))
+        filenames.append(os.path.join(os.environ['VIRTUAL_ENV'], 'pip.ini'))
+    filenames.extend(site_config_files())
+    return [filename for filename in filenames if os.path.isfile(filename)]
+
+
+def _read_config(filename):
+    """ Returns the index-url (or None) and the extra-index-url list of a pip configuration file """
+    config = ConfigParser(interpolation=None)  # urls may hold percent-encoded credentials
+    try:
+        config.read([filename])
+    except ConfigParserError:  # pragma: nocover
+        return None, []
+
+    index_url, extra_index_urls = None, []
+    for section in CONFIG_SECTIONS:
+        if config.has_section(section):
+            index_url = index_url or config.get(section, 'index-url', fallback=None)
+            extra_index_urls.extend(config.get(section, 'extra-index-url', fallback='').split())
+    return index_url, extra_index_urls
+
+
+def configured_indexes(requirements_index_url=None, requirements_extra_index_urls=(),
+                       user_config_files=USER_CONFIG_FILES):
+    """
+    Collects every configured index, the primary one first.
+
+    The primary index is, by priority: the --index-url of the requirements files, the PIP_INDEX_URL environment
+    variable, the first pip configuration file setting index-url, then PyPI. Extra indexes are merged from the
+    requirements files, the PIP_EXTRA_INDEX_URL environment variable and every pip configuration file.
+
+    :param requirements_index_url: The --index-url found in the requirements files.
+    :param requirements_extra_index_urls: The --extra-index-url found in the requirements files.
+    :param user_config_files: Per-user pip configuration files to read.
+    :return: List of PackageIndex, without duplicates.
+    """
+    index_url, index_origin = None, None
+    extra_indexes = [(url, 'requirements files') for url in requirements_extra_index_urls]
+
+    if requirements_index_url:
+        index_url, index_origin = requirements_index_url, 'requirements files'
+    elif os.environ.get('PIP_INDEX_URL'):
+        index_url, index_origin = os.environ['PIP_INDEX_URL'], 'PIP_INDEX_URL environment variable'
+
+    extra_indexes.extend((url, 'PIP_EXTRA_INDEX_URL environment variable')
+                         for url in os.environ.get('PIP_EXTRA_INDEX_URL', '').split())
+
+    for filename in config_files(user_config_files):
+        config_index_url, config_extra_index_urls = _read_config(filename)
+        if config_index_url and not index_url:
+            index_url, index_origin = config_index_url, filename
+        extra_indexes.extend((url, filename) for url in config_extra_index_urls)
+
+    indexes = [PackageIndex(index_url or DEFAULT_INDEX_URL, index_origin)]
+    for url, origin in extra_indexes:
+        index = PackageIndex(url, origin)
+        if index not in indexes:
+            indexes.append(index)
+    return indexes
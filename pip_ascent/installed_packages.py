@@ -0,0 +1,105 @@
+import glob
+import os
+import sys
+from collections import OrderedDict
+from importlib import metadata
+
+from packaging.utils import canonicalize_name
+from packaging.version import InvalidVersion
+
+from pip_ascent.VersionIndex import parse_version
+
+
+def environment_paths():
+    """
+    Import paths of the environment pip installs into.
+
+    That is the activated virtual environment when pip-ascent runs from another interpreter (such as a
+    system-wide installation), or None for the environment of the running interpreter.
+    """
+    virtual_env = os.environ.get('VIRTUAL_ENV')
+    if not virtual_env or os.path.realpath(virtual_env) == os.path.realpath(sys.prefix):
+        return None
+
+    if sys.platform == 'win32':  # pragma: nocover
+        return glob.glob(os.path.join(virtual_env, 'Lib', 'site-packages')) or None
+    return glob.glob(os.path.join(virtual_env, 'lib', 'python*', 'site-packages')) or None
+
+
+def installed_versions(paths=None):
+    """
+    Snapshot of the distributions installed in the environment, read from their metadata without running pip.
+
+    :param paths: Import paths to inspect, defaults to environment_paths(), or sys.path.
+    :return: A dict of canonical package name to installed version.
+    """
+    paths = paths or environment_paths()
+    distributions = metadata.distributions(path=paths) if paths else metadata.distributions()
+
+    versions = {}
+    for distribution in distributions:
+        distribution_metadata = distribution.metadata  # parsed on every access
+        name, raw_version = distribution_metadata['Name'], distribution_metadata['Version']
+        if not name or not raw_version:  # pragma: nocover
+            continue
+        try:
+            # the first distribution found wins, like for imports
+            versions.setdefault(canonicalize_name(name), parse_version(raw_version))
+        except InvalidVersion:  # pragma: nocover
+            pass
+    return versions
+
+
+def installed_metadata(package_name, paths=None):
+    """
+    Dependencies of an installed distribution.
+
+    :param package_name: The package name.
+    :param paths: Import paths to inspect, defaults to environment_paths(), or sys.path.
+    :return: Dict with the version, the requires_dist list and requires_python (None when unset), None when the
+             package is not installed.
+    """
+    paths = paths or environment_paths()
+    distributions = metadata.distributions(name=package_name, path=paths) if paths else \
+        metadata.distributions(name=package_name)
+
+    for distribution in distributions:
+        distribution_metadata = distribution.metadata
+        return {
+            'version': distribution_metadata['Version'],
+            'requires_dist': distribution_metadata.get_all('Requires-Dist') or [],
+            'requires_python': distribution_metadata['Requires-Python'],
+        }
+    return None
+
+
+def pinned_versions(requirement_lines):
+    """
+    The exact pins (name==version) of requirement lines.
+
+    :param requirement_lines: RequirementLine records, as detected by PackageDetector.
+    :return: OrderedDict of (canonical package name, pinned version) to the name as first spelled.
+    """
+    pins = OrderedDict()
+    for requirement in requirement_lines:
+        if requirement.operator != '==' or requirement.version.endswith('.*'):
+            continue
+        try:
+            pins.setdefault((requirement.canonical_name, parse_version(requirement.version)), requirement.name)
+        except InvalidVersion:  # pragma: nocover
+            pass
+    return pins
+
+
+def pin_drift(requirement_lines, installed):
+    """
+    The pins that do not match the installed version.
+
+    :param requirement_lines: RequirementLine records, as detected by PackageDetector.
+    :param installed: Snapshot of the installed versions, see installed_versions().
+    :return: List of (name, pinned version, installed version) tuples, the installed version is None for the
+             packages that are not installed.
+    """
+    return [(name, pinned_version, installed.get(canonical_name))
+            for (canonical_name, pinned_version), name in pinned_versions(requirement_lines).items()
+            if installed.get(canonical_name) != pinned_version]
@@ -0,0 +1,17 @@
+DEFAULT_JOBS = 8
+
+
+def numeric_option(options, name, default, minimum=0, cast=int):
+    """
+    Reads a numeric command line option, falling back to the default when missing or invalid.
+
+    :param options: The docopt options dict.
+    :param name: The option name, such as '--jobs'.
+    :param default: Value used when the option is missing or invalid.
+    :param minimum: Lower bound of the value.
+    :param cast: Type of the value, int or float.
+    """
+    try:
+        return max(minimum, cast(options.get(name)))
+    except (TypeError, ValueError):
+        return default
@@ -0,0 +1,160 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+_recorder = None
+
+
+class _NoopSpan(object):
+    """ Span handed out while profiling is off: entering, leaving and annotating it does nothing """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def set(self, **args):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Span(object):
+    """ A timed section of the run, recorded as a Chrome trace complete event when it ends """
+
+    def __init__(self, recorder, name, category, args):
+        self.recorder = recorder
+        self.name = name
+        self.category = category
+        self.args = args
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, *exc_info):
+        if exc_type is not None:
+            self.args['error'] = exc_type.__name__
+        self.recorder.record(self, time.perf_counter() - self.start)
+        return False
+
+    def set(self, **args):
+        """ Annotates the span, such as the status and size of an HTTP answer """
+        self.args.update(args)
+
+
+class Recorder(object):
+    """ Collects the spans of a run, from every thread """
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.events = []
+        self.threads = {}
+        self._lock = threading.Lock()
+
+    def span(self, name, category, args):
+        return Span(self, name, category, args)
+
+    def record(self, span, duration):
+        thread = threading.current_thread()
+        with self._lock:
+            self.threads.setdefault(thread.ident, thread.name)
+            self.events.append((span.name, span.category, span.start - self.origin, duration, thread.ident,
+                                span.args))
+
+    def chrome_trace(self):
+        """ The spans in the Chrome trace event format, to open in chrome://tracing or Perfetto """
+        pid = os.getpid()
+        with self._lock:
+            events, threads = list(self.events), dict(self.threads)
+
+        trace_events = [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': name}}
+                        for tid, name in threads.items()]
+        for name, category, start, duration, tid, args in events:
+            trace_events.append({
+                'name': name,
+                'cat': category,
+                'ph': 'X',
+                'ts': round(start * 1e6, 1),
+                'dur': round(duration * 1e6, 1),
+                'pid': pid,
+                'tid': tid,
+                'args': args,
+            })
+        return {'traceEvents': trace_events, 'displayTimeUnit': 'ms'}
+
+    def summary(self):
+        """
+        Aggregated durations: one row per phase, and one row per category for the spans repeated per
+        package, HTTP request, pip call or file.
+
+        :return: OrderedDict of row label to (count, total seconds, max seconds), in first seen order.
+        """
+        with self._lock:
+            events = sorted(self.events, key=lambda event: event[2])
+
+        rows = OrderedDict()
+        for name, category, _, duration, _, _ in events:
+            label = name if category == 'phase' else category
+            count, total, longest = rows.get(label, (0, 0.0, 0.0))
+            rows[label] = (count + 1, total + duration, max(longest, duration))
+        return rows
+
+
+def enable():
+    """ Starts recording the spans of the run """
+    global _recorder
+    _recorder = Recorder()
+    return _recorder
+
+
+def is_enabled():
+    return _recorder is not None
+
+
+def span(name, category='phase', **args):
+    """
+    Returns a context manager timing a section of the run.
+
+    :param name: Name of the span, such as the phase or the package name.
+    :param category: "phase", or the kind of repeated span: "package", "http", "parse", "pip", "file"...
+    :param args: Details attached to the span.
+    """
+    if _recorder is None:
+        return NOOP_SPAN
+    return _recorder.span(name, category, args)
+
+
+def write_trace(filename):
+    """ Writes the Chrome trace of the recorded spans """
+    with open(filename, 'w') as fh:
+        json.dump(_recorder.chrome_trace(), fh)
+
+
+def print_summary():
+    """ Prints the time spent per phase and per kind of repeated span """
+    from colorclass import Color
+    from terminaltables import AsciiTable
+
+    data = [[
+        Color('{autoblue}Span{/autoblue}'),
+        Color('{autoblue}Count{/autoblue}'),
+        Color('{autoblue}Total (s){/autoblue}'),
+        Color('{autoblue}Mean (ms){/autoblue}'),
+        Color('{autoblue}Max (ms){/autoblue}'),
+    ]]
+    for label, (count, total, longest) in _recorder.summary().items():
+        data.append([label, count, '{:.3f}'.format(total), '{:.1f}'.format(total * 1000 / count),
+                     '{:.1f}'.format(longest * 1000)])
+
+    table = AsciiTable(data)
+    for column in range(1, 5):
+        table.justify_columns[column] = 'right'
+    print('')
+    print(Color('{autogreen}Profile:{/autogreen}'))
+    print(table.table)
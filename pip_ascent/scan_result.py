@@ -0,0 +1,36 @@
+class ScanResult(object):
+    """
+    The status of a pinned package, as yielded by Scanner.
+
+    The attributes are the fields of the records of --format=ndjson: name, pinned_version (the lower bound of a
+    range), specifier (None for an exact pin), installed_version (always None, the environment is not inspected),
+    latest_version, latest_compatible (the latest version the range allows, None for an exact pin),
+    upgrade_available, upload_time and error (None on success, the versions and upgrade_available are None
+    otherwise). The versions are strings. sources is a list of (filename, line number) tuples, of every place
+    pinning the package.
+    """
+
+    __slots__ = ('name', 'pinned_version', 'specifier', 'installed_version', 'latest_version', 'latest_compatible',
+                 'upgrade_available', 'upload_time', 'sources', 'error')
+
+    def __init__(self, record):
+        """
+        Initializes the ScanResult instance.
+
+        :param record: Status record, as built by PackageStatusDetector.status_record().
+        """
+        for name in self.__slots__:
+            setattr(self, name, record[name])
+        self.sources = [(source['file'], source['line']) for source in record['sources']]
+
+    def as_dict(self):
+        """ The JSON serializable record of the result, the same as the ones of --format=ndjson """
+        record = {name: getattr(self, name) for name in self.__slots__}
+        record['sources'] = [{'file': filename, 'line': lineno} for filename, lineno in self.sources]
+        return record
+
+    def __repr__(self):
+        if self.error:
+            return '<ScanResult {} {}: {}>'.format(self.name, self.specifier or self.pinned_version, self.error)
+        return '<ScanResult {} {} latest {}>'.format(self.name, self.specifier or self.pinned_version,
+                                                     self.latest_version)
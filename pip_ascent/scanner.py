@@ -0,0 +1,145 @@
+from collections import OrderedDict
+
+from packaging.utils import canonicalize_name
+
+from pip_ascent.IndexCache import DEFAULT_TTL
+from pip_ascent.IndexTransport import DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT, DEFAULT_RETRIES
+from pip_ascent.options import DEFAULT_JOBS
+from pip_ascent.PackageDetector import PackageDetector
+from pip_ascent.PackageStatusDetector import PackageStatusDetector
+from pip_ascent.scan_result import ScanResult
+
+
+class Scanner(object):
+    """
+    Python API: reports the status of the pinned packages of requirements files, project after project.
+
+    A Scanner keeps a single index configuration, HTTP connection pool, on-disk cache and set of version indexes for
+    all its scans, so that a package pinned by several projects is looked up once: scanning a batch of projects
+    costs about as many lookups as there are distinct packages in it. Nothing is printed, installed nor rewritten,
+    and invalid requirement lines are skipped silently. The index options of the requirements files (--index-url,
+    --extra-index-url) are not followed, the indexes are the ones of the Scanner.
+
+        with Scanner(jobs=16) as scanner:
+            for result in scanner.scan(['service/requirements.txt']):
+                if result.upgrade_available:
+                    print(result.name, result.pinned_version, result.latest_version)
+    """
+
+    detector = None
+
+    def __init__(self, index_url=None, extra_index_urls=(), use_default_index=False, index_routes=(),
+                 offline_index=None, prerelease=False, check_greater_equal=False, check_specifiers=False,
+                 jobs=DEFAULT_JOBS, retries=DEFAULT_RETRIES, connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+                 read_timeout=DEFAULT_READ_TIMEOUT, cache=True, cache_ttl=DEFAULT_TTL):
+        """
+        Initializes the Scanner instance, the parameters are the ones of the command line options.
+
+        :param index_url: The index queried first, on top of the ones of the environment and pip configuration.
+        :param extra_index_urls: The other indexes queried.
+        :param use_default_index: Queries PyPI only, ignoring index_url, extra_index_urls, the environment and the pip
+                                  configuration file(s).
+        :param index_routes: List of "<pattern>=<index-url>" routes, see --index-route.
+        :param offline_index: Snapshot file every lookup is answered from, without any network access.
+        :param prerelease: Whether prerelease versions are reported as upgrades.
+        :param check_greater_equal: Whether the package>=version requirements are reported too.
+        :param check_specifiers: Whether the version ranges are reported too.
+        :param jobs: Maximum number of concurrent requests per index host.
+        :param retries: Number of retries for index connection errors, 5xx and 429 answers.
+        :param connect_timeout: Timeout for connecting to the index, in seconds.
+        :param read_timeout: Timeout for waiting on an index answer, in seconds.
+        :param cache: Whether the index responses are kept in the on-disk cache.
+        :param cache_ttl: Number of seconds a cached index response is used without revalidation.
+        :raises ValueError: for an invalid index route or offline index.
+        """
+        options = {
+            '-p': None,
+            '--use-default-index': use_default_index,
+            '--index-route': list(index_routes),
+            '--offline-index': offline_index,
+            '--prerelease': prerelease,
+            '--check-greater-equal': check_greater_equal,
+            '--check-specifiers': check_specifiers,
+            '--jobs': jobs,
+            '--retries': retries,
+            '--connect-timeout': connect_timeout,
+            '--read-timeout': read_timeout,
+            '--no-cache': not cache,
+            '--cache-ttl': cache_ttl,
+        }
+
+        self.detector = PackageStatusDetector([], options, index_urls=(index_url, list(extra_index_urls)), quiet=True)
+        self._indexes = {}  # canonical name -> VersionIndex
+
+    def scan(self, requirements_files):
+        """
+        Reports the status of the pinned packages of requirements files.
+
+        :param requirements_files: List of requirements file names, read right away.
+        :return: Generator of ScanResult, one per pinned package (a package pinned several times is reported once,
+                 with its oldest pin): the packages already known by the Scanner first, then the other ones once
+                 looked up, in the order of the requirements files.
+        :raises IOError: when a requirements file can not be read.
+        """
+        return self._scan(PackageDetector(requirements_files, quiet=True))
+
+    def scan_text(self, content, filename='<string>'):
+        """
+        Reports the status of the pinned packages of requirements given as text, such as a file read from a remote
+        repository.
+
+        :param content: The text of a requirements file.
+        :param filename: The name the pins are reported under, in the sources of the results.
+        :return: Generator of ScanResult, see scan().
+        """
+        package_detector = PackageDetector([], quiet=True)
+        package_detector.detect_content(content, filename)
+        return self._scan(package_detector)
+
+    def clear(self):
+        """ Forgets the version indexes, the next scans look every package up again (through the on-disk cache) """
+        self._indexes = {}
+
+    def close(self):
+        """ Closes the pooled connections of the Scanner, it can not scan anymore """
+        self.detector.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _scan(self, package_detector):
+        pins = OrderedDict()  # canonical name -> (first spelling, oldest pinned version, range of the oldest pin)
+        pinned = self.detector.pinned_packages(package_detector.get_packages())
+        for _, requirement, package_name, current_version in pinned:
+            pin = pins.get(requirement.canonical_name)
+            if pin is None or current_version < pin[1]:
+                pins[requirement.canonical_name] = (pin[0] if pin else package_name, current_version,
+                                                    self.detector.range_specifier(requirement))
+        return self._results(pins, package_detector.get_sources())
+
+    def _results(self, pins, sources):
+        missing = []
+        for canonical_name in pins:
+            if canonical_name in self._indexes:
+                yield self._result(pins[canonical_name], self._indexes[canonical_name], None, sources)
+            else:
+                missing.append(canonical_name)
+        if not missing:
+            return
+
+        lookups = self.detector.fetch_version_indexes([pins[canonical_name][0] for canonical_name in missing])
+        for canonical_name, (_, version_index, reason) in zip(missing, lookups):
+            # failed lookups are not kept, the next scans try again
+            if version_index is not None:
+                self._indexes[canonical_name] = version_index
+            yield self._result(pins[canonical_name], version_index, reason, sources)
+
+    def _result(self, pin, version_index, reason, sources):
+        package_name, current_version, specifier = pin
+        record = self.detector.status_record(package_name, current_version, version_index, reason, specifier)
+        record['sources'] = [{'file': filename, 'line': lineno}
+                             for filename, lineno in sources.get(canonicalize_name(package_name), [])]
+        return ScanResult(record)
@@ -0,0 +1,81 @@
+from packaging.specifiers import InvalidSpecifier, SpecifierSet
+from packaging.version import InvalidVersion
+
+from pip_ascent.VersionIndex import parse_version
+
+SPECIFIER_UPDATES = ('bump', 'widen')
+
+
+def lower_bound(clauses):
+    """
+    The lowest version a range may resolve to, as written in its clauses.
+
+    :param clauses: (operator, version) pairs, such as the ones of a SpecifierSet.
+    :return: The highest of the >=, >, ~= and ==X.* bounds, None for a range without lower bound (such as "<5").
+    """
+    bound = None
+    for operator, raw_version in clauses:
+        if operator not in ('>=', '>', '~=', '=='):
+            continue
+        try:
+            vers = parse_version(raw_version[:-2] if raw_version.endswith('.*') else raw_version)
+        except InvalidVersion:  # pragma: nocover
+            continue
+        bound = vers if bound is None else max(bound, vers)
+    return bound
+
+
+def updated_clauses(clauses, target):
+    """
+    Moves the bounds of a range so that it starts at the target version: the lower bounds (>= and ~=) are raised to
+    it, and the upper bounds that exclude it (<, <= and ==X.*) are moved past it, with the same precision (a "<5"
+    bound becomes "<6" for 5.1.2). The other clauses (>, != and ===) are kept.
+
+    :param clauses: (operator, version) pairs, such as the ones of a SpecifierSet.
+    :param target: The version the range must start at.
+    :return: The new version of every clause, in the same order (unchanged ones included), None when the range can
+             not admit the target (such as "!=<target>").
+    """
+    new_versions = []
+    for operator, raw_version in clauses:
+        wildcard = raw_version.endswith('.*')
+        try:
+            vers = parse_version(raw_version[:-2] if wildcard else raw_version)
+        except InvalidVersion:  # pragma: nocover
+            return None
+
+        new_version = raw_version
+        if operator == '>=' and target > vers:
+            new_version = str(target)
+        elif operator == '~=' and _truncated(target, len(vers.release)) != vers:
+            new_version = str(_truncated(target, len(vers.release)))
+        elif operator == '<' and target >= vers:
+            new_version = str(_next_release(target, len(vers.release)))
+        elif operator == '<=' and target > vers:
+            new_version = str(target)
+        elif operator == '==' and wildcard and _truncated(target, len(vers.release)) != vers:
+            new_version = '{}.*'.format(_truncated(target, len(vers.release)))
+        new_versions.append(new_version)
+
+    try:
+        specifier = SpecifierSet(','.join(operator + new_version
+                                          for (operator, _), new_version in zip(clauses, new_versions)))
+    except InvalidSpecifier:  # pragma: nocover
+        return None
+    return new_versions if specifier.contains(target, prereleases=True) else None
+
+
+def _truncated(vers, length):
+    """ The release of a version, cut or padded with zeros to length components """
+    release = (vers.release + (0,) * length)[:length]
+    return parse_version(_format_release(vers.epoch, release))
+
+
+def _next_release(vers, length):
+    """ The first release after a version, at a precision of length components: 5.1.2 gives 6 or 5.2 """
+    release = (vers.release + (0,) * length)[:length]
+    return parse_version(_format_release(vers.epoch, release[:-1] + (release[-1] + 1,)))
+
+
+def _format_release(epoch, release):
+    return '{}{}'.format('{}!'.format(epoch) if epoch else '', '.'.join(str(part) for part in release))
@@ -63,6 +63,7 @@ setup(
     install_requires=['docopt', 'packaging', 'requests', 'terminaltables', 'colorclass'],
     extras_require={
         'test': ['coverage', 'pytest', 'pytest-cov', 'pytest-pep8', 'mock', 'responses'],
+        'streaming': ['ijson'],
     },
     entry_points={
         'console_scripts': [
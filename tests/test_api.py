@@ -0,0 +1,40 @@
+import subprocess
+import sys
+
+import pytest
+
+
+@pytest.mark.parametrize('statements', [
+    'from pip_ascent import Scanner, ScanResult',
+    'import pip_ascent.scanner, pip_ascent.scan_result; from pip_ascent import Scanner, ScanResult',
+    'from pip_ascent.scanner import Scanner as _; from pip_ascent import Scanner, ScanResult',
+    'import pip_ascent; Scanner, ScanResult = pip_ascent.Scanner, pip_ascent.ScanResult',
+])
+def test_exports_are_the_classes(statements):
+    # in a fresh interpreter, the exports must not depend on what was imported before
+    subprocess.check_call([sys.executable, '-c', statements + '; assert isinstance(Scanner, type), Scanner; '
+                                                              'assert isinstance(ScanResult, type), ScanResult'])
+
+
+@pytest.mark.parametrize('options, message', [
+    ({'index_routes': ['acme-*']}, 'Invalid index route "acme-\\*"'),
+    ({'offline_index': '/nonexistent/snapshot.db'}, 'Offline index not found'),
+])
+def test_invalid_options_raise_value_error(options, message, capsys):
+    from pip_ascent import Scanner
+
+    with pytest.raises(ValueError, match=message):
+        Scanner(cache=False, **options)
+    assert capsys.readouterr().out == ''
+
+
+def test_scan_text_prints_nothing(capsys):
+    from pip_ascent import Scanner
+
+    with Scanner(index_url='http://127.0.0.1:9/simple/', retries=0, connect_timeout=1, cache=False) as scanner:
+        results = list(scanner.scan_text('django==1.11\nnot a requirement ==\n', 'requirements.txt'))
+
+    assert [(result.name, result.pinned_version, result.sources) for result in results] == \
+        [('django', '1.11', [('requirements.txt', 1)])]
+    assert results[0].error is not None
+    assert capsys.readouterr().out == ''
@@ -0,0 +1,90 @@
+import json
+import os
+import socket
+import threading
+
+import pytest
+
+from pip_ascent.Daemon import Daemon
+from pip_ascent.daemon_client import query_daemon
+
+OPTIONS = {'--check-greater-equal': False, '--no-cache': True}
+
+
+@pytest.fixture
+def requirements(tmp_path, monkeypatch):
+    monkeypatch.delenv('PIP_INDEX_URL', raising=False)
+    monkeypatch.delenv('PIP_EXTRA_INDEX_URL', raising=False)
+    filename = tmp_path / 'requirements.txt'
+    filename.write_text('--index-url http://127.0.0.1:9/private/simple/\ndjango==1.11\n')
+    return filename
+
+
+def write(filename, content):
+    mtime = os.stat(str(filename)).st_mtime_ns
+    filename.write_text(content)
+    os.utime(str(filename), ns=(mtime + 10 ** 9, mtime + 10 ** 9))
+
+
+def test_indexes_of_the_requirements_files(requirements, tmp_path):
+    daemon = Daemon(lambda: [str(requirements)], OPTIONS, str(tmp_path / 'daemon.sock'))
+    try:
+        assert daemon.index_urls == ('http://127.0.0.1:9/private/simple/', [])
+        assert daemon.detector.PYPI_API_URL.startswith('http://127.0.0.1:9/private/simple/')
+
+        daemon._reload_files()
+        detector = daemon.detector
+        write(requirements, '--index-url http://127.0.0.1:9/other/simple/\n'
+                            '--extra-index-url http://127.0.0.1:9/extra/simple/\ndjango==1.11\n')
+        daemon._reload_files()
+
+        assert daemon.index_urls == ('http://127.0.0.1:9/other/simple/', ['http://127.0.0.1:9/extra/simple/'])
+        assert daemon.detector is not detector
+        assert daemon.detector.PYPI_API_URL.startswith('http://127.0.0.1:9/other/simple/')
+        assert len(daemon.detector.router.all_indexes()) == 2
+    finally:
+        daemon.detector.close()
+
+
+def test_detector_kept_while_the_indexes_do_not_change(requirements, tmp_path):
+    daemon = Daemon(lambda: [str(requirements)], OPTIONS, str(tmp_path / 'daemon.sock'))
+    try:
+        daemon._reload_files()
+        detector = daemon.detector
+        write(requirements, '--index-url http://127.0.0.1:9/private/simple/\ndjango==2.2\n')
+        daemon._reload_files()
+
+        assert daemon.detector is detector
+        assert [(name, str(version)) for name, version, _ in daemon._files[str(requirements)][1]] == \
+            [('django', '2.2')]
+    finally:
+        daemon.detector.close()
+
+
+def send(socket_path, line):
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.settimeout(5)
+    try:
+        client.connect(socket_path)
+        client.sendall(line + b'\n')
+        return json.loads(client.makefile('rb').readline().decode('utf-8'))
+    finally:
+        client.close()
+
+
+@pytest.mark.parametrize('line', [b'[]', b'"status"', b'42', b'null', b'{"command": ', b'\xff'])
+def test_invalid_requests_are_answered(requirements, tmp_path, line):
+    socket_path = str(tmp_path / 'daemon.sock')
+    daemon = Daemon(lambda: [str(requirements)], OPTIONS, socket_path)
+    daemon._listen()
+    server = threading.Thread(target=daemon._server.serve_forever)
+    server.start()
+    try:
+        assert send(socket_path, line) == {'ok': False, 'error': 'invalid request'}
+        # the daemon keeps serving
+        assert query_daemon('ping', socket_path)['ok']
+    finally:
+        daemon._server.shutdown()
+        server.join()
+        daemon._server.server_close()
+        daemon.detector.close()
@@ -0,0 +1,87 @@
+import pytest
+
+from pip_ascent.HashPinner import HashPinner
+from pip_ascent.PackageDetector import PackageDetector
+from pip_ascent.PackageUpgrader import PackageUpgrader
+from pip_ascent.VersionIndex import parse_version
+
+OPTIONS = {'--dry-run': False, '--check-greater-equal': False, '--skip-package-installation': True}
+
+RELEASE_FILES = {
+    ('requests', '2.31.0'): [
+        {'filename': 'requests-2.31.0-py3-none-any.whl', 'hashes': {'sha256': 'DDDD', 'md5': '1111'}},
+        {'filename': 'requests-2.31.0.tar.gz', 'hashes': {'sha256': 'eeee', 'sha512': 'ffff'}},
+    ],
+    ('six', '1.16.0'): [
+        {'filename': 'six-1.16.0-py2.py3-none-any.whl', 'hashes': {'sha256': '9999', 'sha512': '8888'}},
+    ],
+    ('idna', '3.4'): [
+        {'filename': 'idna-3.4-py3-none-any.whl', 'hashes': {'sha256': '7777'}},
+        {'filename': 'idna-3.4.tar.gz', 'hashes': {'md5': '6666'}},
+    ],
+}
+
+
+class FakeDetector(object):
+    def release_files(self, package_name, release):
+        return RELEASE_FILES.get((package_name, str(release)), [])
+
+
+def upgrade(tmp_path, content, upgrades):
+    filename = tmp_path / 'requirements.txt'
+    filename.write_bytes(content)
+    requirements = PackageDetector([str(filename)]).get_packages()
+
+    packages = [{'name': name, 'latest_version': parse_version(latest_version)} for name, latest_version in upgrades]
+    packages = HashPinner(FakeDetector(), requirements, {'--jobs': 2}).collect(packages)
+    PackageUpgrader(packages, [str(filename)], OPTIONS, requirements=requirements).do_upgrade()
+    return filename.read_bytes(), packages
+
+
+@pytest.mark.parametrize('newline', [b'\n', b'\r\n'])
+def test_hash_block_on_continuation_lines(tmp_path, newline):
+    content = newline.join([
+        b'requests[security]==2.20.0 ; python_version >= "3" \\',
+        b'    --hash=sha256:aaaa \\',
+        b'    --hash=sha256:bbbb',
+        b'six==1.11.0 --hash=sha256:cccc',
+        b'',
+    ])
+
+    updated, _ = upgrade(tmp_path, content, [('requests', '2.31.0'), ('six', '1.16.0')])
+
+    assert updated == newline.join([
+        b'requests[security]==2.31.0 ; python_version >= "3" \\',
+        b'    --hash=sha256:dddd \\',
+        b'    --hash=sha256:eeee',
+        b'six==1.16.0 --hash=sha256:9999',
+        b'',
+    ])
+
+
+def test_strongest_digest_of_the_pinned_algorithms(tmp_path):
+    content = b'six==1.11.0 \\\n    --hash=sha256:cccc \\\n    --hash=sha512:bbbb\n'
+
+    updated, packages = upgrade(tmp_path, content, [('six', '1.16.0')])
+
+    assert packages[0]['hashes'] == ['sha512:8888']
+    assert updated == b'six==1.16.0 \\\n    --hash=sha512:8888\n'
+
+
+def test_missing_digest_drops_the_upgrade(tmp_path, capsys):
+    content = b'idna==2.8 --hash=sha256:aaaa\nsix==1.11.0\n'
+
+    updated, packages = upgrade(tmp_path, content, [('idna', '3.4'), ('six', '1.16.0')])
+
+    assert [package['name'] for package in packages] == ['six']
+    assert updated == b'idna==2.8 --hash=sha256:aaaa\nsix==1.16.0\n'
+    assert 'Not upgrading idna to 3.4: the index does not publish the sha256 digest of idna-3.4.tar.gz' in \
+        capsys.readouterr().out
+
+
+def test_unlisted_release_drops_the_upgrade(tmp_path, capsys):
+    updated, packages = upgrade(tmp_path, b'idna==2.8 --hash=sha256:aaaa\n', [('idna', '3.5')])
+
+    assert packages == []
+    assert updated == b'idna==2.8 --hash=sha256:aaaa\n'
+    assert 'the index does not list its files' in capsys.readouterr().out
@@ -0,0 +1,143 @@
+import os
+import time
+
+import pytest
+import requests
+
+from pip_ascent.IndexCache import IndexCache
+
+URL = 'https://pypi.test/simple/django/'
+
+
+def response(status_code, body=b'', headers=None):
+    answer = requests.models.Response()
+    answer.status_code = status_code
+    answer.url = URL
+    answer.headers = requests.structures.CaseInsensitiveDict(headers or {})
+    answer._content = body
+    return answer
+
+
+class FakeTransport(object):
+    """ Answers with the given responses in turn, and records the requests """
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def get(self, url, headers=None):
+        self.requests.append((url, headers or {}))
+        return self.responses.pop(0)
+
+
+def cache_with(tmp_path, transport, **kwargs):
+    return IndexCache(str(tmp_path), transport=transport, **kwargs)
+
+
+def test_fresh_entry_served_from_disk(tmp_path):
+    transport = FakeTransport(response(200, b'django 1.11', {'ETag': '"v1"'}))
+    cache = cache_with(tmp_path, transport)
+
+    assert cache.get(URL).content == b'django 1.11'
+    cached = cache.get(URL)
+
+    assert cached.content == b'django 1.11'
+    assert cached.from_cache
+    assert cached.headers['ETag'] == '"v1"'
+    assert len(transport.requests) == 1
+
+
+def test_accept_header_is_part_of_the_key(tmp_path):
+    transport = FakeTransport(response(200, b'html'), response(200, b'json'))
+    cache = cache_with(tmp_path, transport)
+
+    assert cache.get(URL, {'Accept': 'text/html'}).content == b'html'
+    assert cache.get(URL, {'Accept': 'application/vnd.pypi.simple.v1+json'}).content == b'json'
+    assert cache.get(URL, {'Accept': 'text/html'}).content == b'html'
+    assert len(transport.requests) == 2
+
+
+def test_stale_entry_revalidated_with_its_validators(tmp_path):
+    transport = FakeTransport(
+        response(200, b'django 1.11', {'ETag': '"v1"', 'Last-Modified': 'Mon, 01 Jan 2024 00:00:00 GMT'}),
+        response(304),
+    )
+    cache = cache_with(tmp_path, transport, ttl=0)
+
+    first = cache.get(URL)
+    revalidated = cache.get(URL)
+
+    assert transport.requests[1][1] == {'If-None-Match': '"v1"', 'If-Modified-Since': 'Mon, 01 Jan 2024 00:00:00 GMT'}
+    assert revalidated.status_code == 200
+    assert revalidated.content == b'django 1.11'
+    assert revalidated.from_cache
+    assert revalidated.cache_digest == first.cache_digest
+
+
+def test_not_modified_answer_makes_the_entry_fresh_again(tmp_path):
+    transport = FakeTransport(response(200, b'django 1.11', {'ETag': '"v1"'}), response(304))
+    cache = cache_with(tmp_path, transport, ttl=60)
+
+    cache.get(URL)
+    meta, body = cache._load(cache._key(URL))
+    meta['stored_at'] = time.time() - 120  # older than the ttl
+    cache._store(cache._key(URL), meta, body)
+
+    assert cache.get(URL).content == b'django 1.11'
+    assert cache.get(URL).content == b'django 1.11'
+    assert len(transport.requests) == 2
+
+
+def test_changed_body_replaces_the_entry_and_its_attachments(tmp_path):
+    transport = FakeTransport(response(200, b'django 1.11', {'ETag': '"v1"'}),
+                              response(200, b'django 2.2', {'ETag': '"v2"'}))
+    cache = cache_with(tmp_path, transport, ttl=0)
+
+    first = cache.get(URL)
+    cache.set_attachment(first, 'versions', ['1.11'])
+    assert cache.get_attachment(first, 'versions') == ['1.11']
+
+    second = cache.get(URL)
+    assert second.content == b'django 2.2'
+    assert cache.get_attachment(second, 'versions') is None
+    assert cache._load(cache._key(URL))[0]['headers'] == {'ETag': '"v2"'}
+
+
+def test_refresh_revalidates_fresh_entries(tmp_path):
+    transport = FakeTransport(response(200, b'django 1.11', {'ETag': '"v1"'}), response(304))
+    cache_with(tmp_path, transport).get(URL)
+
+    refreshed = cache_with(tmp_path, transport, refresh=True).get(URL)
+
+    assert refreshed.content == b'django 1.11'
+    assert transport.requests[1][1] == {'If-None-Match': '"v1"'}
+
+
+@pytest.mark.parametrize('status_code', [404, 500])
+def test_errors_are_not_stored(tmp_path, status_code):
+    transport = FakeTransport(response(status_code), response(200, b'django 1.11'))
+    cache = cache_with(tmp_path, transport)
+
+    assert cache.get(URL).status_code == status_code
+    assert cache.get(URL).content == b'django 1.11'
+    assert len(transport.requests) == 2
+
+
+def test_least_recently_used_entries_evicted(tmp_path):
+    urls = ['https://pypi.test/simple/{}/'.format(name) for name in ('a', 'b', 'c', 'd')]
+    transport = FakeTransport(*[response(200, b'x' * 400) for _ in urls])
+    cache = cache_with(tmp_path, transport)
+
+    now = time.time()
+    for age, url in zip((30, 20, 10), urls):
+        cache.get(url)
+        os.utime(cache._path(cache._key(url)), (now - age, now - age))
+    entry_size = os.path.getsize(cache._path(cache._key(urls[0])))
+    cache.max_size = entry_size * 3.5
+
+    cache.get(urls[0])  # served from disk, a is the most recently used now
+    cache.get(urls[3])  # past the size cap
+
+    kept = [url for url in urls if os.path.isfile(cache._path(cache._key(url)))]
+    assert kept == [urls[0], urls[2], urls[3]]
+    assert len(transport.requests) == 4
@@ -0,0 +1,62 @@
+import datetime
+
+import pytest
+import requests
+
+from pip_ascent.IndexTransport import IndexTransport
+
+
+class FakeResponse(object):
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.elapsed = datetime.timedelta(milliseconds=10)
+        self.content = b''
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class FakeSession(object):
+    """ Answers with the given responses in turn, and calls on_get before each answer """
+
+    def __init__(self, responses, on_get=None):
+        self.responses = list(responses)
+        self.on_get = on_get
+        self.urls = []
+
+    def get(self, url, **kwargs):
+        self.urls.append(url)
+        if self.on_get:
+            self.on_get()
+        return self.responses.pop(0)
+
+    def close(self):
+        pass
+
+
+def transport_with(sessions, **kwargs):
+    transport = IndexTransport(backoff_factor=0, **kwargs)
+    transport._create_session = lambda: sessions.pop(0)
+    return transport
+
+
+def test_closed_transport_refuses_requests():
+    transport = transport_with([FakeSession([FakeResponse(200)])])
+    transport.close()
+
+    with pytest.raises(requests.ConnectionError):
+        transport.get('https://pypi.test/simple/django/')
+    assert transport._sessions == {}
+
+
+def test_closing_between_retries():
+    transport = transport_with([])
+    session = FakeSession([FakeResponse(503), FakeResponse(200)], on_get=lambda: transport.close())
+    transport._create_session = lambda: session
+
+    with pytest.raises(requests.ConnectionError):
+        transport.get('https://pypi.test/simple/django/')
+    assert session.urls == ['https://pypi.test/simple/django/']
+    assert transport._sessions == {}
@@ -0,0 +1,85 @@
+import os
+import stat
+
+import pytest
+
+from pip_ascent.PackageDetector import PackageDetector
+from pip_ascent.PackageUpgrader import PackageUpgrader
+from pip_ascent.VersionIndex import parse_version
+
+OPTIONS = {'--dry-run': False, '--check-greater-equal': True, '--skip-package-installation': True}
+
+BASE = (b'django==1.11\r\n'
+        b'celery>=4.2,<5  # workers\r\n'
+        b'requests[security]>=2.20 ; python_version >= "3"\r\n'
+        b'six~=1.10\r\n'
+        b'flask==1.0\r\n')
+DEV = (b'-r base.txt\n'
+       b'django == 1.11  # same pin\n'
+       b'six==1.10\n')
+
+PACKAGES = [
+    {'name': 'Django', 'latest_version': parse_version('2.2')},
+    {'name': 'celery', 'latest_version': parse_version('5.1.2'), 'specifier': '<5,>=4.2'},
+    {'name': 'requests', 'latest_version': parse_version('2.31.0')},
+    {'name': 'six', 'latest_version': parse_version('1.16.0'), 'specifier': '~=1.10'},
+]
+
+
+@pytest.fixture
+def requirements_files(tmp_path):
+    base, dev = tmp_path / 'base.txt', tmp_path / 'dev.txt'
+    base.write_bytes(BASE)
+    dev.write_bytes(DEV)
+    os.chmod(str(base), 0o640)
+    return [str(base), str(dev)]
+
+
+def upgrade(requirements_files, requirements):
+    upgrader = PackageUpgrader(PACKAGES, requirements_files, OPTIONS, requirements=requirements)
+    return upgrader.do_upgrade()
+
+
+@pytest.mark.parametrize('detected', [True, False])
+def test_rewrite_in_place(requirements_files, detected):
+    requirements = PackageDetector(requirements_files).get_packages() if detected else None
+
+    upgraded = upgrade(requirements_files, requirements)
+
+    with open(requirements_files[0], 'rb') as fh:
+        assert fh.read() == (b'django==2.2\r\n'
+                             b'celery>=5.1.2,<6  # workers\r\n'
+                             b'requests[security]>=2.31.0 ; python_version >= "3"\r\n'
+                             b'six~=1.16\r\n'
+                             b'flask==1.0\r\n')
+    with open(requirements_files[1], 'rb') as fh:
+        assert fh.read() == (b'-r base.txt\n'
+                             b'django == 2.2  # same pin\n'
+                             b'six==1.16.0\n')
+    assert [package['name'] for package in upgraded] == ['Django', 'celery', 'requests', 'six']
+    assert stat.S_IMODE(os.stat(requirements_files[0]).st_mode) == 0o640
+
+
+def test_file_changed_since_the_detection(requirements_files):
+    requirements = PackageDetector(requirements_files).get_packages()
+    with open(requirements_files[1], 'wb') as fh:
+        fh.write(b'# the pins moved\n' + DEV)
+
+    upgrade(requirements_files, requirements)
+
+    with open(requirements_files[1], 'rb') as fh:
+        assert fh.read() == (b'# the pins moved\n'
+                             b'-r base.txt\n'
+                             b'django == 2.2  # same pin\n'
+                             b'six==1.16.0\n')
+
+
+def test_range_that_excludes_the_target_is_kept(requirements_files, capsys):
+    with open(requirements_files[1], 'wb') as fh:
+        fh.write(b'celery>=4.2,!=5.1.2\n')
+
+    upgrade(requirements_files, PackageDetector(requirements_files).get_packages())
+
+    with open(requirements_files[1], 'rb') as fh:
+        assert fh.read() == b'celery>=4.2,!=5.1.2\n'
+    assert 'can not start at 5.1.2' in capsys.readouterr().out
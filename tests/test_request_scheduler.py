@@ -0,0 +1,150 @@
+import datetime
+import time
+from email.utils import format_datetime
+
+import pytest
+
+from pip_ascent.IndexTransport import MAX_RETRY_AFTER, IndexTransport, _retry_after
+from pip_ascent.RequestScheduler import RequestScheduler
+
+HOST = 'https://pypi.test'
+URL = HOST + '/simple/django/'
+
+
+class FakeResponse(object):
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.elapsed = datetime.timedelta(milliseconds=10)
+        self.content = b''
+
+    def close(self):
+        pass
+
+
+class FakeSession(object):
+    """ Answers with the given responses in turn, and records when each request was sent """
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.sent_at = []
+
+    def get(self, url, **kwargs):
+        self.sent_at.append(time.monotonic())
+        return self.responses.pop(0)
+
+    def close(self):
+        pass
+
+
+def answer(scheduler, status_code, latency=0.01, retry_after=None, host=HOST):
+    scheduler.release(host, scheduler.acquire(host), status_code, latency, retry_after)
+
+
+@pytest.mark.parametrize('status_code', [429, 503])
+def test_throttled_answer_halves_the_limit(status_code):
+    scheduler = RequestScheduler(8)
+
+    answer(scheduler, status_code)
+    assert scheduler.limit(HOST) == 4
+    answer(scheduler, status_code)
+    assert scheduler.limit(HOST) == 2
+    assert scheduler.limit('https://other.test') == 8
+
+
+def test_connection_error_halves_the_limit():
+    scheduler = RequestScheduler(8)
+
+    scheduler.release(HOST, scheduler.acquire(HOST))
+
+    assert scheduler.limit(HOST) == 4
+
+
+def test_burst_of_throttled_answers_counts_once():
+    scheduler = RequestScheduler(8)
+    started = [scheduler.acquire(HOST) for _ in range(4)]
+
+    for request_started in started:
+        scheduler.release(HOST, request_started, 429, None)
+
+    assert scheduler.limit(HOST) == 4
+
+
+def test_limit_never_drops_below_one():
+    scheduler = RequestScheduler(2)
+
+    for _ in range(3):
+        answer(scheduler, 503)
+
+    assert scheduler.limit(HOST) == 1
+
+
+def test_limit_grows_back_one_request_per_window():
+    scheduler = RequestScheduler(8)
+    answer(scheduler, 429)
+    answer(scheduler, 429)
+
+    for _ in range(2):
+        answer(scheduler, 200)
+    assert scheduler.limit(HOST) == 2  # 1/2 + 1/2.5 short of a window
+    answer(scheduler, 200)
+    assert scheduler.limit(HOST) == 3
+
+    for _ in range(3):
+        answer(scheduler, 200)
+    assert scheduler.limit(HOST) == 4
+
+    for _ in range(100):
+        answer(scheduler, 200)
+    assert scheduler.limit(HOST) == 8
+
+
+def test_high_latency_cuts_the_limit_by_a_quarter():
+    scheduler = RequestScheduler(8)
+
+    answer(scheduler, 200, latency=0.05)
+    answer(scheduler, 200, latency=0.5)
+
+    assert scheduler.limit(HOST) == 6
+
+
+def test_retry_after_pauses_the_host():
+    scheduler = RequestScheduler(8)
+    answer(scheduler, 429, retry_after=0.2)
+
+    paused = time.monotonic()
+    scheduler.release('https://other.test', scheduler.acquire('https://other.test'), 200, 0.01)
+    assert time.monotonic() - paused < 0.1
+    scheduler.release(HOST, scheduler.acquire(HOST), 200, 0.01)
+    assert time.monotonic() - paused >= 0.15
+
+
+def test_retry_after_seconds():
+    assert _retry_after('2') == 2.0
+    assert _retry_after('0.5') == 0.5
+    assert _retry_after('-3') == 0.0
+    assert _retry_after('3600') == MAX_RETRY_AFTER
+
+
+def test_retry_after_http_date():
+    now = datetime.datetime.now(datetime.timezone.utc)
+
+    assert 8 < _retry_after(format_datetime(now + datetime.timedelta(seconds=10), usegmt=True)) <= 10
+    assert _retry_after(format_datetime(now - datetime.timedelta(seconds=10), usegmt=True)) == 0.0
+    assert _retry_after(format_datetime(now + datetime.timedelta(hours=1), usegmt=True)) == MAX_RETRY_AFTER
+
+
+@pytest.mark.parametrize('value', [None, '', 'soon', 'Mon, 99 Foo 2024'])
+def test_retry_after_unset_or_invalid(value):
+    assert _retry_after(value) is None
+
+
+@pytest.mark.parametrize('status_code', [429, 503])
+def test_transport_waits_for_the_retry_after_of_a_throttled_answer(status_code):
+    session = FakeSession(FakeResponse(status_code, {'Retry-After': '0.2'}), FakeResponse(200))
+    transport = IndexTransport(backoff_factor=0, pool_size=8)
+    transport._create_session = lambda: session
+
+    assert transport.get(URL).status_code == 200
+    assert session.sent_at[1] - session.sent_at[0] >= 0.15
+    assert transport.scheduler.limit(HOST) == 4
@@ -0,0 +1,85 @@
+import pytest
+
+from pip_ascent.PackageDetector import PackageDetector
+from pip_ascent.RequirementLine import RequirementLine
+
+
+def detect(content):
+    detector = PackageDetector([])
+    detector.detect_content(content, 'requirements.txt')
+    return detector.get_packages()
+
+
+def clause_texts(content, requirement):
+    return [(operator, content[span[0]:span[1]] if span else None) for operator, _, span in requirement.clauses]
+
+
+@pytest.mark.parametrize('content, expected', [
+    ('django==1.11\n', [('==', '1.11')]),
+    ('django==1.11', [('==', '1.11')]),
+    ('    django == 1.11   # pinned for the admin\n', [('==', '1.11')]),
+    ('django>=1.11,\\\n    <2.0\n', [('>=', '1.11'), ('<', '2.0')]),
+    ('django>=1.11,\\\r\n    <2.0\r\n', [('>=', '1.11'), ('<', '2.0')]),
+    ('django[bcrypt]>=1.11 ; python_version >= "3.6"\n', [('>=', '1.11')]),
+])
+def test_clause_spans(content, expected):
+    requirement, = detect(content)
+    assert clause_texts(content, requirement) == expected
+
+
+def test_span_of_every_line_with_crlf():
+    content = '# services\r\ndjango==1.11\r\n\r\nrequests==2.20.0\r\n'
+    django, requests = detect(content)
+    assert content[django.span[0]:django.span[1]] == '1.11'
+    assert content[requests.span[0]:requests.span[1]] == '2.20.0'
+    assert (django.lineno, requests.lineno) == (2, 4)
+
+
+def test_version_split_by_a_continuation_has_no_span():
+    requirement, = detect('django==1.\\\n11\n')
+    assert requirement.version == '1.11'
+    assert requirement.span is None
+    assert clause_texts('django==1.\\\n11\n', requirement) == [('==', None)]
+
+
+@pytest.mark.parametrize('newline', ['\n', '\r\n'])
+def test_hash_span_on_continuation_lines(newline):
+    content = newline.join([
+        'requests==2.20.0 \\',
+        '    --hash=sha256:aaaa \\',
+        '    --hash=sha256:bbbb',
+        'six==1.11.0',
+        '',
+    ])
+    requests, six = detect(content)
+    assert content[requests.span[0]:requests.span[1]] == '2.20.0'
+    assert content[requests.hash_span[0]:requests.hash_span[1]] == \
+        '--hash=sha256:aaaa \\{}    --hash=sha256:bbbb'.format(newline)
+    assert six.hash_span is None
+    assert content[six.span[0]:six.span[1]] == '1.11.0'
+
+
+def test_logical_lines_offsets():
+    content = 'django>=1.11,\\\r\n    <2.0\r\nsix\r\n'
+    (first, line, offsets), (second, six_line, _), _ = PackageDetector.logical_lines(content)
+    assert (first, line) == (1, 'django>=1.11,    <2.0')
+    assert (second, six_line) == (3, 'six')
+    start = line.index('<2.0') + 1
+    assert RequirementLine._file_span(start, start + 3, offsets) == (content.index('2.0'), content.index('2.0') + 3)
+
+
+def test_file_span_across_a_continuation():
+    content = 'django==1.\\\n11\n'
+    _, line, offsets = next(PackageDetector.logical_lines(content))
+    start, end = RequirementLine._file_span(line.index('1.11'), len(line), offsets)
+    assert content[start:end] == '1.\\\n11'
+
+
+def test_shift_offsets():
+    content = '    django==1.11\n'
+    _, line, offsets = next(PackageDetector.logical_lines(content))
+    stripped = line.lstrip()
+    shifted = PackageDetector._shift_offsets(offsets, len(line) - len(stripped))
+    start = stripped.index('1.11')
+    assert content[RequirementLine._file_position(start, shifted):][:4] == '1.11'
+    assert PackageDetector._shift_offsets(None, 4) is None
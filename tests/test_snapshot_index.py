@@ -0,0 +1,63 @@
+import sqlite3
+
+import pytest
+
+from pip_ascent.PackageStatusDetector import PackageStatusDetector
+from pip_ascent.SnapshotIndex import SnapshotIndex
+from pip_ascent.VersionIndex import VersionIndex
+
+
+@pytest.fixture
+def not_a_database(tmp_path):
+    filename = tmp_path / 'snapshot.db'
+    filename.write_text('django==1.11\n')
+    return str(filename)
+
+
+@pytest.fixture
+def other_database(tmp_path):
+    filename = str(tmp_path / 'other.db')
+    connection = sqlite3.connect(filename)
+    connection.execute('CREATE TABLE packages (id INTEGER PRIMARY KEY)')
+    connection.commit()
+    connection.close()
+    return filename
+
+
+@pytest.mark.parametrize('create', [False, True])
+def test_not_a_database(not_a_database, create):
+    with pytest.raises(IOError, match='Invalid offline index {}: file is not a database'.format(not_a_database)):
+        SnapshotIndex(not_a_database, create=create)
+
+
+def test_database_of_another_schema(other_database):
+    with pytest.raises(IOError, match='Invalid offline index {}'.format(other_database)):
+        SnapshotIndex(other_database)
+
+
+def test_merge_of_an_invalid_snapshot(tmp_path, not_a_database):
+    index = SnapshotIndex(str(tmp_path / 'merged.db'), create=True)
+    try:
+        with pytest.raises(IOError, match=not_a_database):
+            index.merge(not_a_database)
+    finally:
+        index.close()
+
+
+def test_invalid_offline_index_option(not_a_database):
+    with pytest.raises(ValueError, match='Invalid offline index'):
+        PackageStatusDetector([], {'--check-greater-equal': False, '--offline-index': not_a_database})
+
+
+def test_store_and_load(tmp_path):
+    version_index = VersionIndex()
+    version_index.add('1.0', '2020-01-01T00:00:00', False)
+    version_index.add('1.1', None, True)
+
+    index = SnapshotIndex(str(tmp_path / 'snapshot.db'), create=True)
+    try:
+        index.store('Django', version_index, fetched_at=1.0)
+        assert index.load('django').to_dict() == version_index.to_dict()
+        assert index.load('flask') is None
+    finally:
+        index.close()
@@ -0,0 +1,111 @@
+import pytest
+
+from pip_ascent.PackageDetector import PackageDetector
+from pip_ascent.UpgradePlanner import UpgradePlanner
+from pip_ascent.VersionIndex import parse_version
+
+REQUIREMENTS = '''django==1.11
+sqlparse==0.2.4
+celery==4.4
+kombu==4.6
+requests==2.20
+urllib3==1.24
+passlib[bcrypt]==1.7
+'''
+
+INDEX_METADATA = {
+    ('django', '2.2'): ['sqlparse>=0.3', 'pytz'],
+    ('celery', '5.0'): ['kombu<5.1,>=5.0'],
+    ('kombu', '5.2'): [],
+    ('urllib3', '1.26'): [],
+    ('passlib', '1.8'): ['bcrypt>=4; extra == "bcrypt"', 'argon2-cffi>=21; extra == "argon2"'],
+    ('sqlparse', '0.4'): [],
+}
+INSTALLED_METADATA = {
+    'requests': ['urllib3<1.25,>=1.21.1', 'idna<2.8'],
+}
+
+
+class FakeDetector(object):
+    def __init__(self, sources, requires_python=None):
+        self.sources = sources
+        self.requires_python = requires_python or {}
+
+    def release_metadata(self, package_name, release):
+        requires_dist = INDEX_METADATA.get((package_name, str(release)))
+        if requires_dist is None:
+            return None
+        return {'requires_dist': requires_dist,
+                'requires_python': self.requires_python.get((package_name, str(release)))}
+
+
+@pytest.fixture(autouse=True)
+def environment(monkeypatch):
+    def installed_metadata(package_name):
+        return {'requires_dist': INSTALLED_METADATA.get(package_name, []), 'requires_python': None}
+    monkeypatch.setattr('pip_ascent.UpgradePlanner.installed_metadata', installed_metadata)
+
+
+def plan(upgrades, allow_conflicts=False, requires_python=None, extra_requirements=''):
+    package_detector = PackageDetector([])
+    package_detector.detect_content(REQUIREMENTS + extra_requirements, 'requirements.txt')
+    requirements = package_detector.get_packages()
+    installed = {requirement.canonical_name: parse_version(requirement.version) for requirement in requirements}
+
+    planner = UpgradePlanner(FakeDetector(package_detector.get_sources(), requires_python), requirements,
+                             {'--allow-conflicts': allow_conflicts}, installed)
+    packages = [{'name': name, 'latest_version': parse_version(latest_version)} for name, latest_version in upgrades]
+    return [package['name'] for package in planner.plan(packages)]
+
+
+def test_compatible_upgrades():
+    assert plan([('django', '2.2'), ('sqlparse', '0.4')]) == ['django', 'sqlparse']
+
+
+def test_upgrade_requiring_another_version_of_a_pin(capsys):
+    assert plan([('django', '2.2'), ('kombu', '5.2')]) == ['kombu']
+    assert 'Not upgrading django to 2.2: it requires sqlparse>=0.3, pinned to 0.2.4 (requirements.txt:2)' in \
+        capsys.readouterr().out
+
+
+def test_upgrade_excluding_another_upgrade(capsys):
+    assert plan([('celery', '5.0'), ('kombu', '5.2')]) == ['kombu']
+    assert 'Not upgrading celery to 5.0: it requires kombu<5.1,>=5.0, pinned to 5.2' in capsys.readouterr().out
+
+
+def test_upgrade_excluded_by_an_installed_pin(capsys):
+    assert plan([('urllib3', '1.26'), ('django', '2.2'), ('sqlparse', '0.4')]) == ['django', 'sqlparse']
+    assert 'Not upgrading urllib3 to 1.26: requests 2.20 requires urllib3<1.25,>=1.21.1 (requirements.txt:5)' in \
+        capsys.readouterr().out
+
+
+def test_upgrade_requiring_another_python(capsys):
+    assert plan([('sqlparse', '0.4'), ('kombu', '5.2')], requires_python={('kombu', '5.2'): '>=4'}) == ['sqlparse']
+    assert 'Not upgrading kombu to 5.2: it requires Python >=4' in capsys.readouterr().out
+
+
+def test_dropped_upgrade_checked_again():
+    # once kombu 5.2 is dropped, celery 5.0 does not fit the kombu pin anymore
+    assert plan([('celery', '5.0'), ('kombu', '5.2')], requires_python={('kombu', '5.2'): '>=4'}) == []
+
+
+@pytest.mark.parametrize('extra_requirements, planned', [
+    ('bcrypt==3.2\n', []),
+    ('bcrypt==4.0\n', ['passlib']),
+    ('argon2-cffi==20.1\n', ['passlib']),  # passlib is not pinned with the argon2 extra
+])
+def test_dependencies_of_the_extras_of_the_pins(extra_requirements, planned):
+    assert plan([('passlib', '1.8')], extra_requirements=extra_requirements) == planned
+
+
+def test_allow_conflicts(capsys):
+    assert plan([('django', '2.2'), ('celery', '5.0'), ('kombu', '5.2')], allow_conflicts=True) == \
+        ['django', 'celery', 'kombu']
+    output = capsys.readouterr().out
+    assert 'Upgrading django to 2.2 anyway: it requires sqlparse>=0.3' in output
+    assert 'Upgrading celery to 5.0 anyway: it requires kombu<5.1,>=5.0' in output
+
+
+def test_unpublished_metadata(capsys):
+    assert plan([('flask', '2.0')], extra_requirements='flask==1.0\n') == ['flask']
+    assert 'Could not check the dependencies of flask' in capsys.readouterr().out
@@ -0,0 +1,34 @@
+import pytest
+
+from pip_ascent.version_ranges import lower_bound, updated_clauses
+from pip_ascent.VersionIndex import parse_version
+
+
+@pytest.mark.parametrize('clauses, target, expected', [
+    ([('>=', '4.2'), ('<', '5')], '5.1.2', ['5.1.2', '6']),
+    ([('>=', '4.2'), ('<', '5.0')], '5.1.2', ['5.1.2', '5.2']),
+    ([('>=', '1.0'), ('<', '5')], '4.0', ['4.0', '5']),
+    ([('<=', '2.0')], '2.5', ['2.5']),
+    ([('~=', '5.3')], '6.0.1', ['6.0']),
+    ([('~=', '1.0.0')], '3.1', ['3.1.0']),
+    ([('==', '1.*')], '3.1', ['3.*']),
+    ([('>', '1.0')], '2.0', ['1.0']),
+    ([('>=', '1.0'), ('!=', '3.1')], '3.1', None),
+    ([('===', '1.0')], '2.0', None),
+    ([('>=', '1!1.0'), ('<', '1!2')], '1!2.5', ['1!2.5', '1!3']),
+    ([('>=', '1.0')], '2.0rc1', ['2.0rc1']),
+])
+def test_updated_clauses(clauses, target, expected):
+    assert updated_clauses(clauses, parse_version(target)) == expected
+
+
+@pytest.mark.parametrize('clauses, expected', [
+    ([('>=', '1.2'), ('<', '2')], '1.2'),
+    ([('<', '5')], None),
+    ([('==', '1.*')], '1'),
+    ([('~=', '1.4'), ('>', '1.5')], '1.5'),
+    ([('!=', '2.0')], None),
+    ([('>=', '1!1.0')], '1!1.0'),
+])
+def test_lower_bound(clauses, expected):
+    assert lower_bound(clauses) == (parse_version(expected) if expected else None)
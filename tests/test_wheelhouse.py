@@ -0,0 +1,36 @@
+import pytest
+
+from pip_ascent.VersionIndex import parse_version
+from pip_ascent.Wheelhouse import Wheelhouse
+
+
+class OfflineDetector(object):
+    """ Lists no release files, as when the index can not be reached """
+
+    def release_files(self, name, release):
+        return []
+
+
+@pytest.fixture
+def wheelhouse(tmp_path):
+    for filename in ('six-1.16.0-py2.py3-none-any.whl', 'Django-4.2-py3-none-any.whl', 'notes.txt'):
+        (tmp_path / filename).write_bytes(b'')
+    return Wheelhouse(OfflineDetector(), str(tmp_path), jobs=2)
+
+
+@pytest.mark.parametrize('name, release', [
+    ('six', '1.16.0'),
+    ('six', '1.16'),
+    ('six', parse_version('1.16.0')),
+    ('django', '4.2.0'),
+])
+def test_prefetch_reuses_a_local_wheel(wheelhouse, name, release):
+    assert wheelhouse.prefetch([{'name': name, 'latest_version': release}]) == {name}
+
+
+@pytest.mark.parametrize('name, release', [
+    ('six', '1.17.0'),
+    ('requests', '2.31.0'),
+])
+def test_prefetch_without_local_wheel(wheelhouse, name, release):
+    assert wheelhouse.prefetch([{'name': name, 'latest_version': release}]) == set()